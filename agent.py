@@ -1,3 +1,4 @@
+import os
 from google.adk.agents import SequentialAgent
 from agents.selector import selector_agent
 from agents.enricher import enricher_agent
@@ -6,10 +7,19 @@ from agents.enricher import enricher_agent
 class MorningDigestPipeline(SequentialAgent):
     pass
 
+def build_enricher():
+    """
+    Returns the enrichment stage: the sequential EnricherAgent conversation, or
+    one concurrent model call per article when ENRICHER_MODE=fanout.
+    """
+    if os.getenv("ENRICHER_MODE", "sequential").lower() == "fanout":
+        from agents.fanout import create_fanout_enricher
+        return create_fanout_enricher(model=enricher_agent.model)
+    return enricher_agent
+
 # Create the Sequential Pipeline
 morning_digest_pipeline = MorningDigestPipeline(
     name="MorningDigestPipeline",
-    sub_agents=[selector_agent, enricher_agent],
+    sub_agents=[selector_agent, build_enricher()],
     description="A pipeline that selects top articles and enriches them with key takeaways."
 )
-
@@ -1,7 +1,19 @@
 from google.adk.agents import LlmAgent
-from client import ReadwiseClient
+from google.adk.tools import ToolContext
+from client import get_client, get_user_client
 import json
-from utils import fetch_prompt
+import asyncio
+import logging
+from llm_cache import before_model_cache, after_model_cache
+from metrics import before_tool_timer, after_tool_timer
+from utils import prompts, parse_agent_json
+from content import prepare_content, html_to_text, estimate_tokens
+from agents.longdoc import is_long_document, summarize_long_document, LONG_DOC_TOKENS
+from prefetch import get_prefetcher
+from agents.selector import DIGEST_MODEL
+from session_store import skip_completed_stage
+
+logger = logging.getLogger(__name__)
 
 ENRICHER_PROMPT_URL = "https://gist.githubusercontent.com/xPierG/b7a6f58a369f49120417e3c405973d75/raw/prompt_morning_digest_enricher.txt"
 
@@ -20,6 +32,7 @@ DEFAULT_ENRICHER_PROMPT = """
        - Analyze the full text.
        - Generate exactly 3 "Key Takeaways" (bullet points) that are valuable for a Chief AI Officer.
        - Add a new field "key_takeaways" (list of strings) to the article object.
+       - If the tool returns takeaways already extracted from a very long article, use them as they are.
     3. For other articles, leave them as is (do NOT add "key_takeaways").
     4. Return the modified JSON object with the "selection" list.
     
@@ -35,22 +48,105 @@ DEFAULT_ENRICHER_PROMPT = """
     Output ONLY the JSON.
     """
 
-# Initialize client
-client = ReadwiseClient()
+# Category labels whose articles get enriched with key takeaways
+TARGET_CATEGORY_MARKERS = ("Non puoi ignorarlo", "must_read", "Lettura Lunga", "long_read")
+
+# Fetched lazily (and concurrently with the other prompts) on first use
+prompts.register("enricher", ENRICHER_PROMPT_URL, DEFAULT_ENRICHER_PROMPT)
+
+# Shared client (one per token, backed by the persistent document cache)
+client = get_client()
+
+enricher_prompt = prompts.provider("enricher")
+
+def enricher_instruction(context) -> str:
+    """
+    Instruction provider: the enricher prompt followed by the restored
+    selection from the session state. The agent sees no conversation history
+    (`include_contents='none'`), so the selector's row-ID draft never reaches it.
+    """
+    selection = context.state.get("selection_result") or '{"selection": []}'
+    return f"{enricher_prompt(context)}\n\nINPUT:\n{selection}"
+
+def is_enrichment_target(article: dict) -> bool:
+    """Returns True if the article belongs to a category that gets key takeaways."""
+    label = article.get('category_label') or ''
+    return any(marker in label for marker in TARGET_CATEGORY_MARKERS)
+
+async def prefetch_target_content(callback_context):
+    """
+    Before-agent callback: bulk-fetches the full content of every target
+    article in one request, so `fetch_full_content` answers from memory.
+    Runs in a worker thread so other sessions keep running meanwhile; when
+    the runner already started this prefetch, it waits for it instead.
+    """
+    raw = callback_context.state.get("selection_result")
+    if not raw:
+        return None
+    try:
+        selection = parse_agent_json(raw).get("selection", [])
+    except (json.JSONDecodeError, AttributeError):
+        return None
+
+    ids = [a['id'] for a in selection if isinstance(a, dict) and a.get('id') and is_enrichment_target(a)]
+    if ids:
+        print(f">> PREFETCH: Fetching full content for {len(ids)} articles...")
+        await asyncio.to_thread(get_user_client(callback_context.user_id, client).fetch_documents_details, ids)
+    return None
 
 # Define tool wrapper
-def fetch_full_content(doc_id: str):
+def _selected_title(tool_context, doc_id: str) -> str:
+    """Title of a selected article, from the selector's output in the session state."""
+    try:
+        selection = parse_agent_json(tool_context.state.get("selection_result") or "{}").get("selection", [])
+    except (json.JSONDecodeError, AttributeError):
+        return ""
+    return next((a.get('title') or '' for a in selection if isinstance(a, dict) and a.get('id') == doc_id), "")
+
+async def fetch_full_content(doc_id: str, tool_context: ToolContext = None):
     """
     Fetches the full content of a specific document by ID using Readwise API.
+    Returns the article as plain text, truncated to the enrichment token budget;
+    for very long articles, returns the 3 key takeaways extracted from the
+    whole text section by section instead (or the truncated text, if that
+    extraction fails).
     """
     print(f">> TOOL CALL: Fetching full content for {doc_id}...")
-    return client.fetch_document_details(doc_id)
+    readwise = get_user_client(tool_context.user_id, client) if tool_context else client
+    prefetcher = get_prefetcher()
+    if prefetcher is not None:
+        prefetcher.record(readwise, doc_id)
+    html = await asyncio.to_thread(readwise.fetch_document_details, doc_id)
+    # The HTML is longer than its text: only long HTML is worth converting up front
+    if html and estimate_tokens(html) > LONG_DOC_TOKENS:
+        text = html_to_text(html)
+        if is_long_document(text):
+            title, model = "", DIGEST_MODEL
+            if tool_context:
+                # Summarize with the calling agent's own model
+                title = _selected_title(tool_context, doc_id)
+                model = tool_context.get_invocation_context().agent.canonical_model.model
+            try:
+                takeaways = await summarize_long_document(model, title, text)
+            except Exception as e:
+                logger.warning(f"Map-reduce summarization of {doc_id} failed, sending truncated text: {e}")
+                takeaways = []
+            if takeaways:
+                return (f"This article is too long to read in one turn ({len(text.split())} words). "
+                        f"Key takeaways extracted from its full text: {json.dumps(takeaways, ensure_ascii=False)}")
+    return prepare_content(html)
 
 # Define Enricher Agent
 enricher_agent = LlmAgent(
     name="EnricherAgent",
-    model="gemini-2.0-flash-001",
-    instruction=fetch_prompt(ENRICHER_PROMPT_URL, DEFAULT_ENRICHER_PROMPT),
+    model=DIGEST_MODEL,
+    instruction=enricher_instruction,
+    include_contents='none',
     tools=[fetch_full_content],
-    output_key="final_digest"
+    before_agent_callback=[skip_completed_stage, prefetch_target_content],
+    output_key="final_digest",
+    before_model_callback=before_model_cache,
+    after_model_callback=after_model_cache,
+    before_tool_callback=before_tool_timer,
+    after_tool_callback=after_tool_timer
 )
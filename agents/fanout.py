@@ -0,0 +1,117 @@
+import os
+import json
+import asyncio
+import logging
+from typing import AsyncGenerator
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from agents.enricher import client, is_enrichment_target
+from client import get_user_client
+from agents.model_calls import generate_text
+from content import prepare_content, html_to_text, estimate_tokens
+from agents.longdoc import is_long_document, summarize_long_document, LONG_DOC_TOKENS, _as_points
+from prefetch import get_prefetcher
+from utils import parse_agent_json
+from session_store import skip_completed_stage
+
+logger = logging.getLogger(__name__)
+
+ARTICLE_ENRICHER_PROMPT = """
+    You are the "Morning Digest" AI Researcher.
+
+    You will receive one article: its title, its summary and its full text.
+    Generate exactly 3 "Key Takeaways" (short bullet points) that are valuable for a Chief AI Officer.
+
+    OUTPUT FORMAT:
+    Return ONLY a JSON list of exactly 3 strings.
+    """
+
+
+class FanOutEnricherAgent(BaseAgent):
+    """
+    Enriches the selected articles with one concurrent model call per target
+    article, instead of a single conversation walking through them in turn.
+
+    Reads `selection_result` from the session state and writes the enriched
+    selection to `final_digest`, like the sequential EnricherAgent.
+    """
+
+    model: str = "gemini-2.0-flash-001"
+    instruction: str = ARTICLE_ENRICHER_PROMPT
+    # Maximum number of articles enriched at the same time (model rate limits)
+    concurrency: int = 3
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        raw = ctx.session.state.get("selection_result")
+        try:
+            data = parse_agent_json(raw) if raw else {}
+        except json.JSONDecodeError:
+            logger.error("FanOutEnricherAgent: selection_result is not valid JSON")
+            data = {}
+        selection = data.get("selection", []) if isinstance(data, dict) else []
+
+        targets = [a for a in selection if isinstance(a, dict) and a.get('id') and is_enrichment_target(a)]
+        if targets:
+            print(f">> FAN-OUT: Enriching {len(targets)} articles (max {self.concurrency} at a time)...")
+            readwise = get_user_client(ctx.session.user_id, client)
+            # One bulk request for every target's content
+            await asyncio.to_thread(readwise.fetch_documents_details, [a['id'] for a in targets])
+            # Bounds every model call of the fan-out, map-reduce chunks included
+            semaphore = asyncio.Semaphore(max(1, self.concurrency))
+            await asyncio.gather(*(self._enrich(readwise, article, semaphore) for article in targets))
+
+        final_digest = json.dumps({"selection": selection}, ensure_ascii=False)
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            content=types.Content(role="model", parts=[types.Part.from_text(text=final_digest)]),
+            actions=EventActions(state_delta={"final_digest": final_digest}),
+        )
+
+    async def _enrich(self, readwise, article: dict, semaphore: asyncio.Semaphore):
+        """
+        Adds `key_takeaways` to the article in place; leaves it untouched on
+        failure. `semaphore` is held for each model call, not for the article.
+        """
+        try:
+            prefetcher = get_prefetcher()
+            if prefetcher is not None:
+                prefetcher.record(readwise, article['id'])
+            content = await asyncio.to_thread(readwise.fetch_document_details, article['id'])
+            # The HTML is longer than its text: only long HTML is worth converting up front
+            full_text = html_to_text(content) if content and estimate_tokens(content) > LONG_DOC_TOKENS else ""
+            takeaways = []
+            if is_long_document(full_text):
+                try:
+                    takeaways = await summarize_long_document(self.model, article.get('title', ''), full_text,
+                                                              limiter=semaphore)
+                except Exception as e:
+                    logger.warning(f"Map-reduce summarization of {article['id']} failed, using truncated text: {e}")
+            if not takeaways:
+                prompt = (
+                    f"TITLE: {article.get('title', '')}\n"
+                    f"SUMMARY: {article.get('summary', '')}\n\n"
+                    f"FULL TEXT:\n{prepare_content(content)}"
+                )
+                async with semaphore:
+                    text = await generate_text(self.model, self.instruction, prompt)
+                takeaways = _as_points(text)
+            article['key_takeaways'] = takeaways[:3]
+        except Exception as e:
+            logger.error(f"Enrichment failed for article {article['id']}: {e}")
+
+
+def create_fanout_enricher(model: str = "gemini-2.0-flash-001") -> FanOutEnricherAgent:
+    """Builds the fan-out enricher, with its concurrency cap from ENRICHER_CONCURRENCY."""
+    return FanOutEnricherAgent(
+        name="EnricherAgent",
+        model=model,
+        concurrency=int(os.getenv("ENRICHER_CONCURRENCY", "3")),
+        before_agent_callback=skip_completed_stage,
+        description="Enriches target articles with key takeaways, one concurrent model call per article.",
+    )
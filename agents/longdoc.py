@@ -0,0 +1,105 @@
+import os
+import asyncio
+import logging
+
+from agents.model_calls import generate_text
+from content import estimate_tokens, split_into_chunks, DEFAULT_TOKEN_BUDGET
+from utils import parse_agent_json
+
+logger = logging.getLogger(__name__)
+
+# Documents longer than this (in tokens) are summarized chunk by chunk
+LONG_DOC_TOKENS = int(os.getenv("ENRICHER_LONG_DOC_TOKENS", str(2 * DEFAULT_TOKEN_BUDGET)))
+# Size of each chunk, and how many chunks are summarized at the same time
+CHUNK_TOKENS = int(os.getenv("ENRICHER_CHUNK_TOKENS", str(DEFAULT_TOKEN_BUDGET)))
+CHUNK_CONCURRENCY = int(os.getenv("ENRICHER_CHUNK_CONCURRENCY", "4"))
+
+MAP_PROMPT = """
+    You are the "Morning Digest" AI Researcher.
+
+    You will receive one section of a long article.
+    Extract up to 3 candidate "Key Takeaways" from this section only: short bullet points
+    that would be valuable for a Chief AI Officer. Skip sections with nothing of substance.
+
+    OUTPUT FORMAT:
+    Return ONLY a JSON list of strings (possibly empty).
+    """
+
+REDUCE_PROMPT = """
+    You are the "Morning Digest" AI Researcher.
+
+    You will receive the title of a long article and candidate key takeaways extracted
+    from each of its sections, in order.
+    Merge them into exactly 3 "Key Takeaways" for the whole article, valuable for a
+    Chief AI Officer: drop repetitions and keep the most important points.
+
+    OUTPUT FORMAT:
+    Return ONLY a JSON list of exactly 3 strings.
+    """
+
+
+def is_long_document(text: str) -> bool:
+    """Returns True if the text is too long for a single enrichment turn."""
+    return estimate_tokens(text) > LONG_DOC_TOKENS
+
+
+def _as_points(text: str) -> list:
+    """Parses a model reply into a list of takeaway strings."""
+    points = parse_agent_json(text)
+    if isinstance(points, dict):
+        points = points.get("key_takeaways", [])
+    return [str(point) for point in points] if isinstance(points, list) else []
+
+
+async def summarize_long_document(model: str, title: str, text: str, chunk_tokens: int = CHUNK_TOKENS,
+                                  concurrency: int = CHUNK_CONCURRENCY, limiter: asyncio.Semaphore = None) -> list:
+    """
+    Map-reduce summarization: extracts candidate takeaways from every chunk of
+    the text concurrently (at most `concurrency` model calls at a time), then
+    merges them into 3 key takeaways in one final call.
+
+    Each chunk is sent on its own with a fixed instruction, so its partial
+    result is cached by the LLM response cache under the chunk's content:
+    re-enriching the document, or a copy of it, only repeats the reduce step.
+
+    Args:
+        model (str): Model used for both steps.
+        title (str): Article title, given to the reduce step.
+        text (str): Full plain text of the article.
+        limiter (asyncio.Semaphore): Bounds every model call of both steps
+            instead of `concurrency`, when the caller already limits its own
+            model calls with it.
+
+    Returns:
+        list: The 3 key takeaways (fewer if the model returned fewer; none
+        if no section yielded any).
+
+    Raises:
+        Exception: Whatever the reduce call raised (failed map calls only
+            lose their section).
+    """
+    chunks = split_into_chunks(text, chunk_tokens)
+    semaphore = limiter or asyncio.Semaphore(max(1, concurrency))
+
+    async def extract(chunk: str) -> list:
+        async with semaphore:
+            try:
+                return _as_points(await generate_text(model, MAP_PROMPT, chunk))
+            except Exception as e:
+                # One unreadable section should not cost the whole article
+                logger.warning(f"Chunk summarization failed for '{title}': {e}")
+                return []
+
+    print(f">> MAP-REDUCE: Summarizing '{title}' in {len(chunks)} chunks...")
+    partials = await asyncio.gather(*(extract(chunk) for chunk in chunks))
+
+    candidates = "\n".join(
+        f"- [section {i}] {point}" for i, points in enumerate(partials, 1) for point in points
+    )
+    if not candidates:
+        # Nothing to merge: a reduce over no input would only invent takeaways
+        logger.warning(f"No section of '{title}' yielded takeaways")
+        return []
+    async with semaphore:
+        reply = await generate_text(model, REDUCE_PROMPT, f"TITLE: {title}\n\nCANDIDATE TAKEAWAYS:\n{candidates}")
+    return _as_points(reply)[:3]
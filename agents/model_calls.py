@@ -0,0 +1,54 @@
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+from llm_cache import get_response_cache, cache_key, bypass_enabled, store_response
+import metrics
+
+
+async def generate_text(model: str, instruction: str, prompt: str) -> str:
+    """
+    Runs a single, tool-less model turn outside of an agent conversation.
+
+    The model is resolved through the ADK model registry, so any model
+    usable by the agents (including registered test doubles) works here.
+    Responses go through the LLM response cache like the agents' turns.
+
+    Args:
+        model (str): Model name, e.g. "gemini-2.0-flash-001".
+        instruction (str): System instruction for the turn.
+        prompt (str): User message.
+
+    Returns:
+        str: The concatenated text of the model response.
+    """
+    contents = [types.Content(role="user", parts=[types.Part.from_text(text=prompt)])]
+    cache = get_response_cache()
+    key = cache_key(model, instruction, contents) if cache else None
+    cached = cache.get(key) if cache and not bypass_enabled() else None
+    if cached is not None:
+        metrics.record("llm.generate", 0.0, model=model, cached=True)
+        return _response_text(LlmResponse.model_validate_json(cached))
+
+    llm = LLMRegistry.new_llm(model)
+    request = LlmRequest(
+        model=model,
+        contents=contents,
+        config=types.GenerateContentConfig(system_instruction=instruction),
+    )
+    text = ""
+    with metrics.span("llm.generate", model=model) as span:
+        async for response in llm.generate_content_async(request, stream=False):
+            text += _response_text(response)
+            usage = response.usage_metadata
+            if usage:
+                span.set(prompt_tokens=usage.prompt_token_count or 0, output_tokens=usage.candidates_token_count or 0)
+            if cache and response.content and not response.error_code:
+                store_response(cache, key, response)
+    return text
+
+
+def _response_text(response: LlmResponse) -> str:
+    if response.content and response.content.parts:
+        return "".join(part.text or "" for part in response.content.parts)
+    return ""
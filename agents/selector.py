@@ -1,9 +1,21 @@
 from google.adk.agents import LlmAgent
 from google.genai import types
-from client import ReadwiseClient
+from google.adk.tools import ToolContext
+from client import get_client, get_user_client
 import os
 import json
-from utils import fetch_prompt
+import logging
+from llm_cache import before_model_cache, after_model_cache
+from metrics import before_tool_timer, after_tool_timer
+from utils import prompts, parse_agent_json
+from ranking import shortlist
+from dedup import collapse_duplicates, DEFAULT_THRESHOLD
+from prefetch import get_prefetcher
+from history import get_history
+from session_store import skip_completed_stage
+from candidates import encode_candidates, restore_selection
+
+logger = logging.getLogger(__name__)
 
 SELECTOR_PROMPT_URL = "https://gist.github.com/xPierG/76981876e4289fd9c72262d9dfbb753b/raw/prompt_morning_digest_selector.txt"
 
@@ -13,6 +25,15 @@ DEFAULT_SELECTOR_PROMPT = """
     Your goal is to select exactly 5 articles from the fetched list to send in a daily email.
     
     STEP 1: Call the `fetch_readwise_data` tool to get the latest articles.
+    They come as a table: a header row naming the columns, then one row per article,
+    with cells separated by "|". The first column is the article's "id".
+    The list is already a shortlist: "scores" lists a precomputed relevance score
+    ("category=score") for every category the article is eligible for. Use the scores as a strong hint.
+    Syndicated copies of the same story are already merged: "source_count" tells how many
+    outlets carried it, a signal of how widely the story is being covered.
+    Articles already sent in earlier digests are excluded; "novelty" (0 to 1) tells how
+    different each story is from what earlier digests covered.
+    Summaries may be shortened ("…").
     
     STEP 2: Select exactly 5 articles following this strict priority order:
     1. [1 Article] "🤯 Non puoi ignorarlo" (Category: 'must_read'): 
@@ -30,45 +51,109 @@ DEFAULT_SELECTOR_PROMPT = """
     OUTPUT FORMAT:
     Return a JSON object with a key "selection" containing a list of exactly 5 objects.
     Each object must have:
-    - "id": The ID of the original document.
-    - "title": The title.
+    - "id": The id of the article in the table.
     - "category_label": The label for the category.
     - "reasoning": A brief explanation of why this was picked.
-    - "source_url": The URL.
-    - "summary": The original summary.
+    The title, URL and full summary of each article are added automatically.
     
     Output ONLY the JSON.
     """
 
-# Initialize client
-client = ReadwiseClient()
+# Fetched lazily (and concurrently with the other prompts) on first use
+prompts.register("selector", SELECTOR_PROMPT_URL, DEFAULT_SELECTOR_PROMPT)
+
+# Shared client (one per token, backed by the persistent document cache)
+client = get_client()
+
+# Model of both agents (any name registered with ADK, e.g. a local test double)
+DIGEST_MODEL = os.getenv("DIGEST_MODEL", "gemini-2.0-flash-001")
+
+# Maximum number of candidates per category passed to the LLM
+SHORTLIST_K = int(os.getenv("SELECTOR_SHORTLIST_K", "10"))
+# Title/summary similarity above which documents are merged as one story
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", str(DEFAULT_THRESHOLD)))
+
+# The model's selection (with table row IDs) and the fields held back from it
+SELECTION_DRAFT_KEY = "selection_draft"
+CANDIDATE_ROWS_KEY = "temp:candidate_rows"
 
 # Define tool wrapper
-def fetch_readwise_data():
+def fetch_readwise_data(tool_context: ToolContext = None):
     """
     Fetches the latest articles from Readwise Reader (last 24h).
-    Returns a simplified list of articles with id, title, summary, source_location, and word_count.
+    Returns a pre-ranked shortlist of articles as a table with a header row: id,
+    source_location, word_count, source_count (copies of the story merged into it),
+    novelty (compared to earlier digests), the per-category scores they are eligible
+    for, title and (possibly shortened) summary.
     """
     print(">> TOOL CALL: Fetching data from Readwise...")
-    docs = client.fetch_last_24h()
-    
-    simplified_docs = []
-    for doc in docs:
-        simplified_docs.append({
-            'id': doc.get('id'),
-            'title': doc.get('title'),
-            'summary': doc.get('summary'),
-            'source_location': doc.get('source_location'),
-            'word_count': doc.get('word_count', 0),
-            'source_url': doc.get('source_url')
-        })
-    return json.dumps(simplified_docs)
+    # In multi-user runs each session reads with its own user's token
+    readwise = get_user_client(tool_context.user_id, client) if tool_context else client
+    candidates = shortlist_candidates(readwise, tool_context.user_id if tool_context else None)
+    # Fetch the likely enrichment targets while the model makes its choice
+    prefetcher = get_prefetcher()
+    if prefetcher is not None:
+        prefetcher.schedule(readwise, candidates)
+    table, rows = encode_candidates(candidates)
+    if tool_context is not None:
+        # Real IDs, URLs and full summaries, re-attached by `restore_selected_articles`
+        tool_context.state[CANDIDATE_ROWS_KEY] = rows
+    return table
+
+def shortlist_candidates(readwise, user_id: str = None) -> list:
+    """
+    Fetches the user's last 24h of documents and returns the candidates shown
+    to the selector: near-duplicates merged, articles already sent dropped,
+    then shortlisted per category.
+    """
+    # Compact records streamed page by page, kept as records through every stage
+    docs = list(readwise.iter_last_24h())
+    stories = collapse_duplicates(docs, threshold=DEDUP_THRESHOLD)
+    if len(stories) < len(docs):
+        print(f">> Merged {len(docs) - len(stories)} near-duplicate articles.")
+    history = get_history()
+    if history is not None:
+        unsent = history.filter_candidates(user_id, stories)
+        if len(unsent) < len(stories):
+            print(f">> Skipped {len(stories) - len(unsent)} articles already sent.")
+        stories = unsent
+    candidates = shortlist(stories, top_k=SHORTLIST_K)
+    print(f">> Shortlisted {len(candidates)} of {len(stories)} articles.")
+    return candidates
+
+def restore_selected_articles(callback_context):
+    """
+    After-agent callback: maps the row IDs of the model's selection back to
+    the Reader documents, re-attaches the fields held back from the model and
+    stores the result as `selection_result`, the selector's output for the
+    next stages.
+    """
+    draft = callback_context.state.get(SELECTION_DRAFT_KEY)
+    if not draft:
+        return None
+    result = draft
+    try:
+        data = parse_agent_json(draft)
+        selection = data.get("selection") if isinstance(data, dict) else None
+        if isinstance(selection, list):
+            rows = callback_context.state.get(CANDIDATE_ROWS_KEY) or {}
+            result = json.dumps({"selection": restore_selection(selection, rows)}, ensure_ascii=False)
+    except (json.JSONDecodeError, AttributeError) as e:
+        logger.warning(f"SelectorAgent output is not valid JSON, passed on as is: {e}")
+    callback_context.state["selection_result"] = result
+    return types.Content(role="model", parts=[types.Part.from_text(text=result)])
 
 # Define Selector Agent
 selector_agent = LlmAgent(
     name="SelectorAgent",
-    model="gemini-2.0-flash-001",
-    instruction=fetch_prompt(SELECTOR_PROMPT_URL, DEFAULT_SELECTOR_PROMPT),
+    model=DIGEST_MODEL,
+    instruction=prompts.provider("selector"),
     tools=[fetch_readwise_data],
-    output_key="selection_result"
+    output_key=SELECTION_DRAFT_KEY,
+    before_agent_callback=skip_completed_stage,
+    after_agent_callback=restore_selected_articles,
+    before_model_callback=before_model_cache,
+    after_model_callback=after_model_cache,
+    before_tool_callback=before_tool_timer,
+    after_tool_callback=after_tool_timer
 )
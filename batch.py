@@ -0,0 +1,175 @@
+"""
+Runs the Morning Digest for many users concurrently in one process.
+
+The roster is a JSON list of users:
+
+    [
+      {
+        "user_id": "alice",
+        "readwise_token_env": "ALICE_READWISE_TOKEN",
+        "recipient": "alice@example.com",
+        "prompts": {"selector": "optional prompt override", "enricher": "..."},
+        "send_at": "07:00",
+        "timezone": "Europe/Rome"
+      }
+    ]
+
+`readwise_token` may be given inline instead of `readwise_token_env`.
+`send_at` and `timezone` (optional) are only used by the daemon (daemon.py).
+
+Usage:
+    python batch.py roster.json [--concurrency 8]
+"""
+import os
+import json
+import asyncio
+import logging
+import argparse
+import traceback
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def load_roster(path: str) -> list:
+    """
+    Loads and validates the user roster.
+
+    Returns:
+        list: One dict per user with 'user_id', 'readwise_token', 'recipient', 'prompts',
+        'send_at' and 'timezone' (None when not set).
+
+    Raises:
+        ValueError: If an entry is missing its user_id, token or recipient.
+    """
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+
+    roster = []
+    for entry in entries:
+        user_id = entry.get("user_id")
+        token = entry.get("readwise_token") or os.getenv(entry.get("readwise_token_env", ""), "")
+        recipient = entry.get("recipient")
+        if not (user_id and token and recipient):
+            raise ValueError(f"Roster entry {user_id or entry!r} needs user_id, a Readwise token and recipient")
+        roster.append({
+            "user_id": user_id,
+            "readwise_token": token,
+            "recipient": recipient,
+            "prompts": entry.get("prompts") or {},
+            "send_at": entry.get("send_at"),
+            "timezone": entry.get("timezone"),
+        })
+    return roster
+
+
+def _tool_run_config(concurrency: int):
+    """Runs synchronous tools off the event loop when the installed ADK supports it."""
+    try:
+        from google.adk.agents.run_config import RunConfig, ToolThreadPoolConfig
+    except ImportError:
+        return None
+    return RunConfig(tool_thread_pool_config=ToolThreadPoolConfig(max_workers=concurrency))
+
+
+async def run_user_digest(runner, user: dict, run_config=None) -> bool:
+    """
+    Runs one roster user's pipeline and emails the digest.
+
+    Returns:
+        bool: True if the digest was delivered (failures are logged).
+    """
+    from main import run_pipeline, deliver_digest, digest_delivered, mark_delivered
+    from session_store import daily_session_id
+
+    user_id = user["user_id"]
+    state = {f"prompt_override_{name}": prompt for name, prompt in user["prompts"].items()}
+    # One session per user and day: a retried run resumes where the user's last one stopped
+    session_id = daily_session_id()
+    try:
+        if await digest_delivered(runner, user_id, session_id):
+            logger.info(f"Today's digest for {user_id} was already delivered; skipping")
+            return True
+        result_json = await run_pipeline(runner, user_id=user_id, session_id=session_id, state=state,
+                                         run_config=run_config, resume=True)
+        if not result_json:
+            logger.error(f"No 'final_digest' for {user_id}")
+            return False
+        sent = await asyncio.to_thread(deliver_digest, result_json, user["recipient"], False, user_id)
+        if sent:
+            await mark_delivered(runner, user_id, session_id)
+        return sent
+    except Exception as e:
+        logger.error(f"Digest failed for {user_id}: {e}")
+        traceback.print_exc()
+        return False
+
+
+async def run_batch(roster: list, concurrency: int = 8) -> dict:
+    """
+    Runs every user's pipeline on one runner, at most `concurrency` at a time.
+
+    Returns:
+        dict: user_id -> True if the digest was delivered.
+    """
+    from client import get_client, register_user_token
+    from main import create_runner
+    from utils import prompts
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    for user in roster:
+        register_user_token(user["user_id"], user["readwise_token"])
+
+    # Pull every user's Readwise delta up front, so the selector tool calls
+    # (which run synchronously) only read the warm document cache.
+    async def warm(user):
+        async with semaphore:
+            try:
+                await asyncio.to_thread(get_client(user["readwise_token"]).sync)
+            except Exception as e:
+                logger.warning(f"Readwise sync failed for {user['user_id']}: {e}")
+
+    # The prompts are loaded meanwhile, so no run starts on the defaults
+    await asyncio.gather(asyncio.to_thread(prompts.load), *(warm(user) for user in roster))
+
+    runner = create_runner()
+    run_config = _tool_run_config(concurrency)
+
+    async def run_user(user):
+        async with semaphore:
+            return await run_user_digest(runner, user, run_config)
+
+    results = await asyncio.gather(*(run_user(user) for user in roster))
+    return {user["user_id"]: ok for user, ok in zip(roster, results)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the Morning Digest for every user of a roster.")
+    parser.add_argument("roster", help="Path to the roster JSON file")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", "8")),
+                        help="Maximum number of pipelines (LLM and HTTP work) running at once")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    roster = load_roster(args.roster)
+    print(f"Running Morning Digest for {len(roster)} users (concurrency {args.concurrency})...")
+    results = asyncio.run(run_batch(roster, concurrency=args.concurrency))
+
+    import metrics
+    recorder = metrics.get_recorder()
+    if recorder is not None:
+        print("\n" + recorder.summary())
+        metrics.export_run(recorder)
+
+    failed = [user_id for user_id, ok in results.items() if not ok]
+    print(f"\n✅ {len(results) - len(failed)} digests sent, ❌ {len(failed)} failed.")
+    if failed:
+        print("Failed: " + ", ".join(failed))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
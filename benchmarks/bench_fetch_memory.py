@@ -0,0 +1,106 @@
+"""
+Measures the peak memory (tracemalloc) of fetching the last 24 hours of
+Reader documents and building the SelectorAgent's candidate list, for
+growing libraries and several users fetched at once, with:
+
+- `full`: every page decoded whole with `response.json()`, every API dict
+  (all fields) kept until the candidate list of simplified dicts is built;
+- `streaming`: the client's path, pages parsed as they stream in and every
+  result projected onto a compact DocumentRecord (see documents.py), which
+  the selector keeps as its candidate list.
+
+Besides the peak, the transient memory (the peak above the candidate lists
+that are kept) is reported: it should not grow with the library size.
+
+The Reader stand-in serves documents with the fields of the real API.
+
+Usage:
+    python benchmarks/bench_fetch_memory.py [--sizes 1000 10000 50000] [--users 1 4]
+"""
+import os
+import sys
+import argparse
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.update({
+    "READWISE_CACHE_DISABLED": "1",
+    "READWISE_RATE_PER_MINUTE": "0",
+})
+
+from benchmarks.standins import ReaderStandIn, make_corpus
+from client import ReadwiseClient, LOCATIONS, PAGE_SIZE
+
+
+def _candidate(doc: dict) -> dict:
+    """The simplified dict the selector used to build for each document."""
+    return {key: doc.get(key) for key in ("id", "title", "summary", "source_location", "word_count", "source_url")}
+
+
+def fetch_full(client: ReadwiseClient) -> list:
+    """The pre-streaming path: whole pages decoded, raw dicts kept and labelled."""
+    after_date = (datetime.now(timezone.utc) - timedelta(hours=24)).isoformat()
+    all_docs = []
+    for location, label in LOCATIONS:
+        params = {"updatedAfter": after_date, "location": location, "page_size": PAGE_SIZE}
+        while True:
+            payload, _ = client._get_list_page(params)
+            results = payload.get("results", [])
+            for d in results: d['source_location'] = label
+            all_docs.extend(results)
+            if not payload.get("nextPageCursor"):
+                break
+            params = {**params, "pageCursor": payload["nextPageCursor"]}
+    return [_candidate(d) for d in all_docs]
+
+
+def fetch_streaming(client: ReadwiseClient) -> list:
+    return list(client.iter_last_24h())
+
+
+def measure(fetch, reader: ReaderStandIn, tokens: list) -> tuple:
+    """
+    Fetches for every token at once. Returns the peak bytes above the start,
+    the transient part of the peak (above the candidate lists that are kept)
+    and the number of candidates per user.
+    """
+    clients = [ReadwiseClient(token=token) for token in tokens]
+    tracemalloc.reset_peak()
+    start = tracemalloc.get_traced_memory()[0]
+    with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+        results = list(executor.map(fetch, clients))
+    current, peak = tracemalloc.get_traced_memory()
+    return peak - start, peak - current, len(results[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4], help="Users fetched concurrently")
+    args = parser.parse_args()
+
+    with ReaderStandIn() as reader:
+        os.environ["READWISE_BASE_URL"] = reader.base_url
+        tracemalloc.start()
+        print(f"{'docs':>6} {'users':>5} {'full MB':>9} {'stream MB':>10} {'saving':>7} "
+              f"{'full transient MB':>18} {'stream transient MB':>20}")
+        for size in args.sizes:
+            corpus = make_corpus(size, seed=size)
+            for users in args.users:
+                tokens = [f"bench-{size}-{users}-{i}" for i in range(users)]
+                for token in tokens:
+                    reader.add_corpus(token, corpus)
+                full, full_transient, count = measure(fetch_full, reader, tokens)
+                streaming, stream_transient, streamed = measure(fetch_streaming, reader, tokens)
+                assert count == streamed == size, (count, streamed, size)
+                print(f"{size:>6} {users:>5} {full / 1e6:>9.1f} {streaming / 1e6:>10.1f} {1 - streaming / full:>7.0%} "
+                      f"{full_transient / 1e6:>18.1f} {stream_transient / 1e6:>20.1f}")
+        tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    main()
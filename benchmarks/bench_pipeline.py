@@ -0,0 +1,167 @@
+"""
+Runs the whole pipeline offline, against the local Reader, model and SMTP
+stand-ins (benchmarks/standins.py), on synthetic corpora, and reports the
+throughput, p50/p95 latency and peak memory (tracemalloc) of every stage.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes 10 100 1000 10000] [--runs 3]
+        [--reader-latency-ms 50] [--model-latency-ms 0] [--json out.json]
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The stand-ins replace every external service; nothing below may reach the network
+os.environ.update({
+    "DIGEST_MODEL": "fake-digest",
+    "READWISE_CACHE_DISABLED": "1",
+    # The stand-in has no quota: measure the pipeline, not the rate limiter
+    "READWISE_RATE_PER_MINUTE": "0",
+    "LLM_CACHE_DISABLED": "1",
+    "SMTP_STARTTLS": "false",
+    "EMAIL_SENDER_ADDRESS": "digest@example.com",
+    "EMAIL_SENDER_APP_PASSWORD": "bench",
+    "EMAIL_RECIPIENT_ADDRESS": "reader@example.com",
+    "EMAIL_OUTBOX_DIR": tempfile.mkdtemp(),
+    "PROMPT_CACHE_DIR": tempfile.mkdtemp(),
+    "HISTORY_PATH": os.path.join(tempfile.mkdtemp(), "sent_history.bin"),
+    "SESSION_DB_PATH": os.path.join(tempfile.mkdtemp(), "sessions.sqlite3"),
+})
+
+from benchmarks.standins import FakeDigestModel, LocalSMTPSink, ReaderStandIn, make_corpus
+
+STAGES = ("SelectorAgent", "EnricherAgent", "render+email")
+
+
+def _p95(values: list) -> float:
+    """Nearest-rank 95th percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, -(-95 * len(ordered) // 100) - 1)]
+
+
+def _reset_peak() -> int:
+    """Starts a new peak measurement; returns the memory currently traced."""
+    tracemalloc.reset_peak()
+    return tracemalloc.get_traced_memory()[0]
+
+
+class StageTrace:
+    """
+    Pipeline trace that also splits time and peak memory (above what was
+    allocated when the stage began) by the agent producing the events.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.stage = None
+        self.stage_start = 0.0
+        self.baseline = 0
+        self.results = {}
+
+    def record(self, event):
+        self.base.record(event)
+        elapsed = self.base.events[-1]["elapsed"]
+        if event.author != self.stage:
+            self.close(elapsed)
+            self.stage = event.author
+            self.stage_start = self.base.events[-2]["elapsed"] if len(self.base.events) > 1 else 0.0
+            self.baseline = _reset_peak()
+
+    def close(self, elapsed: float):
+        if self.stage is not None:
+            self.results[self.stage] = (elapsed - self.stage_start, tracemalloc.get_traced_memory()[1] - self.baseline)
+
+
+async def run_once(runner, user_id: str, state: dict) -> dict:
+    """Runs the pipeline and delivery once; returns stage -> (seconds, peak bytes)."""
+    import main
+
+    trace = StageTrace(main.PipelineTrace())
+    result = await main.run_pipeline(runner, user_id, None, state=state, trace=trace)
+    trace.close(trace.base.events[-1]["elapsed"] if trace.base.events else 0.0)
+
+    baseline = _reset_peak()
+    start = asyncio.get_running_loop().time()
+    if not await asyncio.to_thread(main.deliver_digest, result, None, False, user_id):
+        raise RuntimeError("Digest not delivered to the SMTP sink")
+    trace.results["render+email"] = (asyncio.get_running_loop().time() - start, tracemalloc.get_traced_memory()[1] - baseline)
+    return trace.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1, help="Uncounted runs per size (imports, first turns)")
+    parser.add_argument("--reader-latency-ms", type=float, default=50, help="Added to every Reader request")
+    parser.add_argument("--model-latency-ms", type=float, default=0, help="Added to every model turn")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    FakeDigestModel.latency = args.model_latency_ms / 1000
+
+    with ReaderStandIn(latency=args.reader_latency_ms / 1000) as reader, LocalSMTPSink() as sink:
+        os.environ.update({"READWISE_BASE_URL": reader.base_url, "SMTP_SERVER": sink.host, "SMTP_PORT": str(sink.port)})
+
+        from client import register_user_token
+        from agents.selector import DEFAULT_SELECTOR_PROMPT
+        from agents.enricher import DEFAULT_ENRICHER_PROMPT
+        import main as digest_main
+
+        runner = digest_main.create_runner()
+        state = {"prompt_override_selector": DEFAULT_SELECTOR_PROMPT,
+                 "prompt_override_enricher": DEFAULT_ENRICHER_PROMPT}
+
+        tracemalloc.start()
+        report = {}
+        print(f"{'docs':>6} {'stage':<14} {'p50 ms':>9} {'p95 ms':>9} {'peak MB':>8} {'docs/s':>9}")
+        for size in args.sizes:
+            corpus = make_corpus(size, seed=size)
+            samples = {stage: [] for stage in STAGES}
+            totals = []
+            for run in range(args.warmup + args.runs):
+                # A fresh token (hence client and content store) per run: every run is cold
+                token = f"bench-{size}-{run}"
+                reader.add_corpus(token, corpus)
+                register_user_token(token, token)
+                results = asyncio.run(run_once(runner, token, state))
+                if run < args.warmup:
+                    continue
+                for stage, sample in results.items():
+                    samples.setdefault(stage, []).append(sample)
+                totals.append(sum(seconds for seconds, _ in results.values()))
+
+            report[size] = {}
+            for stage, values in samples.items():
+                if not values:
+                    continue
+                seconds = [s for s, _ in values]
+                stats = {
+                    "p50_ms": statistics.median(seconds) * 1000,
+                    "p95_ms": _p95(seconds) * 1000,
+                    "peak_mb": max(peak for _, peak in values) / 1e6,
+                }
+                report[size][stage] = stats
+                print(f"{size:>6} {stage:<14} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['peak_mb']:>8.1f}")
+            throughput = size / statistics.median(totals)
+            report[size]["docs_per_second"] = throughput
+            print(f"{size:>6} {'total':<14} {statistics.median(totals) * 1000:>9.1f} {_p95(totals) * 1000:>9.1f} "
+                  f"{'':>8} {throughput:>9.0f}")
+        tracemalloc.stop()
+
+    print(f"\n{len(sink.messages)} digests delivered to the SMTP sink, {len(reader.requests)} Reader requests.")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Measures digest rendering (HTML + plain text + MIME) for digests of 5 to
+10,000 synthetic articles, so rendering stays off the hot path of batch runs.
+
+Usage:
+    python benchmarks/bench_render.py [--sizes 5 50 500 10000] [--runs 5]
+        [--max-us-per-article 200]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from render import render_digest
+from notification import build_message
+
+
+def make_articles(n: int) -> list:
+    """Synthetic articles, a third of them enriched with key takeaways."""
+    articles = []
+    for i in range(n):
+        article = {
+            "id": str(i),
+            "title": f"Article {i}: Foundation Models & <Banking>",
+            "category_label": "📌 Rilevanza CEO / Credem",
+            "reasoning": "Rilevante per la strategia AI della banca.",
+            "summary": "A summary of the article.\nIt spans two lines. " * 3,
+            "source_url": f"https://example.com/articles/{i}?utm_source=rss&ref=digest",
+        }
+        if i % 3 == 0:
+            article["key_takeaways"] = [f"Takeaway {k} for article {i}" for k in range(3)]
+        articles.append(article)
+    return articles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50, 500, 10000])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-us-per-article", type=float, default=None,
+                        help="Fail if any size renders slower than this per article")
+    args = parser.parse_args()
+
+    print(f"{'articles':>9} {'render ms':>10} {'mime ms':>9} {'us/article':>11} {'html KB':>9}")
+    failed = False
+    for size in args.sizes:
+        articles = make_articles(size)
+        render_times, mime_times = [], []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            digest = render_digest(articles)
+            render_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            build_message(digest.html, digest.text).as_string()
+            mime_times.append(time.perf_counter() - start)
+
+        render_ms = statistics.median(render_times) * 1000
+        mime_ms = statistics.median(mime_times) * 1000
+        per_article = (render_ms + mime_ms) * 1000 / size
+        print(f"{size:>9} {render_ms:>10.2f} {mime_ms:>9.2f} {per_article:>11.1f} {len(digest.html) / 1024:>9.0f}")
+        if args.max_us_per_article is not None and per_article > args.max_us_per_article:
+            print(f"REGRESSION: {size} articles at {per_article:.1f} us/article > {args.max_us_per_article}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compares the size of the SelectorAgent's candidate list in the JSON format
+(`json.dumps` of the shortlisted dicts) and in the compact table of
+candidates.py, on synthetic corpora run through the selector's own
+dedup and shortlist steps.
+
+Token counts are estimated offline (content.estimate_tokens, and the count
+of words and punctuation marks, which JSON's quoting inflates); with
+--count-with-model and GOOGLE_API_KEY set, the model's tokenizer is also
+asked for exact counts, and the saving is computed on those.
+
+Usage:
+    python benchmarks/bench_selector_tokens.py [--sizes 100 1000 10000] [--top-k 10]
+        [--summary-tokens 60] [--count-with-model gemini-2.0-flash-001]
+"""
+import os
+import re
+import sys
+import json
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.standins import make_corpus
+from candidates import encode_candidates, SUMMARY_TOKENS
+from content import estimate_tokens
+from dedup import collapse_duplicates
+from ranking import shortlist
+
+# Reader summaries run to a few sentences; the synthetic ones are padded to this
+SUMMARY_WORDS = 60
+
+# Pieces a BPE tokenizer rarely merges: words, numbers and single punctuation marks
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def shortlisted(size: int, top_k: int) -> list:
+    """The selector's candidates for a synthetic corpus of `size` documents."""
+    docs = []
+    for doc in make_corpus(size, seed=size):
+        summary = (doc["summary"] + " ") * (SUMMARY_WORDS // max(1, len(doc["summary"].split())) + 1)
+        docs.append({
+            "id": doc["id"],
+            "title": doc["title"],
+            "summary": " ".join(summary.split()[:SUMMARY_WORDS]),
+            "source_location": "feed" if doc["location"] == "new" else "library",
+            "word_count": doc["word_count"],
+            "source_url": doc["source_url"],
+        })
+    return shortlist(collapse_duplicates(docs), top_k=top_k)
+
+
+def counter(model: str = None):
+    """Returns the token counting function: the model's tokenizer, or the offline estimate."""
+    if not model:
+        return None
+    from google import genai
+    client = genai.Client()
+    return lambda text: client.models.count_tokens(model=model, contents=text).total_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--top-k", type=int, default=10, help="Shortlist size per category (SELECTOR_SHORTLIST_K)")
+    parser.add_argument("--summary-tokens", type=int, default=SUMMARY_TOKENS,
+                        help="Summary budget of the table (SELECTOR_SUMMARY_TOKENS)")
+    parser.add_argument("--count-with-model", help="Also count tokens with this model's tokenizer")
+    args = parser.parse_args()
+
+    count = counter(args.count_with_model)
+    columns = f"{'docs':>6} {'cands':>5} {'format':<6} {'chars':>8} {'~tokens':>8} {'pieces':>8}"
+    print(columns + (f" {'tokens':>8}" if count else "") + f" {'saving':>7}")
+    for size in args.sizes:
+        candidates = shortlisted(size, args.top_k)
+        table, _ = encode_candidates(candidates, args.summary_tokens)
+        formats = {"json": json.dumps(candidates), "table": table}
+        measured = {}
+        for name, text in formats.items():
+            measured[name] = count(text) if count else len(_PIECE_RE.findall(text))
+            line = (f"{size:>6} {len(candidates):>5} {name:<6} {len(text):>8} {estimate_tokens(text):>8} "
+                    f"{len(_PIECE_RE.findall(text)):>8}")
+            if count:
+                line += f" {measured[name]:>8}"
+            if name == "table":
+                line += f" {1 - measured['table'] / measured['json']:>7.0%}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Measures the cold start of main.py: per-module import costs (as reported by
+`python -X importtime`) and the time from interpreter launch to the first
+outgoing HTTP request. Exits non-zero when a regression threshold is exceeded.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--top 15]
+        [--max-import-ms 300] [--max-first-request-ms 4000]
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+# Runs main.main() and reports the wall-clock time of the first HTTP request
+# (requests or httpx, i.e. Readwise, prompt gists or Gemini), then exits.
+_PROBE = r"""
+import os, sys, time
+sys.path.insert(0, {root!r})
+
+def _report(*args, **kwargs):
+    print("FIRST_HTTP_REQUEST", time.time(), flush=True)
+    os._exit(0)
+
+import requests, httpx
+requests.Session.send = _report
+httpx.Client.send = _report
+httpx.AsyncClient.send = _report
+
+import main
+main.main([])
+print("NO_HTTP_REQUEST", flush=True)
+"""
+
+
+def measure_imports(runs: int):
+    """Returns the per-module cumulative import times (us, median of `runs`) and the total."""
+    samples = {}
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        for line in result.stderr.splitlines():
+            match = _IMPORTTIME_RE.match(line)
+            if match:
+                samples.setdefault(match.group(4), []).append(int(match.group(2)))
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def measure_first_request(runs: int):
+    """Returns the launch-to-first-HTTP-request times in ms, one per run."""
+    env = {
+        **os.environ,
+        "READWISE_TOKEN": os.getenv("READWISE_TOKEN", "bench-token"),
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "bench-key"),
+        # Measure a true cold start: no warm prompt or response caches
+        "PROMPT_CACHE_DIR": tempfile.mkdtemp(),
+        "READWISE_CACHE_PATH": os.path.join(tempfile.mkdtemp(), "readwise.sqlite3"),
+        "LLM_CACHE_DISABLED": "1",
+    }
+    timings = []
+    for _ in range(runs):
+        start = time.time()
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(root=ROOT)],
+            cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+        )
+        match = re.search(r"FIRST_HTTP_REQUEST ([\d.]+)", result.stdout)
+        if not match:
+            sys.exit(f"No HTTP request observed:\n{result.stdout[-2000:]}\n{result.stderr[-2000:]}")
+        timings.append((float(match.group(1)) - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to list")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="Fail if `import main` exceeds this")
+    parser.add_argument("--max-first-request-ms", type=float, default=None, help="Fail if the first HTTP request is later")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    imports = measure_imports(args.runs)
+    import_ms = imports.get("main", 0) / 1000
+    first_request = measure_first_request(args.runs)
+    first_request_ms = statistics.median(first_request)
+
+    print(f"Slowest imports under `import main` (cumulative, median of {args.runs}):")
+    for name, us in sorted(imports.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+    print(f"\nimport main:                {import_ms:.1f} ms")
+    print(f"Launch to first HTTP request: {first_request_ms:.0f} ms (min {min(first_request):.0f}, max {max(first_request):.0f})")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"import_main_ms": import_ms, "first_request_ms": first_request,
+                       "modules_us": imports}, f, indent=2)
+
+    failed = False
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"REGRESSION: import main took {import_ms:.1f} ms > {args.max_import_ms} ms")
+        failed = True
+    if args.max_first_request_ms is not None and first_request_ms > args.max_first_request_ms:
+        print(f"REGRESSION: first HTTP request at {first_request_ms:.0f} ms > {args.max_first_request_ms} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Local stand-ins for the pipeline's external services, to run it offline:
+
+- `ReaderStandIn`: the Readwise Reader v3 `/list/` endpoint (cursor
+  pagination, `updatedAfter`, `ids`, `withHtmlContent`), with configurable
+  latency and one synthetic corpus per API token;
+- `FakeDigestModel`: a deterministic model registered with ADK (model names
+  matching `fake-digest.*`) that makes the tool calls and returns the JSON
+  the selector and enricher are expected to produce;
+- `LocalSMTPSink`: an SMTP server that records every message it receives.
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import threading
+import socketserver
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import AsyncGenerator, ClassVar
+from urllib.parse import urlparse, parse_qs
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+
+from candidates import decode_candidates
+
+FAKE_MODEL = "fake-digest"
+
+_TOPICS = (
+    "Foundation Models", "Banking as a Service", "Fintech", "RegTech", "Algorithmic Risk",
+    "AI Ethics", "Tokenization", "sleep", "productivity", "databases", "compilers", "leadership",
+)
+# Invented vocabulary: thousands of words, so unrelated stories share few n-grams
+_SYLLABLES = [c + v for c in "bdfgklmnprstvz" for v in "aeiou"]
+_WORDS = [a + b + c for a in _SYLLABLES[:20] for b in _SYLLABLES for c in ("", "n", "ra")]
+# Share of documents that are syndicated copies of an earlier story
+SYNDICATED_SHARE = 0.05
+
+
+def make_corpus(size: int, seed: int = 0) -> list:
+    """
+    Builds `size` synthetic Reader documents updated in the last 24 hours,
+    split between the feed and the library, without their HTML content
+    (the stand-in generates it on demand). About SYNDICATED_SHARE of them
+    are copies of an earlier story from another outlet.
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    docs = []
+    for i in range(size):
+        topic = rng.choice(_TOPICS)
+        title = f"{topic.title()}: " + " ".join(rng.sample(_WORDS, 5))
+        summary = f"What changed in {topic}: " + " ".join(rng.sample(_WORDS, 12)) + "."
+        if docs and rng.random() < SYNDICATED_SHARE:
+            original = rng.choice(docs)
+            title, summary = original["title"], original["summary"] + " (syndicated)"
+        updated_at = (now - timedelta(minutes=rng.randint(1, 23 * 60))).isoformat()
+        docs.append({
+            "id": f"doc{i:06d}",
+            "url": f"https://read.readwise.io/read/doc{i:06d}",
+            "title": title,
+            "author": f"Author {i % 97}",
+            "source": "Reader RSS",
+            "site_name": f"News {i % 7}",
+            "source_url": f"https://news{i % 7}.example.com/{i}",
+            "image_url": f"https://news{i % 7}.example.com/images/{i}.jpg",
+            "created_at": updated_at,
+            "saved_at": updated_at,
+            "updated_at": updated_at,
+            "last_moved_at": updated_at,
+            "first_opened_at": None,
+            "last_opened_at": None,
+            "published_date": (now - timedelta(hours=rng.randint(1, 23))).isoformat(),
+            "summary": summary,
+            "notes": "",
+            "category": "article",
+            "word_count": rng.choice((400, 900, 1500, 2500, 6000)),
+            "reading_progress": 0.0,
+            "parent_id": None,
+            "tags": {},
+            "location": "new" if i % 3 else "later",
+        })
+    return docs
+
+
+def html_content(doc: dict) -> str:
+    """Deterministic article body of a synthetic document (a few KB of HTML)."""
+    paragraph = f"<p>{doc['summary']} " + "Details and analysis follow. " * 20 + "</p>"
+    return (f"<html><body><nav>Home | News</nav><article><h1>{doc['title']}</h1>"
+            + paragraph * max(1, doc["word_count"] // 150) + "</article></body></html>")
+
+
+class _ReaderHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        standin = self.server.standin
+        url = urlparse(self.path)
+        if url.path.rstrip("/") != "/api/v3/list":
+            self.send_error(404)
+            return
+        token = self.headers.get("Authorization", "").removeprefix("Token ")
+        corpus = standin.corpora.get(token)
+        if corpus is None:
+            self.send_error(401)
+            return
+
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        standin.requests.append(params)
+        if standin.latency:
+            time.sleep(standin.latency)
+
+        if "ids" in params:
+            wanted = set(params["ids"].split(","))
+            docs = [doc for doc in corpus if doc["id"] in wanted]
+        else:
+            docs = [
+                doc for doc in corpus
+                if doc["location"] == params.get("location", doc["location"])
+                and doc["updated_at"] > params.get("updatedAfter", "")
+            ]
+        offset = int(params.get("pageCursor") or 0)
+        page = docs[offset:offset + standin.page_size]
+        next_cursor = str(offset + standin.page_size) if offset + standin.page_size < len(docs) else None
+
+        with_html = params.get("withHtmlContent") == "true"
+        results = [{**doc, "html_content": html_content(doc)} if with_html else doc for doc in page]
+        body = json.dumps({"count": len(docs), "nextPageCursor": next_cursor, "results": results}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ReaderStandIn:
+    """
+    In-process HTTP server speaking the Reader v3 `/list/` API. Point the
+    client at it with READWISE_BASE_URL=`standin.base_url`.
+    """
+
+    def __init__(self, latency: float = 0.0, page_size: int = 100):
+        self.latency = latency
+        self.page_size = page_size
+        # Corpus served to each API token
+        self.corpora = {}
+        self.requests = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _ReaderHandler)
+        self._server.daemon_threads = True
+        self._server.standin = self
+        host, port = self._server.server_address
+        self.base_url = f"http://{host}:{port}/api/v3"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def add_corpus(self, token: str, docs: list):
+        self.corpora[token] = docs
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# --- Fake model -------------------------------------------------------------
+
+_LABELS = {
+    "must_read": "🤯 Non puoi ignorarlo",
+    "business": "📌 Rilevanza CEO / Credem",
+    "long_read": "🧘 Lettura Lunga / Sviluppo Personale",
+    "other": "💡 Altro",
+}
+_TARGET_LABELS = (_LABELS["must_read"], _LABELS["long_read"])
+
+
+def _parts(llm_request: LlmRequest):
+    for content in llm_request.contents:
+        for part in content.parts or ():
+            yield part
+
+
+def _instruction_parts(llm_request: LlmRequest):
+    instruction = llm_request.config.system_instruction if llm_request.config else None
+    if isinstance(instruction, str):
+        return [types.Part.from_text(text=instruction)]
+    return list(instruction.parts or ()) if instruction else []
+
+
+def _select(candidates: list, count: int = 5) -> list:
+    """Picks the best-scoring candidate per category in priority order, then fills up."""
+    chosen, used = [], set()
+    plan = ["must_read", "business", "long_read"] + ["business", "other", "other", "other"]
+    for category in plan:
+        eligible = [c for c in candidates if category in (c.get("scores") or {}) and c["id"] not in used]
+        if not eligible or len(chosen) == count:
+            continue
+        best = max(eligible, key=lambda c: c["scores"][category])
+        used.add(best["id"])
+        chosen.append({
+            "id": best["id"],
+            "category_label": _LABELS[category],
+            "reasoning": f"Highest {category} score ({best['scores'][category]:.2f}).",
+        })
+    return chosen
+
+
+def _takeaways(text: str) -> list:
+    words = re.findall(r"\w+", text)[:30]
+    return [" ".join(words[i * 10:(i + 1) * 10]) or f"Point {i + 1}" for i in range(3)]
+
+
+class FakeDigestModel(BaseLlm):
+    """
+    Deterministic model playing the SelectorAgent and EnricherAgent roles:
+    it calls the tools available in the request and answers with the JSON
+    those agents must produce. Tool-less requests (the fan-out enricher)
+    get a JSON list of three takeaways.
+    """
+
+    # Simulated latency of every model turn, in seconds
+    latency: ClassVar[float] = 0.0
+
+    @classmethod
+    def supported_models(cls) -> list:
+        return [FAKE_MODEL + r".*"]
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        tools = llm_request.tools_dict
+        parts = list(_parts(llm_request))
+        responses = {p.function_response.name: p.function_response.response for p in parts if p.function_response}
+
+        if "fetch_readwise_data" in tools:
+            if "fetch_readwise_data" not in responses:
+                reply = [types.Part.from_function_call(name="fetch_readwise_data", args={})]
+            else:
+                candidates = decode_candidates(responses["fetch_readwise_data"]["result"])
+                reply = [types.Part.from_text(text=json.dumps({"selection": _select(candidates)}, ensure_ascii=False))]
+        elif "fetch_full_content" in tools:
+            selection = self._selection_in(parts) or self._selection_in(_instruction_parts(llm_request))
+            targets = [a for a in selection if a.get("category_label") in _TARGET_LABELS]
+            fetched = {
+                p.function_call.args.get("doc_id"): None for p in parts
+                if p.function_call and p.function_call.name == "fetch_full_content"
+            }
+            if targets and not fetched:
+                reply = [types.Part.from_function_call(name="fetch_full_content", args={"doc_id": a["id"]}) for a in targets]
+            else:
+                for article in targets:
+                    article["key_takeaways"] = _takeaways(article.get("summary") or "")
+                reply = [types.Part.from_text(text=json.dumps({"selection": selection}, ensure_ascii=False))]
+        else:
+            prompt = " ".join(p.text for p in parts if p.text)
+            reply = [types.Part.from_text(text=json.dumps(_takeaways(prompt)))]
+
+        prompt_chars = sum(len(p.text or "") for p in parts) + sum(len(json.dumps(r)) for r in responses.values())
+        reply_chars = sum(len(p.text or "") for p in reply)
+        yield LlmResponse(
+            content=types.Content(role="model", parts=reply),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_chars // 4, candidates_token_count=max(1, reply_chars // 4),
+            ),
+        )
+
+    @staticmethod
+    def _selection_in(parts: list) -> list:
+        """Returns the last 'selection' list found in the conversation's text."""
+        for part in reversed(parts):
+            text = part.text or ""
+            start, end = text.find('{"selection"'), text.rfind("}")
+            if start != -1 and end > start:
+                try:
+                    return json.loads(text[start:end + 1])["selection"]
+                except (ValueError, KeyError):
+                    continue
+        return []
+
+
+LLMRegistry.register(FakeDigestModel)
+
+
+# --- SMTP sink --------------------------------------------------------------
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for smtplib: EHLO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    def _reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        sink = self.server.sink
+        sink.connections += 1
+        self._reply("220 localhost SMTP sink")
+        envelope = {"from": None, "to": []}
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250-localhost")
+                self._reply("250 AUTH PLAIN")
+            elif verb == "AUTH":
+                sink.logins += 1
+                self._reply("235 Authentication successful")
+            elif verb == "MAIL":
+                envelope = {"from": command[10:].strip("<>"), "to": []}
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                envelope["to"].append(command[8:].strip("<>"))
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b".\r\n", b".\n", b""):
+                        break
+                    lines.append(data.decode("utf-8", "replace"))
+                sink.messages.append({**envelope, "data": "".join(lines)})
+                self._reply("250 OK")
+                if sink.drop_after_each_message:
+                    return
+            elif verb in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalSMTPSink:
+    """
+    In-process SMTP server that records every message it receives.
+
+    With `drop_after_each_message`, the connection is closed after each
+    message, to exercise client reconnects.
+    """
+
+    def __init__(self, drop_after_each_message: bool = False):
+        self.messages = []
+        self.connections = 0
+        self.logins = 0
+        self.drop_after_each_message = drop_after_each_message
+        self._server = _SMTPServer(("127.0.0.1", 0), _SMTPHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
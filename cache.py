@@ -0,0 +1,297 @@
+import os
+import json
+import hashlib
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "morning_digest", "readwise.sqlite3")
+
+# Bumped whenever the tables change; older cache files are rebuilt from scratch
+SCHEMA_VERSION = 4
+
+# Writes between two purges of expired entries, when the size budget is not at risk
+EVICT_EVERY_WRITES = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    account TEXT,
+    updated_at TEXT,
+    source_location TEXT,
+    location TEXT,
+    source_url TEXT,
+    metadata TEXT NOT NULL,
+    content BLOB,
+    size INTEGER NOT NULL DEFAULT 0,
+    cached_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_last_access ON documents (last_access);
+CREATE INDEX IF NOT EXISTS idx_documents_updated_at ON documents (updated_at);
+CREATE INDEX IF NOT EXISTS idx_documents_source_url ON documents (source_url);
+CREATE INDEX IF NOT EXISTS idx_documents_location ON documents (account, location, updated_at);
+CREATE TABLE IF NOT EXISTS sync_state (
+    account TEXT NOT NULL,
+    location TEXT NOT NULL,
+    watermark TEXT,
+    since TEXT,
+    cursor TEXT,
+    started TEXT,
+    PRIMARY KEY (account, location)
+);
+"""
+
+
+def account_key(token: str) -> str:
+    """Returns a stable, non-reversible key identifying the account behind a token."""
+    return hashlib.sha256((token or "").encode("utf-8")).hexdigest()[:16]
+
+
+class DocumentCache:
+    """
+    SQLite-backed cache of Readwise documents, shared by every client.
+
+    Entries are keyed by document ID and remember the document's `updated_at`:
+    when a newer version is listed, the cached content is invalidated. Entries
+    older than `ttl` seconds are ignored and purged, and the least recently
+    used entries are evicted once the stored size exceeds `max_bytes`.
+    Content bodies are stored zlib-compressed.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = 72 * 3600, max_bytes: int = 200 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # Upper bound of the stored bytes: the total at the last eviction plus everything written since
+        self._bytes = None
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.executescript("DROP TABLE IF EXISTS documents; DROP TABLE IF EXISTS sync_state;")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(_SCHEMA)
+
+    def put_documents(self, docs: list, account: str = None):
+        """
+        Stores document metadata as returned by the /list/ endpoint.
+        Content cached for an older `updated_at` is dropped; a document listed
+        in another Reader location moves there.
+        """
+        now = time.time()
+        rows = [
+            (d.get("id"), account, d.get("updated_at"), d.get("source_location"), d.get("location"),
+             d.get("source_url"), json.dumps(d), now, now)
+            for d in docs if d.get("id")
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT INTO documents (id, account, updated_at, source_location, location, source_url, metadata,
+                                       cached_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    account = excluded.account,
+                    source_url = excluded.source_url,
+                    content = CASE WHEN documents.updated_at IS excluded.updated_at THEN documents.content ELSE NULL END,
+                    size = CASE WHEN documents.updated_at IS excluded.updated_at THEN documents.size ELSE 0 END,
+                    updated_at = excluded.updated_at,
+                    source_location = excluded.source_location,
+                    location = excluded.location,
+                    metadata = excluded.metadata,
+                    cached_at = excluded.cached_at,
+                    last_access = excluded.last_access
+                """,
+                rows,
+            )
+        self._evict(sum(len(row[6]) for row in rows))
+
+    def get_documents(self, location: str, updated_after: str, account: str = None) -> list:
+        """
+        Returns the cached metadata of the account's documents in the Reader
+        `location` ('new', 'later', ...) updated after the ISO timestamp
+        `updated_after`, most recently updated first.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT metadata FROM documents
+                WHERE account IS ? AND location = ? AND updated_at > ? AND cached_at > ?
+                ORDER BY updated_at DESC
+                """,
+                (account, location, updated_after, time.time() - self.ttl),
+            ).fetchall()
+        return [json.loads(metadata) for (metadata,) in rows]
+
+    def prune_documents(self, location: str, updated_after: str, listed_ids, account: str = None) -> int:
+        """
+        Drops the account's cached documents in `location` updated after
+        `updated_after` that a complete listing of that window did not return
+        (deleted, or moved to a location that is not synced). Returns how many
+        were dropped.
+        """
+        listed_ids = set(listed_ids)
+        with self._lock, self._conn:
+            cached = self._conn.execute(
+                "SELECT id FROM documents WHERE account IS ? AND location = ? AND updated_at > ?",
+                (account, location, updated_after),
+            ).fetchall()
+            gone = [(doc_id,) for (doc_id,) in cached if doc_id not in listed_ids]
+            self._conn.executemany("DELETE FROM documents WHERE id = ?", gone)
+        return len(gone)
+
+    def get_sync_state(self, account: str, location: str):
+        """
+        Returns the incremental sync state of a location as a dict with
+        `watermark` (start of the last completed sync) and, for an interrupted
+        sync, the `since`/`cursor`/`started` needed to resume it. None if the
+        location was never synced.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT watermark, since, cursor, started FROM sync_state WHERE account = ? AND location = ?",
+                (account, location),
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("watermark", "since", "cursor", "started"), row))
+
+    def save_sync_progress(self, account: str, location: str, since: str, cursor: str, started: str):
+        """Records the cursor of an in-progress sync so an interrupted run can resume it."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO sync_state (account, location, since, cursor, started) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(account, location) DO UPDATE SET
+                    since = excluded.since, cursor = excluded.cursor, started = excluded.started
+                """,
+                (account, location, since, cursor, started),
+            )
+
+    def complete_sync(self, account: str, location: str, watermark: str):
+        """Advances the watermark of a location and clears any resume cursor."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO sync_state (account, location, watermark) VALUES (?, ?, ?)
+                ON CONFLICT(account, location) DO UPDATE SET
+                    watermark = excluded.watermark, since = NULL, cursor = NULL, started = NULL
+                """,
+                (account, location, watermark),
+            )
+
+    def put_content(self, doc_id: str, content: str):
+        """Stores the full content of a document, compressed."""
+        blob = zlib.compress(content.encode("utf-8"))
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO documents (id, metadata, content, size, cached_at, last_access)
+                VALUES (?, '{}', ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    content = excluded.content,
+                    size = excluded.size,
+                    last_access = excluded.last_access
+                """,
+                (doc_id, blob, len(blob), now, now),
+            )
+        self._evict(len(blob))
+
+    def get_content(self, doc_id: str):
+        """
+        Returns the cached full content of a document, or None on a miss.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT content FROM documents WHERE id = ? AND content IS NOT NULL AND cached_at > ?",
+                (doc_id, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE documents SET last_access = ? WHERE id = ?", (now, doc_id))
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def get_content_by_url(self, source_url: str, account: str = None):
+        """
+        Returns cached content of a document with this source URL listed for
+        `account`, or for any account when `account` is None (users following
+        the same feeds then share fetched articles). None on a miss.
+        """
+        query = """
+            SELECT content FROM documents
+            WHERE source_url = ? AND content IS NOT NULL AND cached_at > ? AND (? IS NULL OR account = ?)
+            ORDER BY last_access DESC LIMIT 1
+        """
+        with self._lock:
+            row = self._conn.execute(query, (source_url, time.time() - self.ttl, account, account)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def _evict(self, written: int = 0):
+        """
+        Purges expired entries, then least recently used ones above `max_bytes`.
+
+        The stored size is only summed up when the running estimate (an upper
+        bound, as rewrites are counted in full) goes over `max_bytes`, and the
+        expired entries are purged every EVICT_EVERY_WRITES writes.
+        """
+        with self._lock:
+            self._writes += 1
+            if self._bytes is not None:
+                self._bytes += written
+                if self._bytes <= self.max_bytes and self._writes < EVICT_EVERY_WRITES:
+                    return
+            self._writes = 0
+            with self._conn:
+                self._conn.execute("DELETE FROM documents WHERE cached_at <= ?", (time.time() - self.ttl,))
+                total = self._conn.execute("SELECT COALESCE(SUM(size + LENGTH(metadata)), 0) FROM documents").fetchone()[0]
+                if total > self.max_bytes:
+                    rows = self._conn.execute(
+                        "SELECT id, size + LENGTH(metadata) FROM documents ORDER BY last_access"
+                    ).fetchall()
+                    evicted = []
+                    for doc_id, size in rows:
+                        if total <= self.max_bytes:
+                            break
+                        evicted.append((doc_id,))
+                        total -= size
+                    self._conn.executemany("DELETE FROM documents WHERE id = ?", evicted)
+                    logger.info(f"Document cache evicted {len(evicted)} entries")
+            self._bytes = total
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    """
+    Returns the process-wide document cache configured from the environment,
+    or None if caching is disabled (READWISE_CACHE_DISABLED=1).
+    """
+    global _default_cache
+    if os.getenv("READWISE_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = DocumentCache(
+                    path=os.getenv("READWISE_CACHE_PATH", DEFAULT_CACHE_PATH),
+                    ttl=float(os.getenv("READWISE_CACHE_TTL_HOURS", "72")) * 3600,
+                    max_bytes=int(float(os.getenv("READWISE_CACHE_MAX_MB", "200")) * 1024 * 1024),
+                )
+            except (sqlite3.Error, OSError, ValueError) as e:
+                logger.warning(f"Document cache unavailable: {e}. Continuing without cache.")
+                return None
+        return _default_cache
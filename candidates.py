@@ -0,0 +1,97 @@
+"""
+Token-compact encoding of the candidate list handed to the SelectorAgent.
+
+Candidates are written as a table: one header row naming the columns, then
+one `|`-separated row per article, identified by a short row number instead
+of its Reader ID. Source URLs never reach the model and summaries are cut
+to a token budget; both are kept locally with the real IDs and re-attached
+to the articles the model selects.
+"""
+import os
+import re
+
+from content import CHARS_PER_TOKEN
+
+# Longest summary shown to the model, in tokens (the full one is re-attached)
+SUMMARY_TOKENS = int(os.getenv("SELECTOR_SUMMARY_TOKENS", "60"))
+
+# Columns after the row ID, in order
+COLUMNS = ("source_location", "word_count", "source_count", "novelty", "scores", "title", "summary")
+
+SEPARATOR = "|"
+
+_CELL_RE = re.compile(r"\s*[|\r\n\t]+\s*")
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, dict):
+        return " ".join(f"{key}={score:g}" for key, score in value.items())
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return _CELL_RE.sub(" ", str(value)).strip()
+
+
+def truncate_summary(summary: str, token_budget: int = SUMMARY_TOKENS) -> str:
+    """Cuts a summary to `token_budget` tokens on a word boundary, marking the cut with an ellipsis."""
+    max_chars = token_budget * CHARS_PER_TOKEN
+    if not summary or len(summary) <= max_chars:
+        return summary or ""
+    cut = summary.rfind(" ", 0, max_chars)
+    return summary[:cut if cut > max_chars // 2 else max_chars].rstrip(" ,;:.") + "…"
+
+
+def encode_candidates(candidates: list, summary_tokens: int = SUMMARY_TOKENS):
+    """
+    Encodes the candidates as a compact table.
+
+    Args:
+        candidates (list): Candidate dicts (see `ranking.shortlist`).
+        summary_tokens (int): Token budget of each summary in the table.
+
+    Returns:
+        tuple: The table text and a dict mapping each row ID to the fields
+        held back from the model (`id`, `title`, `source_url`, `summary`),
+        for `restore_selection`.
+    """
+    lines = [SEPARATOR.join(("id",) + COLUMNS)]
+    rows = {}
+    for number, doc in enumerate(candidates, 1):
+        row_id = str(number)
+        cells = {column: doc.get(column) for column in COLUMNS}
+        cells["summary"] = truncate_summary(doc.get("summary") or "", summary_tokens)
+        lines.append(SEPARATOR.join([row_id] + [_cell(cells[column]) for column in COLUMNS]))
+        rows[row_id] = {key: doc.get(key) for key in ("id", "title", "source_url", "summary")}
+    return "\n".join(lines), rows
+
+
+def decode_candidates(table: str) -> list:
+    """
+    Parses a table written by `encode_candidates` back into dicts (IDs are
+    the row IDs, summaries the truncated ones). Used by offline tooling.
+    """
+    lines = table.splitlines()
+    if not lines:
+        return []
+    header = lines[0].split(SEPARATOR)
+    docs = []
+    for line in lines[1:]:
+        doc = dict(zip(header, line.split(SEPARATOR, len(header) - 1)))
+        doc["scores"] = {key: float(score) for key, _, score in
+                         (item.partition("=") for item in doc.get("scores", "").split())}
+        docs.append(doc)
+    return docs
+
+
+def restore_selection(selection: list, rows: dict) -> list:
+    """
+    Maps the row IDs of the selected articles back to their documents and
+    re-attaches the fields held back from the model. Articles whose ID is
+    not a row ID are left as they are.
+    """
+    restored = []
+    for article in selection:
+        held = rows.get(str(article.get("id"))) if isinstance(article, dict) else None
+        restored.append({**article, **held} if held else article)
+    return restored
@@ -1,84 +1,405 @@
 import os
+import time
+import queue
+import logging
 import requests
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import json
+import threading
+from collections import OrderedDict
+from cache import get_default_cache, account_key
+from documents import DocumentRecord, iter_list_page, STREAM_CHUNK_SIZE
+import metrics
+from transport import get_transport
+
+logger = logging.getLogger(__name__)
+
+# Reader locations fetched for the digest, with the label exposed to the agents
+LOCATIONS = [("new", "feed"), ("later", "library")]
+# Label of each synced location, for records listed across all locations
+LOCATION_LABELS = dict(LOCATIONS)
+
+# Maximum page size accepted by the Reader API
+PAGE_SIZE = 100
+
+# Pages fetched ahead of the consumer of `iter_last_24h`, across locations
+MAX_BUFFERED_PAGES = 4
+
+# Incremental syncs re-read this much before the watermark to absorb clock skew
+SYNC_OVERLAP = timedelta(minutes=5)
+# Sync state key of the incremental pass, which lists every location at once
+SYNC_KEY = "*"
+
+# Longest wait for content another thread is already fetching
+INFLIGHT_WAIT_SECONDS = 60
+# Documents of other accounts with the same source URL may lend their content
+# (users following the same feeds); off by default, content stays per account
+SHARE_CONTENT_ACROSS_ACCOUNTS = os.getenv("READWISE_SHARE_CONTENT", "").lower() in ("1", "true", "yes")
+# Most recently used contents kept in memory by source URL, for all clients
+SHARED_CONTENT_MAX_ENTRIES = int(os.getenv("READWISE_SHARED_CONTENT_ENTRIES", "256"))
 
 class ReadwiseClient:
-    def __init__(self, token=None):
+    def __init__(self, token=None, cache=None, transport=None):
         self.token = token or os.getenv("READWISE_TOKEN")
-        self.base_url = "https://readwise.io/api/v3"
+        # Optional persistent DocumentCache shared across clients and runs
+        self.cache = cache
+        self.account = account_key(self.token)
+        self.base_url = os.getenv("READWISE_BASE_URL", "https://readwise.io/api/v3")
+        # Process-wide HTTP layer: pooled connections, rate limits, retries, timeouts
+        self.transport = transport or get_transport()
+        # Full document content already fetched in this process, keyed by ID
+        self.content_store = {}
+        # Source URL of every listed document, to reuse content fetched for the same URL
+        self.source_urls = {}
+        # Serializes incremental syncs (e.g. a warm-up and the selector tool)
+        self._sync_lock = threading.Lock()
+        # Documents whose content is being fetched right now, so that a
+        # concurrent request for them (e.g. the runner's early prefetch and the
+        # enricher's own prefetch) waits for it instead of fetching them again
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
         
-    def fetch_last_24h(self):
+    def fetch_last_24h(self) -> list:
+        """
+        Fetches documents from Readwise Reader updated in the last 24 hours,
+        as a list of DocumentRecords (see `iter_last_24h`).
         """
-        Fetches documents from Readwise Reader updated in the last 24 hours.
-        If no token is provided, returns mock data for testing.
+        return list(self.iter_last_24h())
+
+    def iter_last_24h(self):
+        """
+        Yields the DocumentRecords of the documents updated in the last 24 hours,
+        page by page as they arrive. Both locations are fetched concurrently
+        and every cursor page is followed.
+        With a document cache, only the delta since the last sync is downloaded,
+        in one pass over all locations, and the 24h window of each location is
+        served from the cache (see `sync`).
+        If no token is provided, yields mock data for testing.
         """
         if not self.token:
             print("Warning: No READWISE_TOKEN found. Using mock data.")
-            return self._get_mock_data()
+            yield from (DocumentRecord.from_api(d) for d in self._get_mock_data())
+            return
 
-        # Calculate timestamp for 24h ago
-        after_date = (datetime.now() - timedelta(hours=24)).isoformat()
-        
-        headers = {"Authorization": f"Token {self.token}"}
-        
-        all_docs = []
-        
-        # 1. Fetch from 'new' (Feed/Inbox)
-        params_new = {
-            "updatedAfter": after_date,
-            "location": "new", 
-            "page_size": 50
-        }
-        try:
-            response = requests.get(f"{self.base_url}/list/", headers=headers, params=params_new)
-            response.raise_for_status()
-            new_docs = response.json().get("results", [])
-            for d in new_docs: d['source_location'] = 'feed'
-            all_docs.extend(new_docs)
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching NEW: {e}")
+        # Calculate timestamp for 24h ago (UTC, comparable with Reader's updated_at)
+        after_date = (datetime.now(timezone.utc) - timedelta(hours=24)).isoformat()
+
+        if self.incremental:
+            jobs = [(self._sync_windows, after_date)]
+        else:
+            jobs = [(self._fetch_location, location, label, after_date) for location, label in LOCATIONS]
+        # Bounded, so a slow consumer holds back the fetch instead of buffering the library
+        pages = queue.Queue(maxsize=MAX_BUFFERED_PAGES)
+        closed = threading.Event()
+
+        def put(item) -> bool:
+            """Waits for room in `pages`; False once the consumer has stopped reading."""
+            while not closed.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def drain(worker, *args):
+            try:
+                for records in worker(*args):
+                    if not put(records):
+                        return
+            finally:
+                put(None)
 
-        # 2. Fetch from 'later' (Library)
-        params_later = {
+        # 'new' is the Feed/Inbox, 'later' is the Library
+        with metrics.span("readwise.fetch_last_24h") as span, ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            futures = [executor.submit(drain, *job) for job in jobs]
+            running, count = len(futures), 0
+            try:
+                while running:
+                    records = pages.get()
+                    if records is None:
+                        running -= 1
+                        continue
+                    self.source_urls.update((r.id, r.source_url) for r in records if r.source_url)
+                    count += len(records)
+                    yield from records
+            finally:
+                # Also releases the fetch threads when the caller stops early
+                closed.set()
+            for future in futures:
+                future.result()
+            span.set(documents=count)
+
+    @property
+    def incremental(self) -> bool:
+        """Incremental sync needs a cache; READWISE_INCREMENTAL_SYNC=0 turns it off."""
+        return bool(self.cache) and os.getenv("READWISE_INCREMENTAL_SYNC", "1").lower() not in ("0", "false", "no")
+
+    def sync(self):
+        """
+        Pulls into the document cache every document updated since the last
+        successful sync, in all locations. Cheap enough to schedule often.
+        """
+        if not (self.token and self.cache):
+            return
+        after_date = (datetime.now(timezone.utc) - timedelta(hours=24)).isoformat()
+        with metrics.span("readwise.sync"):
+            self._sync_delta(after_date)
+
+    def _fetch_location(self, location: str, label: str, after_date: str):
+        """
+        Yields the records of every page of a single Reader location.
+        """
+        params = {
             "updatedAfter": after_date,
-            "location": "later", 
-            "page_size": 50
+            "location": location,
+            "page_size": PAGE_SIZE
         }
+        seen = set()
         try:
-            response = requests.get(f"{self.base_url}/list/", headers=headers, params=params_later)
+            for page, (records, _, elapsed) in enumerate(self._iter_pages(params, label), 1):
+                logger.info(f"Readwise {location} page {page}: {len(records)} docs in {elapsed * 1000:.0f} ms")
+                if self.cache:
+                    self.cache.put_documents([r.to_dict() for r in records], account=self.account)
+                seen.update(r.id for r in records)
+                yield records
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error fetching {location.upper()}: {e}")
+            yield self._cached_remainder(seen, location, after_date)
+            return
+        if self.cache:
+            self.cache.prune_documents(location, after_date, seen, account=self.account)
+
+    def _sync_windows(self, after_date: str):
+        """Syncs the cache (see `_sync_delta`), then yields the cached 24h window of each location."""
+        self._sync_delta(after_date)
+        for location, _ in LOCATIONS:
+            yield [DocumentRecord.from_api(d) for d in self.cache.get_documents(location, after_date, account=self.account)]
+
+    def _sync_delta(self, after_date: str):
+        """
+        Downloads the documents updated since the watermark, in every
+        location, and merges them into the cache. Each record is filed under
+        its own location: documents moved or archived since the last sync
+        leave the cached window of the location they were in, with no
+        listing of their own.
+
+        The cursor is saved after every page, so an interrupted sync resumes
+        where it stopped. The watermark only advances once all pages are in.
+        """
+        with self._sync_lock:
+            state = self.cache.get_sync_state(self.account, SYNC_KEY) or {}
+            started = datetime.now(timezone.utc).isoformat()
+            cursor = None
+            if state.get("cursor") and state.get("since", "") > after_date:
+                # Resume the interrupted sync with its original query
+                since, cursor, started = state["since"], state["cursor"], state["started"]
+            elif state.get("watermark") and state["watermark"] > after_date:
+                since = (datetime.fromisoformat(state["watermark"]) - SYNC_OVERLAP).isoformat()
+            else:
+                since = after_date
+
+            params = {
+                "updatedAfter": since,
+                "page_size": PAGE_SIZE
+            }
+            if cursor:
+                params["pageCursor"] = cursor
+
+            fetched, moved, listed = 0, 0, set()
+            try:
+                for records, next_cursor, elapsed in self._iter_pages(params, None):
+                    self.cache.put_documents([r.to_dict() for r in records], account=self.account)
+                    if next_cursor:
+                        self.cache.save_sync_progress(self.account, SYNC_KEY, since, next_cursor, started)
+                    fetched += len(records)
+                    moved += sum(1 for r in records if r.location not in LOCATION_LABELS)
+                    listed.update(r.id for r in records)
+                    logger.info(f"Readwise sync page: {len(records)} docs in {elapsed * 1000:.0f} ms")
+                self.cache.complete_sync(self.account, SYNC_KEY, started)
+                if since == after_date and not cursor:
+                    # The whole window was listed: what was not returned is gone from its location
+                    for location, _ in LOCATIONS:
+                        self.cache.prune_documents(location, after_date, listed, account=self.account)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"Error syncing Readwise: {e}. Serving cached documents.")
+                if cursor and not fetched:
+                    # The saved cursor may have expired: restart from the watermark next time
+                    self.cache.complete_sync(self.account, SYNC_KEY, state.get("watermark"))
+
+            logger.info(f"Readwise incremental sync since {since}: {fetched} docs downloaded, "
+                        f"{moved} outside the synced locations")
+
+    def _iter_pages(self, params: dict, label: str):
+        """
+        Yields (records, next_cursor, latency) for every /list/ page of a query,
+        its results projected onto DocumentRecords labelled with `label` (by
+        default, the label of each document's location).
+
+        The request for page N+1 is issued as soon as the cursor of page N is
+        known, so it is in flight while page N is being processed.
+        """
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            pending = prefetcher.submit(self._get_list_records, params, label)
+            while pending is not None:
+                records, cursor, elapsed = pending.result()
+                pending = None
+                if cursor:
+                    pending = prefetcher.submit(self._get_list_records, {**params, "pageCursor": cursor}, label)
+                yield records, cursor, elapsed
+
+    def _cached_remainder(self, seen: set, location: str, after_date: str) -> list:
+        """
+        Returns the cached records of a partially fetched location that were
+        not fetched (`seen`), so a re-run after an API failure still sees the
+        whole window.
+        """
+        if not self.cache:
+            return []
+        cached = [DocumentRecord.from_api(d) for d in self.cache.get_documents(location, after_date, account=self.account)
+                  if d.get('id') not in seen]
+        if cached:
+            print(f"Using {len(cached)} cached {location} documents.")
+        return cached
+
+    def _get_list_records(self, params: dict, label: str):
+        """
+        GETs a single /list/ page, parsing the response as it streams in and
+        projecting each result onto a DocumentRecord.
+
+        Returns:
+            tuple: The page's records, its next cursor and the request latency in seconds.
+        """
+        start = time.perf_counter()
+        meta = {}
+        with metrics.span("readwise.list") as span:
+            response = self.transport.get(f"{self.base_url}/list/", params=params, token=self.token, stream=True)
+            try:
+                response.raise_for_status()
+                chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+                records = [DocumentRecord.from_api(item, label or LOCATION_LABELS.get(item.get("location")), params.get("location"))
+                           for item in iter_list_page(chunks, meta)]
+            finally:
+                response.close()
+            span.set(results=len(records))
+        return records, meta.get("nextPageCursor"), time.perf_counter() - start
+
+    def _get_list_page(self, params: dict):
+        """
+        GETs a single /list/ page of document details through the shared transport.
+
+        Returns:
+            tuple: The decoded JSON payload and the request latency in seconds.
+        """
+        start = time.perf_counter()
+        with metrics.span("readwise.details") as span:
+            response = self.transport.get(f"{self.base_url}/list/", params=params, token=self.token)
             response.raise_for_status()
-            later_docs = response.json().get("results", [])
-            for d in later_docs: d['source_location'] = 'library'
-            all_docs.extend(later_docs)
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching LATER: {e}")
-            
-        return all_docs
+            payload = response.json()
+            span.set(results=len(payload.get("results") or []))
+        return payload, time.perf_counter() - start
+
+    def fetch_documents_details(self, ids) -> dict:
+        """
+        Fetches the full content of many documents in a single request and
+        stores it in the in-process content store.
+
+        Args:
+            ids (list): Document IDs to fetch.
+
+        Returns:
+            dict: Mapping of document ID to its content, for the IDs found.
+        """
+        missing = [doc_id for doc_id in dict.fromkeys(ids) if not self._load_cached_content(doc_id)]
+        if missing and self.token:
+            done = threading.Event()
+            with self._inflight_lock:
+                pending = {self._inflight[doc_id] for doc_id in missing if doc_id in self._inflight}
+                missing = [doc_id for doc_id in missing if doc_id not in self._inflight]
+                for doc_id in missing:
+                    self._inflight[doc_id] = done
+            try:
+                if missing:
+                    params = {"ids": ",".join(missing), "withHtmlContent": "true"}
+                    payload, elapsed = self._get_list_page(params)
+                    results = payload.get("results", [])
+                    for data in results:
+                        self._store_content(data.get("id"), self._extract_content(data))
+                    logger.info(f"Readwise batch details: {len(results)}/{len(missing)} docs in {elapsed * 1000:.0f} ms")
+            except requests.exceptions.RequestException as e:
+                print(f"Error fetching document details {missing}: {e}")
+            finally:
+                with self._inflight_lock:
+                    for doc_id in missing:
+                        self._inflight.pop(doc_id, None)
+                done.set()
+            for other in pending:
+                other.wait(INFLIGHT_WAIT_SECONDS)
+
+        return {doc_id: self.content_store[doc_id] for doc_id in ids if doc_id in self.content_store}
 
     def fetch_document_details(self, doc_id: str) -> str:
         """
         Fetches the full content of a specific document by ID.
+        Answers from the content store when the document was already fetched.
         """
         if not self.token:
             return "Mock full content: This is a placeholder for the full text of the article."
 
-        headers = {"Authorization": f"Token {self.token}"}
+        if self._load_cached_content(doc_id):
+            return self.content_store[doc_id]
+
         try:
             # Reader API v3 uses /list/ to get document details by ID
-            params = {"ids": doc_id}
-            response = requests.get(f"{self.base_url}/list/", headers=headers, params=params)
-            response.raise_for_status()
-            results = response.json().get("results", [])
+            params = {"ids": doc_id, "withHtmlContent": "true"}
+            payload, _ = self._get_list_page(params)
+            results = payload.get("results", [])
             if results:
-                data = results[0]
-                # Return HTML content or plain text if available
-                return data.get("html_content") or data.get("summary") or "No content available."
+                content = self._extract_content(results[0])
+                self._store_content(doc_id, content)
+                return content
             return "Document not found."
         except requests.exceptions.RequestException as e:
             print(f"Error fetching document details {doc_id}: {e}")
             return ""
 
+    def _load_cached_content(self, doc_id: str) -> bool:
+        """
+        Ensures the content store holds `doc_id`, reading through the persistent cache.
+        Returns True on a hit.
+        """
+        if doc_id in self.content_store:
+            return True
+        url = self.source_urls.get(doc_id)
+        content = _shared_content.get(self._content_key(url)) if url else None
+        if content is None and self.cache:
+            content = self.cache.get_content(doc_id)
+            if content is None and url:
+                account = None if SHARE_CONTENT_ACROSS_ACCOUNTS else self.account
+                content = self.cache.get_content_by_url(url, account=account)
+        if content is not None:
+            self.content_store[doc_id] = content
+            return True
+        return False
+
+    def _store_content(self, doc_id: str, content: str):
+        self.content_store[doc_id] = content
+        url = self.source_urls.get(doc_id)
+        if url:
+            _shared_content.put(self._content_key(url), content)
+        if self.cache:
+            self.cache.put_content(doc_id, content)
+
+    def _content_key(self, url: str):
+        """Key of a source URL's content in `_shared_content`: per account unless sharing is on."""
+        return url if SHARE_CONTENT_ACROSS_ACCOUNTS else (self.account, url)
+
+    @staticmethod
+    def _extract_content(data: dict) -> str:
+        """Return HTML content or plain text if available."""
+        return data.get("html_content") or data.get("summary") or "No content available."
+
     def _get_mock_data(self):
         """Returns a list of mock documents for testing."""
         return [
@@ -155,3 +476,60 @@ class ReadwiseClient:
                 "source_location": "feed"
             }
         ]
+
+
+class _ContentLRU:
+    """Thread-safe mapping keeping only the `max_entries` most recently used items."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, content: str):
+        with self._lock:
+            self._items[key] = content
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+# Content fetched by any client in this process, keyed by source URL (and account, see `_content_key`)
+_shared_content = _ContentLRU(SHARED_CONTENT_MAX_ENTRIES)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(token=None):
+    """
+    Returns the shared ReadwiseClient for a token (default: READWISE_TOKEN),
+    wired to the process-wide document cache.
+    """
+    token = token or os.getenv("READWISE_TOKEN")
+    with _clients_lock:
+        if token not in _clients:
+            _clients[token] = ReadwiseClient(token=token, cache=get_default_cache())
+        return _clients[token]
+
+
+# Readwise tokens of the users of a batch run, keyed by ADK user_id
+_user_tokens = {}
+
+def register_user_token(user_id: str, token: str):
+    """Associates a Readwise token with an ADK user, for multi-user runs."""
+    _user_tokens[user_id] = token
+
+def get_user_client(user_id: str, default=None):
+    """Returns the shared client of a registered user, or `default` for unknown users."""
+    token = _user_tokens.get(user_id)
+    return get_client(token) if token else default
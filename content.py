@@ -0,0 +1,153 @@
+import os
+import re
+from functools import lru_cache
+from html import unescape
+from html.parser import HTMLParser
+
+# Approximate number of characters per LLM token for budget estimates
+CHARS_PER_TOKEN = 4
+
+# Default per-document token budget for content handed to the EnricherAgent
+DEFAULT_TOKEN_BUDGET = int(os.getenv("ENRICHER_TOKEN_BUDGET", "3000"))
+
+# Share of the budget kept from the start of the document; the rest comes from the end
+HEAD_RATIO = 0.7
+
+TRUNCATION_MARKER = "\n[...]\n"
+
+# Elements whose content is never article text
+_SKIP_TAGS = {
+    "script", "style", "noscript", "template", "svg", "iframe", "canvas",
+    "nav", "header", "footer", "aside", "form", "button", "select", "figure",
+}
+_BLOCK_TAGS = {
+    "p", "div", "section", "article", "main", "br", "hr", "li", "ul", "ol",
+    "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "table", "tr",
+}
+_VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "source", "wbr"}
+
+# Typical newsletter/web boilerplate lines: short lines opening with one of
+# these whole phrases (article paragraphs may start with the same words)
+_BOILERPLATE_RE = re.compile(
+    r"^(?:(?:share( this)?|subscribe|sign up|log ?in|read more|advertisement|"
+    r"cookie (settings|policy|preferences)|(we|this site) uses? cookies|accept (all )?cookies|"
+    r"all rights reserved|follow us|click here|view in browser|unsubscribe)\b|©)",
+    re.IGNORECASE,
+)
+BOILERPLATE_MAX_CHARS = 60
+_SPACE_RE = re.compile(r"[ \t\r\f\v]+")
+
+
+class _TextExtractor(HTMLParser):
+    """Collects visible text, dropping non-content elements."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS and tag not in _VOID_TAGS:
+            self._skip_depth += 1
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """
+    Extracts readable text from HTML, removing scripts, navigation and
+    common boilerplate lines.
+    """
+    if "<" not in html:
+        return unescape(html).strip()
+
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+
+    lines = []
+    seen = set()
+    for line in "".join(extractor.parts).split("\n"):
+        line = _SPACE_RE.sub(" ", line).strip()
+        if not line or (len(line) < BOILERPLATE_MAX_CHARS and _BOILERPLATE_RE.match(line)):
+            continue
+        # Short lines repeated in the page (menus, bylines, share bars) are boilerplate
+        if len(line) < 40:
+            if line in seen:
+                continue
+            seen.add(line)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count used for budgeting."""
+    return len(text) // CHARS_PER_TOKEN
+
+
+def truncate_to_budget(text: str, token_budget: int) -> str:
+    """
+    Keeps the head and the tail of a text so it fits `token_budget` tokens.
+    Cuts happen on line boundaries when possible.
+    """
+    max_chars = token_budget * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+
+    head_chars = int(max_chars * HEAD_RATIO)
+    tail_chars = max_chars - head_chars - len(TRUNCATION_MARKER)
+    head = text[:head_chars]
+    cut = head.rfind("\n")
+    if cut > head_chars // 2:
+        head = head[:cut]
+    tail = text[-tail_chars:] if tail_chars > 0 else ""
+    cut = tail.find("\n")
+    if 0 <= cut < len(tail) // 2:
+        tail = tail[cut + 1:]
+    return head + TRUNCATION_MARKER + tail
+
+
+def split_into_chunks(text: str, chunk_tokens: int) -> list:
+    """
+    Splits a text into consecutive chunks of at most `chunk_tokens` tokens,
+    cutting between lines (or, for overlong lines, between words).
+    """
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    chunks, current, size = [], [], 0
+    for line in text.split("\n"):
+        while len(line) > max_chars:
+            cut = line.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            chunks.append(line[:cut])
+            line = line[cut:].lstrip()
+        if current and size + len(line) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current and any(current):
+        chunks.append("\n".join(current))
+    return chunks
+
+
+@lru_cache(maxsize=256)
+def prepare_content(html: str, token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+    """
+    Turns raw document HTML into budgeted plain text for the EnricherAgent.
+    Results are memoized, so repeated tool calls for a document are free.
+    """
+    return truncate_to_budget(html_to_text(html), token_budget)
@@ -0,0 +1,290 @@
+"""
+Runs the Morning Digest as a resident service instead of a one-shot job.
+
+The process imports the agent graph once and keeps it, the HTTP pools and
+the caches warm between runs. Each user's digest is scheduled at their own
+time of day; a few minutes before it, the user's Readwise delta is synced,
+the prompts revalidated and the likely enrichment targets prefetched, so
+that at send time only the model calls remain.
+
+Users come from a roster (see batch.py; `send_at` "HH:MM" and `timezone`
+per user). Without a roster, the single user configured by READWISE_TOKEN
+and EMAIL_RECIPIENT_ADDRESS is served.
+
+HTTP endpoints (unauthenticated: they listen on 127.0.0.1 unless
+DAEMON_HOST or --host says otherwise):
+    GET  /healthz          JSON status of the schedule and of the last runs
+    GET  /metrics          Prometheus metrics
+    POST /run?user=<id>    Runs a user's digest now (409 while one is running)
+
+Usage:
+    python daemon.py [roster.json] [--host 127.0.0.1] [--port 8080] [--prewarm-minutes 10]
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import argparse
+import threading
+import requests
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metrics
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEND_AT = os.getenv("DAEMON_SEND_AT", "07:00")
+DEFAULT_TIMEZONE = os.getenv("DAEMON_TIMEZONE", "Europe/Rome")
+# Interface of the HTTP endpoints; anything but loopback exposes POST /run
+DEFAULT_HOST = os.getenv("DAEMON_HOST", "127.0.0.1")
+
+
+def next_run(send_at: str, timezone: str, now: datetime = None) -> datetime:
+    """Returns the next time it is `send_at` ("HH:MM") in `timezone`, after `now`."""
+    tz = ZoneInfo(timezone)
+    now = (now or datetime.now(tz)).astimezone(tz)
+    hour, minute = (int(part) for part in send_at.split(":"))
+    run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    return run_at
+
+
+async def _sleep_until(when: datetime):
+    await asyncio.sleep(max(0.0, (when - datetime.now(when.tzinfo)).total_seconds()))
+
+
+class DigestDaemon:
+    """Schedules every user's digest on one warm runner and reports their status."""
+
+    def __init__(self, roster: list, prewarm_minutes: float = 10, concurrency: int = 8):
+        self.roster = roster
+        self.prewarm = timedelta(minutes=prewarm_minutes)
+        self.concurrency = concurrency
+        self.started_at = time.time()
+        self.runner = None
+        self.run_config = None
+        self.loop = None
+        self.status = {user["user_id"]: {"next_run": None, "last_run": None, "last_ok": None,
+                                         "last_seconds": None, "runs": 0, "failures": 0} for user in roster}
+        self._semaphore = None
+        # Users whose digest is being generated, claimed from any thread
+        self._running = set()
+        self._running_lock = threading.Lock()
+
+    async def warm_up(self):
+        """Builds the runner (importing the agent graph) and loads the prompts once."""
+        from client import register_user_token
+        from main import create_runner
+        from batch import _tool_run_config
+        from utils import prompts
+
+        for user in self.roster:
+            register_user_token(user["user_id"], user["readwise_token"])
+        self.runner = create_runner()
+        self.run_config = _tool_run_config(self.concurrency)
+        await asyncio.to_thread(prompts.load)
+        logger.info(f"Daemon ready: {len(self.roster)} users, warm-up took {time.time() - self.started_at:.1f}s")
+
+    async def prewarm_user(self, user: dict):
+        """Syncs the user's Readwise delta, revalidates the prompts and prefetches likely targets."""
+        from client import get_user_client
+        from prefetch import get_prefetcher
+        from utils import prompts
+        from agents.selector import shortlist_candidates
+
+        with metrics.span("daemon.prewarm", user=user["user_id"]):
+            prompts.refresh()
+            await asyncio.to_thread(prompts.load)
+            readwise = get_user_client(user["user_id"])
+            try:
+                await asyncio.to_thread(readwise.sync)
+                prefetcher = get_prefetcher()
+                if prefetcher is not None:
+                    # The selector's own shortlist, so the same targets are prefetched
+                    candidates = await asyncio.to_thread(shortlist_candidates, readwise, user["user_id"])
+                    prefetcher.schedule(readwise, candidates)
+            except (requests.exceptions.RequestException, sqlite3.Error, OSError, ValueError) as e:
+                logger.warning(f"Pre-warm failed for {user['user_id']}: {e}")
+
+    def is_running(self, user_id: str) -> bool:
+        return user_id in self._running
+
+    def _claim(self, user_id: str) -> bool:
+        """Marks the user's run as in progress; False if one already is."""
+        with self._running_lock:
+            if user_id in self._running:
+                return False
+            self._running.add(user_id)
+            return True
+
+    async def run_user(self, user: dict) -> bool:
+        """
+        Runs the user's digest now (at most `concurrency` at a time) and records
+        the outcome. Returns False at once if the user's digest is already running.
+        """
+        if not self._claim(user["user_id"]):
+            logger.warning(f"Digest for {user['user_id']} already running; skipped")
+            return False
+        return await self._run_claimed(user)
+
+    async def _run_claimed(self, user: dict) -> bool:
+        from batch import run_user_digest
+
+        status = self.status[user["user_id"]]
+        try:
+            async with self._semaphore:
+                start = time.time()
+                metrics.run_started(start)
+                ok = await run_user_digest(self.runner, user, self.run_config)
+        finally:
+            with self._running_lock:
+                self._running.discard(user["user_id"])
+        status.update(last_run=start, last_ok=ok, last_seconds=time.time() - start, runs=status["runs"] + 1)
+        if not ok:
+            status["failures"] += 1
+        metrics.export_run()
+        return ok
+
+    async def _schedule_user(self, user: dict):
+        status = self.status[user["user_id"]]
+        while True:
+            run_at = next_run(user.get("send_at") or DEFAULT_SEND_AT, user.get("timezone") or DEFAULT_TIMEZONE)
+            status["next_run"] = run_at.isoformat()
+            await _sleep_until(run_at - self.prewarm)
+            await self.prewarm_user(user)
+            await _sleep_until(run_at)
+            await self.run_user(user)
+
+    def trigger(self, user_id: str) -> bool:
+        """
+        Starts a user's digest right away, from any thread; False if the user
+        is unknown or their digest is already running.
+        """
+        user = next((u for u in self.roster if u["user_id"] == user_id), None)
+        if user is None or self.loop is None or not self._claim(user_id):
+            return False
+        asyncio.run_coroutine_threadsafe(self._run_claimed(user), self.loop)
+        return True
+
+    def health(self) -> dict:
+        return {
+            "status": "ok" if self.runner is not None else "starting",
+            "uptime_seconds": round(time.time() - self.started_at),
+            "users": {user_id: dict(status) for user_id, status in self.status.items()},
+        }
+
+    def prometheus_text(self) -> str:
+        """The pipeline metrics of the process, plus the schedule's own gauges."""
+        p = metrics.PROMETHEUS_PREFIX
+        recorder = metrics.get_recorder()
+        lines = [recorder.prometheus_text().rstrip("\n")] if recorder is not None else []
+        lines += [f"# HELP {p}_daemon_up Whether the daemon is warm and scheduling.",
+                  f"# TYPE {p}_daemon_up gauge",
+                  f"{p}_daemon_up {int(self.runner is not None)}",
+                  f"# HELP {p}_digest_runs Digest runs per user since start.",
+                  f"# TYPE {p}_digest_runs counter"]
+        for user_id, status in sorted(self.status.items()):
+            lines.append(f'{p}_digest_runs{{user="{user_id}",outcome="ok"}} {status["runs"] - status["failures"]}')
+            lines.append(f'{p}_digest_runs{{user="{user_id}",outcome="failed"}} {status["failures"]}')
+        lines += [f"# HELP {p}_digest_last_seconds Duration of the user's last run.",
+                  f"# TYPE {p}_digest_last_seconds gauge"]
+        for user_id, status in sorted(self.status.items()):
+            if status["last_seconds"] is not None:
+                lines.append(f'{p}_digest_last_seconds{{user="{user_id}"}} {status["last_seconds"]:.3f}')
+        return "\n".join(lines) + "\n"
+
+    async def run(self):
+        """Warms up, then schedules every user until cancelled."""
+        self.loop = asyncio.get_running_loop()
+        self._semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        await self.warm_up()
+        await asyncio.gather(*(self._schedule_user(user) for user in self.roster))
+
+
+def serve_http(daemon: DigestDaemon, port: int, host: str = DEFAULT_HOST) -> ThreadingHTTPServer:
+    """Serves the health, metrics and trigger endpoints from a background thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, body: str, content_type: str = "application/json"):
+            data = body.encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            if path == "/healthz":
+                health = daemon.health()
+                self._send(200 if health["status"] == "ok" else 503, json.dumps(health))
+            elif path == "/metrics":
+                self._send(200, daemon.prometheus_text(), "text/plain; version=0.0.4")
+            else:
+                self._send(404, json.dumps({"error": "not found"}))
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            user_id = parse_qs(url.query).get("user", [None])[0]
+            if url.path != "/run":
+                self._send(404, json.dumps({"error": "not found"}))
+            elif daemon.trigger(user_id):
+                self._send(202, json.dumps({"started": user_id}))
+            elif daemon.is_running(user_id):
+                self._send(409, json.dumps({"error": f"digest for {user_id!r} already running"}))
+            else:
+                self._send(404, json.dumps({"error": f"unknown user {user_id!r}"}))
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="daemon-http", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the Morning Digest as a resident, self-scheduling service.")
+    parser.add_argument("roster", nargs="?", help="Path to the roster JSON file (default: the single .env user)")
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        help="Interface of the endpoints (default: loopback only; they are unauthenticated)")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8080")),
+                        help="Port of the health/metrics endpoints")
+    parser.add_argument("--prewarm-minutes", type=float, default=float(os.getenv("DAEMON_PREWARM_MINUTES", "10")),
+                        help="How long before each send to sync Readwise and prefetch content")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", "8")),
+                        help="Maximum number of digests generated at once")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    if args.roster:
+        from batch import load_roster
+        roster = load_roster(args.roster)
+    else:
+        from main import USER_ID
+        roster = [{"user_id": USER_ID, "readwise_token": os.getenv("READWISE_TOKEN"),
+                   "recipient": os.getenv("EMAIL_RECIPIENT_ADDRESS"), "prompts": {},
+                   "send_at": None, "timezone": None}]
+
+    daemon = DigestDaemon(roster, prewarm_minutes=args.prewarm_minutes, concurrency=args.concurrency)
+    server = serve_http(daemon, args.port, args.host)
+    print(f"Morning Digest daemon: {len(roster)} users, endpoints on {args.host}:{args.port}")
+    try:
+        asyncio.run(daemon.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
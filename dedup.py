@@ -0,0 +1,150 @@
+import re
+import zlib
+import operator
+
+from documents import annotate
+
+# Jaccard similarity (character 4-grams of title + summary) above which two
+# documents are considered copies of the same story
+DEFAULT_THRESHOLD = 0.7
+
+# MinHash signature length, split into BANDS bands of ROWS rows for LSH:
+# pairs above ~0.7 similarity share at least one band with >99% probability
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 4
+# LSH buckets larger than this (e.g. boilerplate shared by a whole feed) are
+# only compared against their first member, to keep the cost linear
+MAX_BUCKET = 100
+
+_BIN_BITS = 6
+assert 1 << _BIN_BITS == NUM_PERM
+_VALUE_MASK = (1 << (64 - _BIN_BITS)) - 1
+_MASK = (1 << 64) - 1
+# Multiply-shift constants spreading 32-bit CRCs over 64 bits
+_A, _B = 0x9E3779B97F4A7C15, 0x632BE59BD9B4E019
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def shingles(doc: dict) -> set:
+    """Character 4-grams of the document's normalized title and summary."""
+    text = " ".join(_WORD_RE.findall(f"{doc.get('title') or ''} {doc.get('summary') or ''}".lower()))
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_set: set) -> list:
+    """
+    MinHash signature of a non-empty shingle set, computed with one
+    permutation: each shingle hash goes to one of NUM_PERM bins by its top
+    bits and every bin keeps its minimum, in a single pass over the shingles.
+    Empty bins borrow the value of the next non-empty bin (rotation
+    densification), so similar sets still agree on them.
+    """
+    bins = [None] * NUM_PERM
+    for s in shingle_set:
+        h = (zlib.crc32(s.encode("utf-8")) * _A + _B) & _MASK
+        index, value = h >> (64 - _BIN_BITS), h & _VALUE_MASK
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    # One backwards pass around the circle, starting from a non-empty bin
+    start = next(i for i, value in enumerate(bins) if value is not None)
+    signature = [None] * NUM_PERM
+    distance, value = 0, bins[start]
+    for i in range(start, start - NUM_PERM, -1):
+        if bins[i] is not None:
+            distance, value = 0, bins[i]
+        else:
+            distance += 1
+        signature[i] = (distance, value)
+    return signature
+
+
+def band_keys(signature: list) -> list:
+    """LSH keys of a MinHash signature: one hashable key per band of ROWS rows."""
+    return [(band, *signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def cluster(docs: list, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    Groups near-duplicate documents.
+
+    Candidate pairs come from MinHash LSH banding (documents sharing any band
+    of their signature), so the cost grows with the number of documents, not
+    pairs; candidates are then confirmed with their exact Jaccard similarity.
+
+    Returns:
+        list: Clusters as lists of indices into `docs`, in input order.
+    """
+    parent = list(range(len(docs)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    sets = [shingles(doc) for doc in docs]
+    signatures = [None] * len(docs)
+    buckets = {}
+    for i, shingle_set in enumerate(sets):
+        if not shingle_set:
+            continue
+        signatures[i] = minhash(shingle_set)
+        for key in band_keys(signatures[i]):
+            buckets.setdefault(key, []).append(i)
+
+    checked = set()
+    for members in buckets.values():
+        if len(members) <= MAX_BUCKET:
+            pairs = ((i, j) for pos, i in enumerate(members) for j in members[pos + 1:])
+        else:
+            pairs = ((members[0], j) for j in members[1:])
+        for i, j in pairs:
+            if (i, j) in checked:
+                continue
+            checked.add((i, j))
+            if find(i) == find(j):
+                continue
+            # Signatures agreeing on well under `threshold` of their bins rule
+            # the pair out without building the set intersection
+            agree = sum(map(operator.eq, signatures[i], signatures[j]))
+            if agree < (threshold - 0.2) * NUM_PERM:
+                continue
+            if jaccard(sets[i], sets[j]) >= threshold:
+                parent[find(j)] = find(i)
+
+    groups = {}
+    for i in range(len(docs)):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(groups.values(), key=lambda group: group[0])
+
+
+def _representative_key(doc: dict):
+    # Prefer what the user saved, then the fullest version of the story
+    return (doc.get('source_location') == 'library', doc.get('word_count') or 0, len(doc.get('summary') or ''))
+
+
+def collapse_duplicates(docs: list, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    Collapses each cluster of near-duplicate documents into one representative.
+
+    Returns:
+        list: One document per story, in input order, each with a
+        'source_count' (number of copies found; input documents are not modified).
+    """
+    collapsed = []
+    for group in cluster(docs, threshold):
+        best = max(group, key=lambda i: _representative_key(docs[i]))
+        collapsed.append(annotate(docs[best], source_count=len(group)))
+    return collapsed
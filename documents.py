@@ -0,0 +1,170 @@
+"""
+Compact document records and the streaming parser of Reader /list/ pages.
+
+A /list/ result carries a few dozen fields, of which the pipeline reads
+eight. Pages are parsed item by item straight from the response stream and
+every item is projected into a `DocumentRecord` as soon as it is decoded,
+so neither a whole page body nor the full API dicts are ever held in memory.
+
+The selector's stages (dedup, sent history, shortlist) take records as they
+are, and `annotate` copies them with the fields each stage adds.
+"""
+import re
+import json
+import codecs
+from dataclasses import dataclass, asdict, replace
+from typing import Iterable, Iterator
+
+# Bytes read from the response stream at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+@dataclass(slots=True)
+class DocumentRecord:
+    """The fields of a Reader document used by the pipeline."""
+    id: str
+    title: str = ""
+    summary: str = ""
+    source_location: str = ""
+    location: str = ""
+    word_count: int = 0
+    source_url: str = ""
+    updated_at: str = ""
+    # Added by the selector's stages (see `annotate`)
+    source_count: int = 1
+    novelty: float = 1.0
+    scores: dict = None
+
+    @classmethod
+    def from_api(cls, data: dict, label: str = None, location: str = None) -> "DocumentRecord":
+        """
+        Projects a /list/ result (or cached metadata) onto a record.
+
+        Args:
+            data (dict): The document as returned by the API.
+            label (str): Location label exposed to the agents ('feed' or
+                'library'); defaults to the document's own `source_location`.
+            location (str): Reader location the document was listed in, if
+                the document does not carry its own.
+        """
+        return cls(
+            id=data.get("id"),
+            title=data.get("title") or "",
+            summary=data.get("summary") or "",
+            source_location=label or data.get("source_location") or "",
+            location=data.get("location") or location or "",
+            word_count=data.get("word_count") or 0,
+            source_url=data.get("source_url") or "",
+            updated_at=data.get("updated_at") or "",
+        )
+
+    def get(self, key: str, default=None):
+        """Dict-style read access, for stages written against the API dicts."""
+        return getattr(self, key, default)
+
+    def __getitem__(self, key: str):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def annotate(doc, **fields):
+    """
+    Returns a copy of a document (a dict or a DocumentRecord) with `fields`
+    set; the document itself is not modified.
+    """
+    if isinstance(doc, DocumentRecord):
+        return replace(doc, **fields)
+    return {**doc, **fields}
+
+
+class _StreamReader:
+    """Incremental JSON tokenizer over a stream of text chunks."""
+
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self.buffer = ""
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        """Appends the next chunk to the unread part of the buffer; False at the end of the stream."""
+        for chunk in self._chunks:
+            if chunk:
+                self.buffer = self.buffer[self.pos:] + chunk
+                self.pos = 0
+                return True
+        return False
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise json.JSONDecodeError("Unexpected end of page", self.buffer, self.pos)
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next complete JSON value, reading more of the stream as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number ending the buffer may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_list_page(chunks: Iterable[bytes], meta: dict, array_key: str = "results") -> Iterator[dict]:
+    """
+    Yields the items of a /list/ page one at a time, as they are decoded
+    from the raw response chunks.
+
+    Args:
+        chunks (Iterable[bytes]): The response body, e.g. `response.iter_content()`.
+        meta (dict): Receives the page's other top-level fields
+            (`count`, `nextPageCursor`) as they are read.
+        array_key (str): Top-level key of the items.
+
+    Raises:
+        json.JSONDecodeError: If the body is not a complete JSON object.
+    """
+    reader = _StreamReader(codecs.iterdecode(chunks, "utf-8"))
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == array_key and reader.peek() == "[":
+            reader.pos += 1
+            if reader.peek() != "]":
+                while True:
+                    yield reader.value()
+                    if reader.peek() == "]":
+                        break
+                    reader.expect(",")
+            reader.pos += 1
+        else:
+            meta[key] = reader.value()
+        if reader.peek() == "}":
+            return
+        reader.expect(",")
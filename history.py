@@ -0,0 +1,219 @@
+"""
+Sent history: what earlier digests delivered to each user, so that articles
+are not sent twice and the selector knows which stories are already known.
+
+Every delivered article is remembered by a few 64-bit fingerprints (its
+document ID, its normalized URL and the LSH band keys of its title and
+summary), appended as fixed-size records to one binary file. Lookups go
+through an in-memory Bloom filter rebuilt from that file at start-up, so a
+check costs a handful of bit tests whatever the size of the history; the
+rare hit is confirmed against the exact fingerprints, loaded with it, so a
+false positive never drops an article.
+"""
+import os
+import math
+import time
+import struct
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from dedup import minhash, shingles, band_keys, ROWS
+from documents import annotate
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser("~"), ".cache", "morning_digest", "sent_history.bin")
+
+# One record per fingerprint: the fingerprint and the day (since the epoch) it was sent
+_RECORD = struct.Struct("<QI")
+
+# Query parameters that only track the click and never change the page
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref")
+
+
+def normalize_url(url: str) -> str:
+    """Normalizes a URL so that links to the same page compare equal."""
+    parts = urlsplit(url.strip())
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith(_TRACKING_PARAMS)]
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return urlunsplit(("", host, parts.path.rstrip("/"), urlencode(sorted(query)), ""))
+
+
+def fingerprint(user_id: str, kind: str, value) -> int:
+    """64-bit fingerprint of a value of the given kind ('id', 'url', 'band') for a user."""
+    digest = hashlib.blake2b(f"{user_id}\0{kind}\0{value}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over 64-bit fingerprints, sized for `capacity`
+    entries at the given false-positive rate (double hashing, so a lookup
+    costs `k` bit tests and no extra hashing).
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.k = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, fp: int):
+        h1, h2 = fp & 0xFFFFFFFF, (fp >> 32) | 1
+        return ((h1 + i * h2) % self.size for i in range(self.k))
+
+    def add(self, fp: int):
+        for pos in self._positions(fp):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, fp: int) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(fp))
+
+
+class SentHistory:
+    """
+    Per-user history of delivered articles, backed by an append-only file.
+
+    Records older than `retention_days` are skipped when the file is loaded,
+    and the file is rewritten without them once they make up most of it, so
+    the file and the filter stay proportional to the retention window.
+    """
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH, retention_days: int = 365,
+                 capacity: int = 100_000, error_rate: float = 0.001):
+        self.path = path
+        self.retention_days = retention_days
+        self.error_rate = error_rate
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._load(capacity)
+
+    def _load(self, capacity: int):
+        """Rebuilds the filter from the records still within the retention window."""
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        data = data[:len(data) - len(data) % _RECORD.size]  # Drop a torn last record
+        cutoff = int(time.time() // 86400) - self.retention_days
+        live = [fp for fp, day in _RECORD.iter_unpack(data) if day >= cutoff]
+
+        self.filter = BloomFilter(max(capacity, 2 * len(live)), self.error_rate)
+        for fp in live:
+            self.filter.add(fp)
+        self.fingerprints = set(live)
+        self.records = len(live)
+
+        expired = len(data) // _RECORD.size - len(live)
+        if expired > len(live):
+            self._compact(data, cutoff)
+
+    def _compact(self, data: bytes, cutoff: int):
+        """Rewrites the file without its expired records."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(_RECORD.pack(fp, day) for fp, day in _RECORD.iter_unpack(data) if day >= cutoff))
+        os.replace(tmp_path, self.path)
+        logger.info(f"Sent history compacted to {self.records} records")
+
+    @staticmethod
+    def _identity_keys(user_id: str, doc: dict) -> list:
+        keys = []
+        if doc.get("id"):
+            keys.append(fingerprint(user_id, "id", doc["id"]))
+        if doc.get("source_url"):
+            keys.append(fingerprint(user_id, "url", normalize_url(doc["source_url"])))
+        return keys
+
+    @staticmethod
+    def _band_keys(user_id: str, doc: dict) -> list:
+        shingle_set = shingles(doc)
+        if not shingle_set:
+            return []
+        return [fingerprint(user_id, "band", key) for key in band_keys(minhash(shingle_set))]
+
+    def _seen(self, fp: int) -> bool:
+        """True if the fingerprint was recorded: a filter hit, confirmed exactly."""
+        return fp in self.filter and fp in self.fingerprints
+
+    def was_sent(self, user_id: str, doc: dict) -> bool:
+        """True if the document (same ID or same URL) was already delivered to the user."""
+        return any(self._seen(fp) for fp in self._identity_keys(user_id, doc))
+
+    def novelty(self, user_id: str, doc: dict) -> float:
+        """
+        Estimates how new the document's story is to the user, from 1.0
+        (nothing similar delivered) down to 0.0 (the same story was sent).
+        """
+        keys = self._band_keys(user_id, doc)
+        if not keys:
+            return 1.0
+        matched = sum(self._seen(fp) for fp in keys) / len(keys)
+        # A band matches with probability similarity ** ROWS
+        return 1.0 - matched ** (1 / ROWS)
+
+    def filter_candidates(self, user_id: str, docs: list) -> list:
+        """
+        Drops the documents already delivered to the user.
+
+        Returns:
+            list: The other documents, each with a 'novelty' score attached
+            (input documents are not modified).
+        """
+        return [
+            annotate(doc, novelty=round(self.novelty(user_id, doc), 2))
+            for doc in docs if not self.was_sent(user_id, doc)
+        ]
+
+    def record(self, user_id: str, articles: list):
+        """Remembers the articles delivered to the user today."""
+        keys = []
+        for article in articles:
+            keys += self._identity_keys(user_id, article) + self._band_keys(user_id, article)
+        if not keys:
+            return
+        day = int(time.time() // 86400)
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(b"".join(_RECORD.pack(fp, day) for fp in keys))
+                f.flush()
+                os.fsync(f.fileno())
+            for fp in keys:
+                self.filter.add(fp)
+            self.fingerprints.update(keys)
+            self.records += len(keys)
+            if self.filter.count > self.filter.capacity:
+                # Past its sizing the filter's error rate climbs: rebuild it larger
+                self._load(2 * self.filter.capacity)
+
+
+_history = None
+_history_lock = threading.Lock()
+
+def get_history():
+    """
+    Returns the process-wide sent history configured from the environment,
+    or None if it is disabled (HISTORY_DISABLED=1) or unavailable.
+    """
+    global _history
+    if os.getenv("HISTORY_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    with _history_lock:
+        if _history is None:
+            try:
+                _history = SentHistory(
+                    path=os.getenv("HISTORY_PATH", DEFAULT_HISTORY_PATH),
+                    retention_days=int(os.getenv("HISTORY_RETENTION_DAYS", "365")),
+                )
+            except (OSError, ValueError) as e:
+                logger.warning(f"Sent history unavailable: {e}. Continuing without history.")
+                return None
+        return _history
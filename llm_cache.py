@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+
+from google.adk.models.llm_response import LlmResponse
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LLM_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "morning_digest", "llm.sqlite3")
+
+# Per-call fields that differ between otherwise identical generations
+_VOLATILE_KEYS = {"id", "thought_signature"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access);
+"""
+
+
+def _scrub(value):
+    """Drops volatile keys (function call IDs, thought signatures) recursively."""
+    if isinstance(value, dict):
+        return {k: _scrub(v) for k, v in value.items() if k not in _VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_scrub(v) for v in value]
+    return value
+
+
+def cache_key(model: str, instruction, contents: list, tools=()) -> str:
+    """
+    Content-addressed key of a model turn: a hash of the model name, the
+    instruction text and the canonicalized conversation (user input, tool
+    calls and tool outputs).
+    """
+    if hasattr(instruction, "model_dump"):
+        instruction = instruction.model_dump(mode="json", exclude_none=True)
+    canonical = {
+        "model": model,
+        "instruction": instruction,
+        "tools": sorted(tools),
+        "contents": _scrub([c.model_dump(mode="json", exclude_none=True) for c in contents]),
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk cache of model responses keyed by `cache_key`. Entries expire
+    after `ttl` seconds and the least recently used ones are evicted above
+    `max_entries`.
+    """
+
+    def __init__(self, path: str = DEFAULT_LLM_CACHE_PATH, ttl: float = 24 * 3600, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, key: str):
+        """Returns the cached response JSON, or None on a miss."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key: str, response: str):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,))
+            self._conn.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+
+def bypass_enabled() -> bool:
+    """LLM_CACHE_BYPASS=1 skips cached responses (fresh ones are still stored)."""
+    return os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """
+    Returns the process-wide response cache configured from the environment,
+    or None if it is disabled (LLM_CACHE_DISABLED=1) or unavailable.
+    """
+    global _default_cache
+    if os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = ResponseCache(
+                    path=os.getenv("LLM_CACHE_PATH", DEFAULT_LLM_CACHE_PATH),
+                    ttl=float(os.getenv("LLM_CACHE_TTL_HOURS", "24")) * 3600,
+                    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+                )
+            except (sqlite3.Error, OSError, ValueError) as e:
+                logger.warning(f"LLM response cache unavailable: {e}. Continuing without cache.")
+                return None
+        return _default_cache
+
+
+# Keys of the model turns in flight, per (invocation, agent), between the two callbacks
+_pending_keys = {}
+
+def before_model_cache(callback_context, llm_request):
+    """
+    Before-model callback: answers the turn from the cache when an identical
+    request was already generated.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return None
+    key = cache_key(
+        llm_request.model,
+        llm_request.config.system_instruction if llm_request.config else None,
+        llm_request.contents,
+        llm_request.tools_dict.keys(),
+    )
+    cached = None if bypass_enabled() else cache.get(key)
+    if cached is None:
+        _pending_keys[(callback_context.invocation_id, callback_context.agent_name)] = key
+        return None
+    logger.info(f"LLM cache hit for {callback_context.agent_name}")
+    return LlmResponse.model_validate_json(cached)
+
+
+def after_model_cache(callback_context, llm_response):
+    """After-model callback: stores complete, successful responses."""
+    key = _pending_keys.pop((callback_context.invocation_id, callback_context.agent_name), None)
+    cache = get_response_cache()
+    if key is None or cache is None:
+        return None
+    if llm_response.partial or llm_response.error_code or not llm_response.content:
+        return None
+    store_response(cache, key, llm_response)
+    return None
+
+
+def store_response(cache: ResponseCache, key: str, llm_response: LlmResponse):
+    """Stores a response without its volatile IDs and token usage."""
+    stored = llm_response.model_copy(update={"usage_metadata": None})
+    cache.put(key, json.dumps(_scrub(stored.model_dump(mode="json", exclude_none=True))))
@@ -1,221 +1,343 @@
 import os
 import json
-import markdown
+import time
+import argparse
 import logging
-from dotenv import load_dotenv
+import asyncio
+import threading
+import traceback
 
-# Configure logging immediately to capture import-time logs (like prompt fetching)
+# Configure logging immediately to capture logs emitted while the agents load
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-from notification import send_digest_email
-# Load environment variables from .env file
-load_dotenv()
+# Heavy modules (ADK, google-genai, the agent graph) are imported
+# on the code paths that need them, to keep the job's cold start short.
 
-from google.adk.runners import InMemoryRunner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types
-from agent import morning_digest_pipeline
-from datetime import datetime
-import asyncio
-import traceback
+APP_NAME = "morning_digest"
+# User of the single-user run (sessions and sent history)
+USER_ID = "caio_user"
 
-def _convert_to_html_email(markdown_text: str) -> str:
+def _warm_readwise():
+    """Pulls the Readwise delta into the document cache (runs in the background)."""
+    try:
+        from client import get_client
+        get_client().sync()
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"Background Readwise sync failed: {e}")
+
+def create_runner():
     """
-    Converts Markdown to HTML with clean email template and CSS inline.
+    Builds the ADK runner for the Morning Digest pipeline, with the durable
+    session store (see session_store.py) so interrupted runs can resume.
     """
-    # Convert Markdown to HTML
-    html_body = markdown.markdown(
-        markdown_text,
-        extensions=['extra', 'nl2br']
-    )
-    
-    # Wrap in clean HTML template with inline CSS for email compatibility
-    html_template = f"""
-<!DOCTYPE html>
-<html lang="it">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <style>
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            max-width: 800px;
-            margin: 0 auto;
-            padding: 20px;
-            background-color: #f9f9f9;
-        }}
-        h1 {{
-            color: #2c3e50;
-            border-bottom: 3px solid #3498db;
-            padding-bottom: 10px;
-        }}
-        h3 {{
-            color: #34495e;
-            margin-top: 30px;
-            border-left: 4px solid #3498db;
-            padding-left: 10px;
-        }}
-        strong {{
-            color: #2c3e50;
-        }}
-        a {{
-            color: #3498db;
-            text-decoration: none;
-        }}
-        a:hover {{
-            text-decoration: underline;
-        }}
-        ul {{
-            padding-left: 25px;
-        }}
-        li {{
-            margin-bottom: 8px;
-        }}
-        hr {{
-            border: none;
-            border-top: 1px solid #ddd;
-            margin: 30px 0;
-        }}
-    </style>
-</head>
-<body>
-    {html_body}
-    <hr>
-    <p style="color: #7f8c8d; font-size: 0.9em; text-align: center;">
-        Questo digest è stato generato automaticamente da <strong>Morning Digest AI</strong> 🤖
-    </p>
-</body>
-</html>
-"""
-    return html_template
-
-def generate_markdown_email(articles):
+    from google.adk.runners import Runner
+    from google.adk.artifacts import InMemoryArtifactService
+    from agent import morning_digest_pipeline
+    from session_store import get_session_service
+    return Runner(agent=morning_digest_pipeline, app_name=APP_NAME,
+                  session_service=get_session_service(), artifact_service=InMemoryArtifactService())
+
+class PipelineTrace:
     """
-    Generates a Markdown email report from the list of articles.
+    Per-event timing and token usage of one pipeline run, recorded while the
+    runner streams its events.
     """
-    today = datetime.now().strftime("%d/%m/%Y")
-    md_output = f"# 🌅 Morning Digest (AI Powered) - {today}\n\n"
-    md_output += f"Buongiorno! Ecco la tua selezione di letture per oggi, curata dall'IA per massimizzare il tuo impatto.\n\n"
-    
-    if not articles:
-        md_output += "Nessun articolo trovato o errore durante l'esecuzione.\n"
-        return md_output
-
-    for i, doc in enumerate(articles, 1):
-        md_output += f"### {i}. {doc['title']}\n"
-        md_output += f"**Categoria:** {doc['category_label']}\n\n"
-        
-        if 'reasoning' in doc:
-            md_output += f"**Perché te lo propongo:** _{doc['reasoning']}_\n\n"
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        # One dict per event: elapsed (s), author, kind, prompt/output tokens
+        self.events = []
+
+    def record(self, event):
+        """
+        Records an ADK event as it arrives. Events carrying token usage are
+        model turns: they are also reported to `metrics` as `llm.turn` spans
+        lasting since the previous event.
+        """
+        import metrics
+
+        usage = getattr(event, "usage_metadata", None)
+        calls = event.get_function_calls()
+        responses = event.get_function_responses()
+        if calls:
+            kind = "call " + ", ".join(call.name for call in calls)
+        elif responses:
+            kind = "response " + ", ".join(response.name for response in responses)
         else:
-            md_output += "\n"
-            
-        # Key Takeaways (if enriched)
-        if 'key_takeaways' in doc and doc['key_takeaways']:
-            md_output += "**Key Takeaways:**\n"
-            for point in doc['key_takeaways']:
-                md_output += f"*   {point}\n"
-            md_output += "\n"
-            
-        md_output += f"{doc.get('summary', 'Nessun riassunto disponibile.')}\n\n"
-        md_output += f"[Leggi l'articolo]({doc['source_url']})\n\n"
-        md_output += "---\n\n"
-        
-    return md_output
-
-def main():
+            kind = "final" if event.is_final_response() else "text"
+        entry = {
+            "elapsed": time.perf_counter() - self.start,
+            "author": event.author,
+            "kind": kind,
+            "prompt_tokens": (usage.prompt_token_count or 0) if usage else 0,
+            "output_tokens": (usage.candidates_token_count or 0) if usage else 0,
+        }
+        if usage:
+            previous = self.events[-1]["elapsed"] if self.events else 0.0
+            metrics.record("llm.turn", entry["elapsed"] - previous, agent=event.author,
+                           prompt_tokens=entry["prompt_tokens"], output_tokens=entry["output_tokens"])
+        self.events.append(entry)
+        logging.getLogger(__name__).debug(
+            f"[{entry['elapsed']:7.2f}s] {entry['author']}: {kind} "
+            f"({entry['prompt_tokens']} in / {entry['output_tokens']} out tokens)"
+        )
+
+    def by_author(self) -> dict:
+        """Returns author -> {'seconds', 'events', 'prompt_tokens', 'output_tokens'}."""
+        totals = {}
+        previous = 0.0
+        for entry in self.events:
+            stats = totals.setdefault(entry["author"], {"seconds": 0.0, "events": 0, "prompt_tokens": 0, "output_tokens": 0})
+            # Time since the previous event is attributed to the event's author
+            stats["seconds"] += entry["elapsed"] - previous
+            stats["events"] += 1
+            stats["prompt_tokens"] += entry["prompt_tokens"]
+            stats["output_tokens"] += entry["output_tokens"]
+            previous = entry["elapsed"]
+        return totals
+
+    def summary(self) -> str:
+        lines = [f"Pipeline finished in {time.perf_counter() - self.start:.2f}s ({len(self.events)} events)"]
+        for author, stats in self.by_author().items():
+            lines.append(
+                f"  {author}: {stats['seconds']:.2f}s, {stats['events']} events, "
+                f"{stats['prompt_tokens']} prompt + {stats['output_tokens']} output tokens"
+            )
+        return "\n".join(lines)
+
+def _on_selection(user_id: str, selection_result) -> None:
+    """
+    Reacts to the selector's output as soon as it is streamed: lists the
+    chosen articles and fetches the content the enricher will need.
+    Runs in a worker thread, alongside the enricher's start-up.
+    """
+    from utils import parse_agent_json
+    from client import get_client, get_user_client
+    from agents.enricher import is_enrichment_target
+
+    try:
+        selection = parse_agent_json(selection_result).get("selection", [])
+    except (json.JSONDecodeError, AttributeError):
+        return
+
+    articles = [a for a in selection if isinstance(a, dict)]
+    print(f">> SELECTED {len(articles)} articles:")
+    for i, article in enumerate(articles, 1):
+        print(f"   {i}. [{article.get('category_label', '')}] {article.get('title', '')}")
+
+    ids = [a['id'] for a in articles if a.get('id') and is_enrichment_target(a)]
+    if ids:
+        get_user_client(user_id, get_client()).fetch_documents_details(ids)
+
+async def run_pipeline(runner, user_id: str, session_id: str, state: dict = None, run_config=None,
+                       trace: PipelineTrace = None, resume: bool = False):
+    """
+    Runs the pipeline in a new session and returns its 'final_digest' state.
+
+    Events are handled as they stream: the selector's output starts the
+    enricher's content prefetch right away, and 'final_digest' is taken from
+    the event that sets it rather than from a re-read of the session.
+
+    Args:
+        runner: The ADK runner (see `create_runner`).
+        user_id (str): User owning the session.
+        session_id (str): Session to create for this run.
+        state (dict): Initial session state (e.g. prompt overrides). The
+            other prompts are pinned to their current versions for the run.
+        run_config: Optional ADK RunConfig.
+        trace (PipelineTrace): Optional trace receiving every event.
+        resume (bool): If the session already exists (an earlier attempt),
+            continue it with `state` merged in: the stages it completed are
+            skipped. A session whose digest was delivered yields None.
+    """
+    from google.genai import types
+
+    from session_store import DELIVERED_KEY, update_session_state
+    from utils import prompts
+
+    state = {**prompts.pinned(), **(state or {})}
+    session = None
+    if resume and session_id:
+        session = await runner.session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+        if session is not None and session.state.get(DELIVERED_KEY):
+            # Never hand a delivered digest out again (see `digest_delivered`)
+            print(f">> RESUME: Session {session_id} was already delivered.")
+            return None
+        if session is not None:
+            print(f">> RESUME: Continuing session {session_id}.")
+            # The caller's state (e.g. prompt overrides) wins over the stored one
+            changed = {key: value for key, value in state.items() if session.state.get(key) != value}
+            if changed:
+                await update_session_state(runner.session_service, session, changed)
+    if session is None:
+        session = await runner.session_service.create_session(
+            app_name=APP_NAME,
+            user_id=user_id,
+            session_id=session_id,
+            state=state
+        )
+
+    # Trigger the pipeline
+    user_message = types.Content(
+        role="user",
+        parts=[types.Part.from_text(text="Start Morning Digest generation.")]
+    )
+
+    final_digest = None
+    prefetch = None
+    async for event in runner.run_async(user_id=user_id, session_id=session.id, new_message=user_message, run_config=run_config):
+        if trace is not None:
+            trace.record(event)
+        delta = event.actions.state_delta if event.actions else None
+        if not delta:
+            continue
+        if "selection_result" in delta and prefetch is None:
+            prefetch = asyncio.create_task(asyncio.to_thread(_on_selection, user_id, delta["selection_result"]))
+        if "final_digest" in delta:
+            final_digest = delta["final_digest"]
+
+    if prefetch is not None:
+        try:
+            await prefetch
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Early content prefetch failed: {e}")
+
+    if final_digest is None:
+        # Not streamed (e.g. set by a callback): fall back to the stored state
+        final_session = await runner.session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session.id)
+        final_digest = final_session.state.get("final_digest")
+    return final_digest
+
+async def digest_delivered(runner, user_id: str, session_id: str) -> bool:
+    """Returns True if the session's digest was already delivered (see `mark_delivered`)."""
+    from session_store import DELIVERED_KEY
+
+    session = await runner.session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    return bool(session and session.state.get(DELIVERED_KEY))
+
+async def mark_delivered(runner, user_id: str, session_id: str):
+    """Records in the session that its digest was sent, so a rerun of the day does not send it again."""
+    from session_store import DELIVERED_KEY, update_session_state
+
+    session = await runner.session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    if session is not None:
+        await update_session_state(runner.session_service, session, {DELIVERED_KEY: time.time()})
+
+def deliver_digest(result_json, recipient_email: str = None, verbose: bool = True, user_id: str = None) -> bool:
+    """
+    Renders the pipeline's 'final_digest' output and emails it.
+
+    Args:
+        result_json (str | dict): The 'final_digest' session state.
+        recipient_email (str): Recipient; defaults to EMAIL_RECIPIENT_ADDRESS.
+        verbose (bool): Print the plain-text report to stdout.
+        user_id (str): User the digest was made for; once it is sent, its
+            articles are added to the user's sent history.
+
+    Returns:
+        bool: True if the email was sent.
+    """
+    import metrics
+    from utils import parse_agent_json
+    from render import render_digest
+    from notification import send_digest_email
+
+    # Robust parsing (strips Markdown fences and repairs invalid escapes)
+    try:
+        data = parse_agent_json(result_json)
+    except json.JSONDecodeError:
+        print("Repair failed. Raw output:")
+        print(result_json)
+        raise
+
+    articles = data.get("selection", [])
+
+    with metrics.span("render", articles=len(articles)):
+        digest = render_digest(articles)
+    if verbose:
+        print(digest.text)
+
+    with metrics.span("email.deliver") as span:
+        sent = send_digest_email(digest.subject, digest.html, recipient_email=recipient_email, text_content=digest.text)
+        span.set(sent=sent)
+
+    if sent and user_id is not None:
+        from history import get_history
+        history = get_history()
+        if history is not None:
+            history.record(user_id, [a for a in articles if isinstance(a, dict)])
+    return sent
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generates and sends the Morning Digest.")
+    parser.add_argument("--no-llm-cache", action="store_true",
+                        help="Ignore cached model responses (fresh responses are still cached).")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Start today's digest over instead of resuming an interrupted run.")
+    args = parser.parse_args(argv)
+    if args.no_llm_cache:
+        os.environ["LLM_CACHE_BYPASS"] = "1"
+
+    # Load environment variables from .env file (before the agents read them)
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    # Start fetching from Readwise while the agent graph is still importing;
+    # the selector's tool call then reads from the warm cache.
+    threading.Thread(target=_warm_readwise, name="readwise-warmup", daemon=True).start()
+
     print("="*30)
     print("Starting Morning Digest Agent (ADK Mode)...")
     print("="*30 + "\n")
     
     async def run_agent():
+        from session_store import daily_session_id
+        from utils import prompts
+        runner = create_runner()
+        session_id = daily_session_id()
         try:
-            # Setup ADK Runner
-            runner = InMemoryRunner(agent=morning_digest_pipeline, app_name="morning_digest")
-            
-            # Access the internal session service
-            session_service = runner.session_service
-            
-            # Create session (awaiting the coroutine)
-            session = await session_service.create_session(
-                app_name="morning_digest",
-                user_id="caio_user",
-                session_id="daily_session"
-            )
-            
+            # Up-to-date prompts before the run, rather than the defaults on a cold start
+            await asyncio.to_thread(prompts.load)
+            if args.fresh:
+                await runner.session_service.delete_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+            elif await digest_delivered(runner, USER_ID, session_id):
+                print("Today's digest was already delivered. Use --fresh to make a new one.")
+                return
             print("Running Agent Pipeline...")
-            
-            # Trigger the pipeline
-            user_message = types.Content(
-                parts=[types.Part.from_text(text="Start Morning Digest generation.")]
-            )
-            
-            async for event in runner.run_async(user_id="caio_user", session_id=session.id, new_message=user_message):
-                pass
-            
-            # Retrieve final state from session
-            final_session = await session_service.get_session(app_name="morning_digest", user_id="caio_user", session_id=session.id)
-            return final_session.state.get("final_digest")
+            trace = PipelineTrace()
+            result_json = await run_pipeline(runner, user_id=USER_ID, session_id=session_id, trace=trace, resume=True)
+            print(trace.summary())
+            from prefetch import get_prefetcher
+            prefetcher = get_prefetcher()
+            if prefetcher is not None:
+                stats = prefetcher.stats()
+                print(f"Speculative prefetch: {stats['hits']} hits, {stats['misses']} misses, "
+                      f"{stats['wasted']} wasted of {stats['speculated']} fetched")
 
         except Exception as e:
             print(f"CRITICAL ERROR: {e}")
             traceback.print_exc()
-            return None
+            result_json = None
 
-    # Run the async agent
-    result_json = asyncio.run(run_agent())
-    
-    if result_json:
-        # Parse if it's a string
-        if isinstance(result_json, str):
-            # Basic Markdown cleanup
-            if result_json.startswith("```json"):
-                result_json = result_json[7:]
-            if result_json.endswith("```"):
-                result_json = result_json[:-3]
-            
-            # Robust parsing
-            try:
-                data = json.loads(result_json)
-            except json.JSONDecodeError as e:
-                print(f"Warning: JSON Decode Error ({e}). Attempting to repair...")
-                # Common fix for "Invalid \escape": escape backslashes that aren't valid JSON escapes
-                # This is a simple heuristic: replace \ with \\ if not followed by " or \ or / or b or f or n or r or t or u
-                import re
-                # This regex finds backslashes that are NOT followed by valid escape chars
-                cleaned_json = re.sub(r'\\(?![/u"\\bfnrt])', r'\\\\', result_json)
-                try:
-                    data = json.loads(cleaned_json)
-                    print("Repair successful.")
-                except json.JSONDecodeError:
-                    print("Repair failed. Raw output:")
-                    print(result_json)
-                    raise
-        else:
-            data = result_json
-            
-        articles = data.get("selection", [])
-        
-        report = generate_markdown_email(articles)
-        print(report)
-        
-        # Convert Markdown to HTML for email
-        html_content = _convert_to_html_email(report)
-        
-        # Send email
-        today = datetime.now().strftime("%d/%m/%Y")
-        subject = f"🌅 Morning Digest AI - {today}"
-        
-        success = send_digest_email(subject, html_content)
-        
-        if success:
-            print("\n✅ Email inviata con successo!")
+        if result_json:
+            success = await asyncio.to_thread(deliver_digest, result_json, None, True, USER_ID)
+
+            if success:
+                await mark_delivered(runner, USER_ID, session_id)
+                print("\n✅ Email inviata con successo!")
+            else:
+                print("\n❌ Errore nell'invio email. Controlla i log e le credenziali SMTP.")
         else:
-            print("\n❌ Errore nell'invio email. Controlla i log e le credenziali SMTP.")
-    else:
-        print("Pipeline finished but no 'final_digest' found in state.")
+            print("Pipeline finished but no 'final_digest' found in state.")
+
+    # Run the async agent
+    asyncio.run(run_agent())
+
+    import metrics
+    recorder = metrics.get_recorder()
+    if recorder is not None:
+        print("\n" + recorder.summary())
+        metrics.export_run(recorder)
 
 if __name__ == "__main__":
     main()
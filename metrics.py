@@ -0,0 +1,290 @@
+"""
+Run instrumentation: timing spans around the Readwise calls, tool calls,
+model turns, rendering and email delivery, exported as a JSON run report
+and a Prometheus textfile.
+
+Spans are recorded in memory for the duration of the process (a long-running
+one keeps the latest, plus cumulative per-stage totals for Prometheus); set
+METRICS_DISABLED=1 to turn them into no-ops.
+"""
+import os
+import json
+import time
+import logging
+import threading
+import statistics
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+PROMETHEUS_PREFIX = "morning_digest"
+
+
+class _Span:
+    """Times a block and records it on exit; `set` adds attributes (e.g. tokens)."""
+
+    __slots__ = ("_recorder", "name", "attrs", "_start")
+
+    def __init__(self, recorder, name: str, attrs: dict):
+        self._recorder = recorder
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self._recorder.record(self.name, time.perf_counter() - self._start, **self.attrs)
+        return False
+
+
+class _NullSpan:
+    """Shared no-op span used when metrics are disabled."""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class MetricsRecorder:
+    """
+    Thread-safe in-memory collection of the spans of a run. A long-running
+    process keeps only the last `max_spans` spans; the counts, durations,
+    errors and tokens exported to Prometheus are cumulative totals, which
+    only ever grow.
+    """
+
+    def __init__(self, max_spans: int = 100_000):
+        self.started_at = time.time()
+        self.last_run_at = self.started_at
+        self.spans = deque(maxlen=max_spans)
+        # Stage name -> cumulative count, seconds and errors
+        self.stage_totals = {}
+        # Agent -> cumulative prompt and output tokens
+        self.token_totals = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attrs) -> _Span:
+        return _Span(self, name, attrs)
+
+    def record(self, name: str, seconds: float, **attrs):
+        """Records a span measured elsewhere (e.g. from ADK event timestamps)."""
+        entry = {"name": name, "seconds": seconds, **attrs}
+        with self._lock:
+            self.spans.append(entry)
+            totals = self.stage_totals.setdefault(name, {"count": 0, "total_seconds": 0.0, "errors": 0})
+            totals["count"] += 1
+            totals["total_seconds"] += seconds
+            totals["errors"] += "error" in attrs
+            if "agent" in attrs and ("prompt_tokens" in attrs or "output_tokens" in attrs):
+                tokens = self.token_totals.setdefault(attrs["agent"], {"prompt_tokens": 0, "output_tokens": 0})
+                tokens["prompt_tokens"] += attrs.get("prompt_tokens", 0)
+                tokens["output_tokens"] += attrs.get("output_tokens", 0)
+
+    def run_started(self, when: float = None):
+        """Marks the start of a run, for processes serving many (see daemon.py)."""
+        self.last_run_at = when or time.time()
+
+    def aggregate(self) -> dict:
+        """
+        Returns per-span-name statistics: count, errors, total, p50 and max
+        seconds, and token sums where the spans carry token counts.
+        """
+        with self._lock:
+            spans = list(self.spans)
+        groups = {}
+        for entry in spans:
+            groups.setdefault(entry["name"], []).append(entry)
+
+        stats = {}
+        for name, entries in groups.items():
+            durations = [e["seconds"] for e in entries]
+            stats[name] = {
+                "count": len(entries),
+                "errors": sum(1 for e in entries if "error" in e),
+                "total_seconds": sum(durations),
+                "p50_seconds": statistics.median(durations),
+                "max_seconds": max(durations),
+                "prompt_tokens": sum(e.get("prompt_tokens", 0) for e in entries),
+                "output_tokens": sum(e.get("output_tokens", 0) for e in entries),
+            }
+        return stats
+
+    def tokens_by_agent(self) -> dict:
+        """Returns agent -> {'prompt_tokens', 'output_tokens'} over every span naming an agent."""
+        with self._lock:
+            spans = list(self.spans)
+        totals = {}
+        for entry in spans:
+            if "agent" in entry and ("prompt_tokens" in entry or "output_tokens" in entry):
+                agent = totals.setdefault(entry["agent"], {"prompt_tokens": 0, "output_tokens": 0})
+                agent["prompt_tokens"] += entry.get("prompt_tokens", 0)
+                agent["output_tokens"] += entry.get("output_tokens", 0)
+        return totals
+
+    def report(self) -> dict:
+        """Returns the JSON-serializable run report."""
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "started_at": self.started_at,
+            "duration_seconds": time.time() - self.started_at,
+            "stages": self.aggregate(),
+            "tokens": self.tokens_by_agent(),
+            "spans": spans,
+        }
+
+    def summary(self) -> str:
+        """Returns a human-readable table of the stages, slowest first."""
+        stats = self.aggregate()
+        lines = [f"{'stage':<28} {'count':>5} {'total s':>8} {'p50 ms':>8} {'max ms':>8} {'tokens in/out':>15}"]
+        for name, s in sorted(stats.items(), key=lambda item: item[1]["total_seconds"], reverse=True):
+            tokens = f"{s['prompt_tokens']}/{s['output_tokens']}" if s["prompt_tokens"] or s["output_tokens"] else ""
+            errors = f"  ({s['errors']} errors)" if s["errors"] else ""
+            lines.append(
+                f"{name:<28} {s['count']:>5} {s['total_seconds']:>8.2f} {s['p50_seconds'] * 1000:>8.0f} "
+                f"{s['max_seconds'] * 1000:>8.0f} {tokens:>15}{errors}"
+            )
+        return "\n".join(lines)
+
+    def write_report(self, path: str):
+        """Writes the JSON run report."""
+        _write_atomic(path, json.dumps(self.report(), indent=2, default=str))
+
+    def write_prometheus(self, path: str):
+        """Writes the stage statistics in the Prometheus textfile-collector format."""
+        _write_atomic(path, self.prometheus_text())
+
+    def prometheus_text(self) -> str:
+        """Returns the cumulative stage statistics in the Prometheus text exposition format."""
+        p = PROMETHEUS_PREFIX
+        with self._lock:
+            stats = {name: dict(totals) for name, totals in self.stage_totals.items()}
+            token_totals = {agent: dict(tokens) for agent, tokens in self.token_totals.items()}
+        lines = [
+            f"# HELP {p}_stage_seconds Time spent per pipeline stage.",
+            f"# TYPE {p}_stage_seconds summary",
+        ]
+        for name, s in sorted(stats.items()):
+            lines.append(f'{p}_stage_seconds_sum{{stage="{name}"}} {s["total_seconds"]:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+        lines += [f"# HELP {p}_stage_errors Failed spans per stage.", f"# TYPE {p}_stage_errors counter"]
+        for name, s in sorted(stats.items()):
+            lines.append(f'{p}_stage_errors{{stage="{name}"}} {s["errors"]}')
+        lines += [f"# HELP {p}_llm_tokens Model tokens per agent.", f"# TYPE {p}_llm_tokens counter"]
+        for agent, tokens in sorted(token_totals.items()):
+            lines.append(f'{p}_llm_tokens{{agent="{agent}",kind="prompt"}} {tokens["prompt_tokens"]}')
+            lines.append(f'{p}_llm_tokens{{agent="{agent}",kind="output"}} {tokens["output_tokens"]}')
+        lines += [
+            f"# HELP {p}_last_run_timestamp_seconds Start time of the last run.",
+            f"# TYPE {p}_last_run_timestamp_seconds gauge",
+            f"{p}_last_run_timestamp_seconds {self.last_run_at:.0f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path: str, text: str):
+    """Writes through a temporary file, so readers never see a partial file."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+_recorder = None
+_configured = False
+_recorder_lock = threading.Lock()
+
+def get_recorder():
+    """
+    Returns the process-wide recorder, or None if metrics are disabled
+    (METRICS_DISABLED=1).
+    """
+    global _recorder, _configured
+    if not _configured:
+        with _recorder_lock:
+            if not _configured:
+                if os.getenv("METRICS_DISABLED", "").lower() not in ("1", "true", "yes"):
+                    _recorder = MetricsRecorder()
+                _configured = True
+    return _recorder
+
+def span(name: str, **attrs):
+    """
+    Returns a context manager timing a block as span `name`:
+
+        with metrics.span("readwise.list", location="new") as s:
+            ...
+            s.set(results=len(results))
+    """
+    recorder = _recorder if _configured else get_recorder()
+    if recorder is None:
+        return _NULL_SPAN
+    return recorder.span(name, **attrs)
+
+def record(name: str, seconds: float, **attrs):
+    """Records a span measured elsewhere; a no-op when metrics are disabled."""
+    recorder = _recorder if _configured else get_recorder()
+    if recorder is not None:
+        recorder.record(name, seconds, **attrs)
+
+def run_started(when: float = None):
+    """Marks the start of a run; a no-op when metrics are disabled."""
+    recorder = _recorder if _configured else get_recorder()
+    if recorder is not None:
+        recorder.run_started(when)
+
+
+# Start times of the tool calls in flight, keyed by function call ID
+_tool_starts = {}
+
+def before_tool_timer(tool, args, tool_context):
+    """Before-tool callback: notes when the tool call started."""
+    if (_recorder if _configured else get_recorder()) is not None:
+        _tool_starts[tool_context.function_call_id] = time.perf_counter()
+    return None
+
+def after_tool_timer(tool, args, tool_context, tool_response):
+    """After-tool callback: records the tool call as a `tool.<name>` span."""
+    start = _tool_starts.pop(tool_context.function_call_id, None)
+    if start is not None:
+        record(f"tool.{tool.name}", time.perf_counter() - start, agent=tool_context.agent_name)
+    return None
+
+
+def export_run(recorder=None):
+    """
+    Writes the run report to METRICS_REPORT_PATH and the Prometheus textfile
+    to METRICS_PROMETHEUS_PATH, when set.
+    """
+    recorder = recorder or get_recorder()
+    if recorder is None:
+        return
+    for env, writer in (("METRICS_REPORT_PATH", recorder.write_report),
+                        ("METRICS_PROMETHEUS_PATH", recorder.write_prometheus)):
+        path = os.getenv(env)
+        if path:
+            try:
+                writer(path)
+                logger.info(f"Metrics written to {path}")
+            except OSError as e:
+                logger.warning(f"Could not write metrics to {path}: {e}")
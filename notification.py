@@ -1,66 +1,291 @@
 import smtplib
 import os
+import json
+import time
+import uuid
 import logging
+import threading
 from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
 from email.header import Header
 from email.utils import formataddr
 from dotenv import load_dotenv
+import metrics
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def send_digest_email(subject: str, html_content: str) -> bool:
+DEFAULT_OUTBOX_DIR = os.path.join(os.path.expanduser("~"), ".cache", "morning_digest", "outbox")
+
+# Deliveries tried this many times are moved to the outbox's dead-letter directory
+MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+
+# Load environment variables once, not on every send
+load_dotenv()
+
+
+class SMTPMailer:
+    """
+    Sends many messages over one authenticated SMTP connection.
+
+    The connection is opened on the first send and reused afterwards. If the
+    server dropped it (idle timeout, network blip) it is re-established and
+    the message retried once. Thread-safe.
+    """
+
+    def __init__(self, server: str, port: int, sender: str, password: str = None,
+                 use_tls: bool = True, timeout: float = 30):
+        self.server = server
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self._smtp = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        smtp.ehlo()
+        if self.use_tls:
+            smtp.starttls()
+            smtp.ehlo()
+        if self.password:
+            smtp.login(self.sender, self.password)
+        self._smtp = smtp
+        logger.info(f"SMTP connection to {self.server}:{self.port} established")
+
+    def send(self, recipients: list, message: str) -> float:
+        """
+        Sends a serialized message.
+
+        Returns:
+            float: The send latency in seconds.
+
+        Raises:
+            smtplib.SMTPException, OSError: If the message could not be sent.
+        """
+        with self._lock, metrics.span("smtp.send"):
+            start = time.perf_counter()
+            if self._smtp is None:
+                self._connect()
+            try:
+                self._smtp.sendmail(self.sender, recipients, message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                logger.warning(f"SMTP connection dropped ({e}). Reconnecting...")
+                self._reset()
+                self._connect()
+                self._smtp.sendmail(self.sender, recipients, message)
+            return time.perf_counter() - start
+
+    def _reset(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.close()
+            except Exception:
+                pass
+        self._smtp = None
+
+    def close(self):
+        """Quits the SMTP session, if any."""
+        with self._lock:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except smtplib.SMTPException:
+                    pass
+            self._reset()
+
+
+class Outbox:
+    """
+    Durable local queue of outgoing messages: one JSON file per message,
+    removed only once delivered. Failed deliveries stay queued and are
+    retried by the next `flush`, without re-running the pipeline, until
+    `max_attempts` is reached: they are then moved to the `dead`
+    subdirectory, as are messages the server refuses outright.
+    """
+
+    def __init__(self, directory: str = DEFAULT_OUTBOX_DIR, max_attempts: int = MAX_ATTEMPTS):
+        self.directory = directory
+        self.dead_letter_directory = os.path.join(directory, "dead")
+        self.max_attempts = max_attempts
+        os.makedirs(self.dead_letter_directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, message_id: str) -> str:
+        return os.path.join(self.directory, message_id + ".json")
+
+    def _read(self, message_id: str):
+        try:
+            with open(self._path(message_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Unreadable outbox entry {message_id}: {e}")
+            return None
+
+    def enqueue(self, sender: str, recipients: list, message: str, day: str = None) -> str:
+        """
+        Queues a message and returns its ID.
+
+        With `day` (the digest's date, "YYYY-MM-DD"), queued messages to the
+        same recipients for that day or an earlier one are superseded: they
+        are dropped, so a recipient never gets a stale digest after a retry.
+        """
+        message_id = f"{time.time():.6f}-{uuid.uuid4().hex[:8]}"
+        entry = {"sender": sender, "recipients": recipients, "message": message, "attempts": 0, "day": day}
+        path = self._path(message_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        with self._lock:
+            if day is not None:
+                for other_id in self.pending():
+                    other = self._read(other_id)
+                    if other and other.get("day") and other["day"] <= day and other["recipients"] == recipients:
+                        os.remove(self._path(other_id))
+                        logger.info(f"Dropped outbox entry {other_id}: superseded by the {day} digest")
+            os.replace(tmp_path, path)
+        return message_id
+
+    def pending(self) -> list:
+        """Returns the IDs of queued messages, oldest first."""
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".json"))
+
+    def is_pending(self, message_id: str) -> bool:
+        return os.path.exists(self._path(message_id))
+
+    def dead_letters(self) -> list:
+        """Returns the IDs of the messages given up on, oldest first."""
+        return sorted(name[:-5] for name in os.listdir(self.dead_letter_directory) if name.endswith(".json"))
+
+    def flush(self, mailer: SMTPMailer, message_ids: list = None) -> dict:
+        """
+        Tries to deliver the given queued messages (default: all of them).
+
+        Returns:
+            dict: message ID -> send latency in seconds, for delivered messages.
+        """
+        with self._lock:
+            return self._flush(mailer, message_ids)
+
+    def _flush(self, mailer: SMTPMailer, message_ids: list = None) -> dict:
+        delivered = {}
+        for message_id in self.pending() if message_ids is None else message_ids:
+            path = self._path(message_id)
+            if not os.path.exists(path):
+                continue
+            entry = self._read(message_id)
+            if entry is None:
+                continue
+            try:
+                latency = mailer.send(entry["recipients"], entry["message"])
+            except smtplib.SMTPAuthenticationError:
+                # Every message would fail the same way: stop and keep them queued
+                raise
+            except (smtplib.SMTPException, OSError) as e:
+                entry["attempts"] += 1
+                logger.error(f"Delivery of {message_id} failed (attempt {entry['attempts']}/{self.max_attempts}): {e}")
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+                # Refused recipients will not be accepted on a retry either
+                if entry["attempts"] >= self.max_attempts or isinstance(e, smtplib.SMTPRecipientsRefused):
+                    os.replace(path, os.path.join(self.dead_letter_directory, message_id + ".json"))
+                    logger.error(f"Gave up on {message_id}: moved to {self.dead_letter_directory}")
+                continue
+            os.remove(path)
+            delivered[message_id] = latency
+            logger.info(f"Email {message_id} sent to {', '.join(entry['recipients'])} in {latency * 1000:.0f} ms")
+        return delivered
+
+
+_mailer = None
+_outbox = None
+_mailer_lock = threading.Lock()
+
+def _get_mailer_and_outbox(sender_email, sender_password, smtp_server, smtp_port):
+    """Returns the process-wide mailer (one persistent connection) and outbox."""
+    global _mailer, _outbox
+    with _mailer_lock:
+        if _mailer is None or (_mailer.server, _mailer.port, _mailer.sender) != (smtp_server, smtp_port, sender_email):
+            if _mailer is not None:
+                _mailer.close()
+            _mailer = SMTPMailer(
+                smtp_server, smtp_port, sender_email, sender_password,
+                use_tls=os.getenv("SMTP_STARTTLS", "true").lower() not in ("0", "false", "no"),
+            )
+        if _outbox is None:
+            _outbox = Outbox(os.getenv("EMAIL_OUTBOX_DIR", DEFAULT_OUTBOX_DIR))
+        return _mailer, _outbox
+
+def build_message(html_content: str, text_content: str = None):
+    """
+    Builds the email body: HTML only, or multipart/alternative with a
+    plain-text part (listed first, so clients prefer the HTML one).
+    """
+    if text_content is None:
+        return MIMEText(html_content, 'html', 'utf-8')
+    msg = MIMEMultipart('alternative')
+    msg.attach(MIMEText(text_content, 'plain', 'utf-8'))
+    msg.attach(MIMEText(html_content, 'html', 'utf-8'))
+    return msg
+
+def send_digest_email(subject: str, html_content: str, recipient_email: str = None, text_content: str = None) -> bool:
     """
     Sends the Morning Digest email using SMTP with TLS.
-    
+
+    The message is written to the durable outbox first (replacing any
+    undelivered digest to the same recipient) and then delivered over a
+    persistent SMTP connection. Earlier failed deliveries are left to
+    `flush_outbox`.
+
     Args:
         subject (str): Email subject line
         html_content (str): HTML content of the email body
-    
+        recipient_email (str): Recipient address (default: EMAIL_RECIPIENT_ADDRESS)
+        text_content (str): Optional plain-text alternative of the body
+
     Returns:
         bool: True if email sent successfully, False otherwise
     """
-    load_dotenv()
-    
     # Load environment variables
     sender_email = os.getenv("EMAIL_SENDER_ADDRESS")
     sender_password = os.getenv("EMAIL_SENDER_APP_PASSWORD")
-    recipient_email = os.getenv("EMAIL_RECIPIENT_ADDRESS")
+    recipient_email = recipient_email or os.getenv("EMAIL_RECIPIENT_ADDRESS")
     smtp_server = os.getenv("SMTP_SERVER")
     smtp_port = os.getenv("SMTP_PORT")
-    
+
     # Validate configuration
     if not all([sender_email, sender_password, recipient_email, smtp_server, smtp_port]):
         logger.error("Missing required email configuration in environment variables")
         return False
-    
+
     # Validate SMTP port
     try:
         smtp_port = int(smtp_port)
     except ValueError:
         logger.error(f"Invalid SMTP_PORT value: {smtp_port}")
         return False
-    
+
     try:
         # Create email message
-        msg = MIMEText(html_content, 'html', 'utf-8')
+        msg = build_message(html_content, text_content)
         msg['Subject'] = Header(subject, 'utf-8')
         msg['From'] = formataddr((str(Header('Morning Digest AI', 'utf-8')), sender_email))
         msg['To'] = recipient_email
-        
+
         logger.info(f"Sending email to: {recipient_email} with subject: {subject}")
-        
-        # Send via SMTP with TLS
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.ehlo()
-            server.starttls()
-            server.ehlo()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, [recipient_email], msg.as_string())
+
+        mailer, outbox = _get_mailer_and_outbox(sender_email, sender_password, smtp_server, smtp_port)
+        message_id = outbox.enqueue(sender_email, [recipient_email], msg.as_string(), day=time.strftime("%Y-%m-%d"))
+        outbox.flush(mailer, [message_id])
+        # A concurrent flush may have delivered it: success means it left the queue
+        if not outbox.is_pending(message_id):
             logger.info("Email sent successfully!")
-        
-        return True
-        
+            return True
+        logger.error(f"Email queued in the outbox for retry: {message_id}")
+        return False
+
     except smtplib.SMTPAuthenticationError as e:
         logger.error(f"SMTP authentication failed: {e}")
         logger.error("Check EMAIL_SENDER_ADDRESS and EMAIL_SENDER_APP_PASSWORD")
@@ -68,3 +293,26 @@ def send_digest_email(subject: str, html_content: str) -> bool:
     except Exception as e:
         logger.error(f"Failed to send email: {e}", exc_info=True)
         return False
+
+def flush_outbox() -> int:
+    """
+    Retries every queued message with the configured SMTP settings.
+
+    Returns:
+        int: The number of messages still queued.
+    """
+    sender_email = os.getenv("EMAIL_SENDER_ADDRESS")
+    mailer, outbox = _get_mailer_and_outbox(
+        sender_email, os.getenv("EMAIL_SENDER_APP_PASSWORD"), os.getenv("SMTP_SERVER"), int(os.getenv("SMTP_PORT", "587"))
+    )
+    outbox.flush(mailer)
+    mailer.close()
+    return len(outbox.pending())
+
+
+if __name__ == "__main__":
+    # Retry failed deliveries without re-running the pipeline
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    remaining = flush_outbox()
+    print(f"{remaining} messages still queued.")
+    raise SystemExit(1 if remaining else 0)
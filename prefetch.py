@@ -0,0 +1,147 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from content import prepare_content
+from ranking import LONG_READ_WORDS
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of documents speculatively fetched per selector run
+DEFAULT_MAX_SPECULATIVE = 5
+
+# Shortlist categories whose articles the enricher expands
+TARGET_CATEGORIES = ("must_read", "long_read")
+
+# Most recent prefetched documents remembered for deduplication and hit counting
+DEFAULT_MAX_TRACKED = 4096
+
+
+def likely_targets(docs: list, limit: int = DEFAULT_MAX_SPECULATIVE) -> list:
+    """
+    Returns the IDs of the candidates the enricher will most likely need:
+    library items and long reads, best first by the must-read/long-read
+    scores `ranking.shortlist` attaches (unscored documents keep their order).
+    """
+    def target_score(doc):
+        scores = doc.get('scores') or {}
+        return max((scores.get(category, 0) for category in TARGET_CATEGORIES), default=0)
+
+    ids = []
+    for doc in sorted(docs, key=target_score, reverse=True):
+        if not doc.get('id'):
+            continue
+        if doc.get('source_location') == 'library' or (doc.get('word_count') or 0) > LONG_READ_WORDS:
+            ids.append(doc['id'])
+        if len(ids) >= limit:
+            break
+    return ids
+
+
+class SpeculativePrefetcher:
+    """
+    Downloads and pre-processes the full content of likely enrichment targets
+    in the background, while the selector's model call is in flight.
+
+    Keeps hit/miss counters: a hit is an enrichment of a document that was
+    speculatively prefetched, a miss one that was not, and a wasted fetch a
+    prefetched document that was never enriched. Only the last `max_tracked`
+    prefetched documents are remembered, so a long-running process does not
+    grow; the counters cover its whole life.
+    """
+
+    def __init__(self, max_speculative: int = DEFAULT_MAX_SPECULATIVE, workers: int = 2,
+                 max_tracked: int = DEFAULT_MAX_TRACKED):
+        self.max_speculative = max_speculative
+        self.max_tracked = max_tracked
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        # (account, doc_id) of the latest speculatively fetched documents -> enriched since
+        self._speculated = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.speculated = 0
+        self.used = 0
+
+    def schedule(self, readwise, docs: list):
+        """
+        Starts fetching the likely targets among `docs` with `readwise`.
+
+        Returns:
+            Future | None: The background job, or None if nothing was scheduled.
+        """
+        with self._lock:
+            ids = [doc_id for doc_id in likely_targets(docs, self.max_speculative)
+                   if (readwise.account, doc_id) not in self._speculated]
+            for doc_id in ids:
+                self._speculated[(readwise.account, doc_id)] = False
+            while len(self._speculated) > self.max_tracked:
+                self._speculated.popitem(last=False)
+            self.speculated += len(ids)
+        if not ids:
+            return None
+        logger.info(f"Speculatively prefetching {len(ids)} documents")
+        future = self._executor.submit(self._prefetch, readwise, ids)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future):
+        """Done-callback: reports a failed prefetch (the enricher then fetches on its own)."""
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"Speculative prefetch failed: {future.exception()!r}")
+
+    @staticmethod
+    def _prefetch(readwise, ids: list):
+        contents = readwise.fetch_documents_details(ids)
+        # Warms prepare_content's cache for the enricher's identical call
+        for content in contents.values():
+            prepare_content(content)
+
+    def record(self, readwise, doc_id: str) -> bool:
+        """Counts an enrichment of `doc_id`; returns True if it was prefetched."""
+        key = (readwise.account, doc_id)
+        with self._lock:
+            hit = key in self._speculated
+            if hit:
+                self.hits += 1
+                if not self._speculated[key]:
+                    self._speculated[key] = True
+                    self.used += 1
+            else:
+                self.misses += 1
+        return hit
+
+    def stats(self) -> dict:
+        """Returns the hit/miss counters, the wasted fetches and the hit rate."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "speculated": self.speculated,
+                "wasted": self.speculated - self.used,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+def get_prefetcher():
+    """
+    Returns the process-wide prefetcher, or None if speculative prefetching
+    is disabled (PREFETCH_DISABLED=1). PREFETCH_MAX_DOCS caps the documents
+    fetched speculatively per run.
+    """
+    global _prefetcher
+    if os.getenv("PREFETCH_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = SpeculativePrefetcher(
+                max_speculative=int(os.getenv("PREFETCH_MAX_DOCS", str(DEFAULT_MAX_SPECULATIVE)))
+            )
+        return _prefetcher
@@ -0,0 +1,105 @@
+import re
+import math
+import heapq
+from collections import Counter
+
+from documents import annotate
+
+# Keywords of the "Rilevanza CEO / Credem" category, with their Italian variants
+BUSINESS_KEYWORDS = (
+    "Modelli Fondazionali", "Foundation Models", "Banking as a Service", "BaaS",
+    "Fintech", "RegTech", "Algorithmic Risk", "Rischio Algoritmico",
+    "AI Ethics", "Etica dell'IA", "Tokenization", "Tokenizzazione",
+)
+
+# Word count above which a feed article also qualifies as a long read
+LONG_READ_WORDS = 2000
+
+# Weight of a keyword match in the title relative to one in the summary
+TITLE_WEIGHT = 2.0
+
+_TOKEN_RE = re.compile(r"\w{4,}", re.UNICODE)
+
+
+def _keyword_pattern(keywords):
+    alternatives = sorted((re.escape(k.lower()) for k in keywords), key=len, reverse=True)
+    return re.compile(r"\b(" + "|".join(alternatives) + r")\b")
+
+
+_DEFAULT_PATTERN = _keyword_pattern(BUSINESS_KEYWORDS)
+
+
+def _idf(df: int, n: int) -> float:
+    return math.log((1 + n) / (1 + df)) + 1
+
+
+def score_documents(docs: list, keywords=BUSINESS_KEYWORDS) -> list:
+    """
+    Scores every document for each digest category using TF-IDF statistics
+    computed over the candidate set itself.
+
+    Returns:
+        list: One dict per document mapping each category it is eligible for
+        ('must_read', 'business', 'long_read', 'other') to its score.
+    """
+    pattern = _DEFAULT_PATTERN if keywords is BUSINESS_KEYWORDS else _keyword_pattern(keywords)
+    n = len(docs)
+
+    # Single pass: keyword term frequencies and vocabulary per document
+    keyword_tf = []
+    vocabularies = []
+    keyword_df = Counter()
+    term_df = Counter()
+    for doc in docs:
+        title = (doc.get('title') or '').lower()
+        summary = (doc.get('summary') or '').lower()
+        tf = Counter()
+        for match in pattern.findall(title):
+            tf[match] += TITLE_WEIGHT
+        for match in pattern.findall(summary):
+            tf[match] += 1
+        keyword_tf.append(tf)
+        keyword_df.update(tf.keys())
+        vocabulary = set(_TOKEN_RE.findall(title + " " + summary))
+        vocabularies.append(vocabulary)
+        term_df.update(vocabulary)
+
+    scores = []
+    for doc, tf, vocabulary in zip(docs, keyword_tf, vocabularies):
+        keyword_score = sum(weight * _idf(keyword_df[k], n) for k, weight in tf.items())
+        # Novelty: how rare the document's terms are within today's candidates
+        novelty = sum(_idf(term_df[t], n) for t in vocabulary) / len(vocabulary) if vocabulary else 0.0
+        word_count = doc.get('word_count') or 0
+        location = doc.get('source_location')
+        # Novelty with respect to earlier digests (see history.py), when known
+        unseen = doc.get('novelty', 1.0)
+
+        doc_scores = {'other': keyword_score + novelty}
+        if location == 'feed':
+            doc_scores['must_read'] = (novelty + 0.5 * keyword_score) * unseen
+        if keyword_score > 0:
+            doc_scores['business'] = keyword_score
+        if location == 'library' or word_count > LONG_READ_WORDS:
+            doc_scores['long_read'] = math.log1p(word_count) + 0.5 * keyword_score
+        scores.append(doc_scores)
+    return scores
+
+
+def shortlist(docs: list, top_k: int = 10, keywords=BUSINESS_KEYWORDS) -> list:
+    """
+    Keeps only the top `top_k` documents of each category, in input order.
+
+    Returns:
+        list: The shortlisted documents, each with a 'scores' dict of its
+        rounded per-category scores attached (input documents are not modified).
+    """
+    scores = score_documents(docs, keywords)
+    keep = set()
+    for category in ('must_read', 'business', 'long_read', 'other'):
+        eligible = [i for i, s in enumerate(scores) if category in s]
+        keep.update(heapq.nlargest(top_k, eligible, key=lambda i: scores[i][category]))
+
+    return [
+        annotate(doc, scores={c: round(s, 2) for c, s in scores[i].items()})
+        for i, doc in enumerate(docs) if i in keep
+    ]
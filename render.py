@@ -0,0 +1,140 @@
+"""
+Renders the digest email from the selected articles, in one pass, as HTML
+(with inline styles, so it survives email clients that drop <style>) and
+as a plain-text alternative.
+"""
+from datetime import datetime
+from html import escape
+from string import Template
+from typing import NamedTuple
+
+# Inline styles, resolved once instead of on every render
+_STYLES = {
+    "body": "font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; "
+            "max-width: 800px; margin: 0 auto; padding: 20px; background-color: #f9f9f9;",
+    "h1": "color: #2c3e50; border-bottom: 3px solid #3498db; padding-bottom: 10px;",
+    "h3": "color: #34495e; margin-top: 30px; border-left: 4px solid #3498db; padding-left: 10px;",
+    "strong": "color: #2c3e50;",
+    "a": "color: #3498db; text-decoration: none;",
+    "ul": "padding-left: 25px;",
+    "li": "margin-bottom: 8px;",
+    "hr": "border: none; border-top: 1px solid #ddd; margin: 30px 0;",
+    "footer": "color: #7f8c8d; font-size: 0.9em; text-align: center;",
+}
+
+
+def _inline(template: str) -> Template:
+    """Pre-inlines the styles into an HTML template (`{h1}` -> the h1 style)."""
+    return Template(template.format(**{name: escape(style) for name, style in _STYLES.items()}))
+
+
+_PAGE_HTML = _inline("""<!DOCTYPE html>
+<html lang="it">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+</head>
+<body style="{body}">
+<h1 style="{h1}">$title</h1>
+<p>$intro</p>
+$articles
+<p style="{footer}">Questo digest è stato generato automaticamente da <strong style="{strong}">Morning Digest AI</strong> 🤖</p>
+</body>
+</html>
+""")
+
+_ARTICLE_HTML = _inline("""<h3 style="{h3}">$index. $title</h3>
+<p><strong style="{strong}">Categoria:</strong> $category</p>
+$reasoning$takeaways<p>$summary</p>
+<p><a style="{a}" href="$url">Leggi l'articolo</a></p>
+<hr style="{hr}">
+""")
+
+_REASONING_HTML = _inline("""<p><strong style="{strong}">Perché te lo propongo:</strong> <em>$reasoning</em></p>
+""")
+
+_TAKEAWAYS_HTML = _inline("""<p><strong style="{strong}">Key Takeaways:</strong></p>
+<ul style="{ul}">
+$items</ul>
+""")
+
+_TAKEAWAY_HTML = _inline("""<li style="{li}">$point</li>
+""")
+
+_ARTICLE_TEXT = Template("""$index. $title
+Categoria: $category
+$reasoning$takeaways
+$summary
+
+Leggi l'articolo: $url
+
+---
+
+""")
+
+TITLE = "🌅 Morning Digest (AI Powered) - {date}"
+SUBJECT = "🌅 Morning Digest AI - {date}"
+INTRO = "Buongiorno! Ecco la tua selezione di letture per oggi, curata dall'IA per massimizzare il tuo impatto."
+NO_ARTICLES = "Nessun articolo trovato o errore durante l'esecuzione."
+NO_SUMMARY = "Nessun riassunto disponibile."
+
+
+class RenderedDigest(NamedTuple):
+    subject: str
+    html: str
+    text: str
+
+
+def _html_text(value) -> str:
+    """Escapes a value for HTML, keeping its line breaks."""
+    return escape(str(value)).replace("\n", "<br>\n")
+
+
+def render_digest(articles: list, date: datetime = None) -> RenderedDigest:
+    """
+    Renders the digest email for the selected articles.
+
+    Args:
+        articles (list): The 'selection' of the final digest.
+        date (datetime): Digest date (default: now).
+
+    Returns:
+        RenderedDigest: The subject, the HTML body and the plain-text body.
+    """
+    today = (date or datetime.now()).strftime("%d/%m/%Y")
+    title = TITLE.format(date=today)
+
+    html_parts, text_parts = [], [f"{title}\n\n{INTRO}\n\n"]
+    for i, doc in enumerate(articles, 1):
+        summary = doc.get('summary') or NO_SUMMARY
+        url = doc.get('source_url') or ''
+        reasoning = doc.get('reasoning')
+        takeaways = doc.get('key_takeaways') or []
+
+        html_parts.append(_ARTICLE_HTML.substitute(
+            index=i,
+            title=_html_text(doc.get('title', '')),
+            category=_html_text(doc.get('category_label', '')),
+            reasoning=_REASONING_HTML.substitute(reasoning=_html_text(reasoning)) if reasoning else "",
+            takeaways=_TAKEAWAYS_HTML.substitute(
+                items="".join(_TAKEAWAY_HTML.substitute(point=_html_text(point)) for point in takeaways)
+            ) if takeaways else "",
+            summary=_html_text(summary),
+            url=escape(url, quote=True),
+        ))
+        text_parts.append(_ARTICLE_TEXT.substitute(
+            index=i,
+            title=doc.get('title', ''),
+            category=doc.get('category_label', ''),
+            reasoning=f"Perché te lo propongo: {reasoning}\n" if reasoning else "",
+            takeaways="Key Takeaways:\n" + "".join(f"  * {point}\n" for point in takeaways) if takeaways else "",
+            summary=summary,
+            url=url,
+        ))
+
+    if not articles:
+        html_parts.append(f"<p>{NO_ARTICLES}</p>\n")
+        text_parts.append(NO_ARTICLES + "\n")
+
+    html = _PAGE_HTML.substitute(title=_html_text(title), intro=_html_text(INTRO), articles="".join(html_parts))
+    return RenderedDigest(SUBJECT.format(date=today), html, "".join(text_parts))
@@ -0,0 +1,272 @@
+"""
+Durable ADK sessions: the pipeline's session state and events are kept in
+SQLite, so a run that fails after the SelectorAgent can be retried without
+fetching and selecting again.
+
+Writes are incremental: every event is appended as one compressed row and
+its state delta is upserted key by key, so the stored state is never
+rewritten as a whole.
+"""
+import os
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from datetime import date
+from typing import Any, Optional
+
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events import Event, EventActions
+from google.adk.sessions import BaseSessionService, InMemorySessionService, Session, State
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_PATH = os.path.join(os.path.expanduser("~"), ".cache", "morning_digest", "sessions.sqlite3")
+
+# Bumped whenever the tables change; older session files are rebuilt from scratch
+SCHEMA_VERSION = 1
+
+# App- and user-scoped state rows use an empty session (and user) ID
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    create_time REAL NOT NULL,
+    update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+);
+CREATE TABLE IF NOT EXISTS state (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, key)
+);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_session ON events (app_name, user_id, session_id, seq);
+"""
+
+# Session state key set (to the send time) once the session's digest was delivered
+DELIVERED_KEY = "delivered_at"
+
+# Session state key written by each pipeline stage once it has completed
+STAGE_OUTPUTS = {
+    "SelectorAgent": "selection_result",
+    "EnricherAgent": "final_digest",
+}
+
+
+def _scope(app_name: str, user_id: str, session_id: str, key: str):
+    """Returns the (user_id, session_id) row owning a state key."""
+    if key.startswith(State.APP_PREFIX):
+        return "", ""
+    if key.startswith(State.USER_PREFIX):
+        return user_id, ""
+    return user_id, session_id
+
+
+class SqliteSessionService(BaseSessionService):
+    """
+    ADK session service persisting sessions in a local SQLite file.
+
+    Sessions whose last update is older than `retention_days` are purged
+    when the service starts.
+    """
+
+    def __init__(self, path: str = DEFAULT_SESSION_PATH, retention_days: float = 7):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._conn.executescript("DROP TABLE IF EXISTS sessions; DROP TABLE IF EXISTS state; DROP TABLE IF EXISTS events;")
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.executescript(_SCHEMA)
+        self.purge(retention_days)
+
+    def _put_state(self, app_name: str, user_id: str, session_id: str, delta: dict):
+        rows = []
+        for key, value in delta.items():
+            if key.startswith(State.TEMP_PREFIX):
+                continue
+            owner, session = _scope(app_name, user_id, session_id, key)
+            rows.append((app_name, owner, session, key, json.dumps(value, default=str)))
+        self._conn.executemany(
+            "INSERT INTO state (app_name, user_id, session_id, key, value) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (app_name, user_id, session_id, key) DO UPDATE SET value = excluded.value",
+            rows,
+        )
+
+    def _get_state(self, app_name: str, user_id: str, session_id: str) -> dict:
+        rows = self._conn.execute(
+            "SELECT key, value FROM state WHERE app_name = ? AND "
+            "((user_id = '' AND session_id = '') OR (user_id = ? AND session_id IN ('', ?)))",
+            (app_name, user_id, session_id),
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    async def create_session(self, *, app_name: str, user_id: str, state: Optional[dict[str, Any]] = None,
+                             session_id: Optional[str] = None) -> Session:
+        session_id = session_id or os.urandom(16).hex()
+        now = time.time()
+        with self._lock, self._conn:
+            try:
+                self._conn.execute(
+                    "INSERT INTO sessions (app_name, user_id, id, create_time, update_time) VALUES (?, ?, ?, ?, ?)",
+                    (app_name, user_id, session_id, now, now),
+                )
+            except sqlite3.IntegrityError:
+                raise AlreadyExistsError(f"Session with id {session_id} already exists.")
+            self._put_state(app_name, user_id, session_id, state or {})
+            full_state = self._get_state(app_name, user_id, session_id)
+        return Session(id=session_id, app_name=app_name, user_id=user_id, state=full_state, last_update_time=now)
+
+    async def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                          config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?",
+                (app_name, user_id, session_id),
+            ).fetchone()
+            if row is None:
+                return None
+            query = "SELECT data FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?"
+            params = [app_name, user_id, session_id]
+            if config and config.after_timestamp is not None:
+                query += " AND timestamp >= ?"
+                params.append(config.after_timestamp)
+            query += " ORDER BY seq DESC"
+            if config and config.num_recent_events is not None:
+                query += " LIMIT ?"
+                params.append(config.num_recent_events)
+            blobs = [data for (data,) in self._conn.execute(query, params)]
+            state = self._get_state(app_name, user_id, session_id)
+        events = [Event.model_validate_json(zlib.decompress(data)) for data in reversed(blobs)]
+        return Session(id=session_id, app_name=app_name, user_id=user_id, state=state,
+                       events=events, last_update_time=row[0])
+
+    async def list_sessions(self, *, app_name: str, user_id: Optional[str] = None) -> ListSessionsResponse:
+        query = "SELECT user_id, id, update_time FROM sessions WHERE app_name = ?"
+        params = [app_name]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY update_time", params).fetchall()
+        return ListSessionsResponse(sessions=[
+            Session(id=sid, app_name=app_name, user_id=uid, last_update_time=updated) for uid, sid, updated in rows
+        ])
+
+    def _delete_rows(self, app_name: str, user_id: str, session_id: str):
+        for table, column in (("sessions", "id"), ("state", "session_id"), ("events", "session_id")):
+            self._conn.execute(f"DELETE FROM {table} WHERE app_name = ? AND user_id = ? AND {column} = ?",
+                               (app_name, user_id, session_id))
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        with self._lock, self._conn:
+            self._delete_rows(app_name, user_id, session_id)
+
+    async def get_user_state(self, *, app_name: str, user_id: str) -> dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM state WHERE app_name = ? AND user_id = ? AND session_id = ''",
+                (app_name, user_id),
+            ).fetchall()
+        return {key[len(State.USER_PREFIX):]: json.loads(value) for key, value in rows}
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        """Appends the event and upserts the keys of its state delta, in one transaction."""
+        if event.partial:
+            return event
+        self._apply_temp_state(session, event)
+        event = self._trim_temp_delta_state(event)
+        data = zlib.compress(event.model_dump_json(exclude_none=True).encode("utf-8"))
+        with self._lock, self._conn:
+            if event.actions and event.actions.state_delta:
+                self._put_state(session.app_name, session.user_id, session.id, event.actions.state_delta)
+            self._conn.execute(
+                "INSERT INTO events (app_name, user_id, session_id, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+                (session.app_name, session.user_id, session.id, event.timestamp, data),
+            )
+            self._conn.execute(
+                "UPDATE sessions SET update_time = ? WHERE app_name = ? AND user_id = ? AND id = ?",
+                (event.timestamp, session.app_name, session.user_id, session.id),
+            )
+        session.last_update_time = event.timestamp
+        return self._commit_event_to_session(session, event)
+
+    def purge(self, older_than_days: float):
+        """Deletes the sessions (with their state and events) not updated for `older_than_days` days."""
+        cutoff = time.time() - older_than_days * 86400
+        with self._lock, self._conn:
+            stale = self._conn.execute("SELECT app_name, user_id, id FROM sessions WHERE update_time < ?",
+                                       (cutoff,)).fetchall()
+            for app_name, user_id, session_id in stale:
+                self._delete_rows(app_name, user_id, session_id)
+        if stale:
+            logger.info(f"Purged {len(stale)} sessions older than {older_than_days} days")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def daily_session_id(day: date = None) -> str:
+    """ID of the pipeline session of a given day (today by default): retries of a day resume it."""
+    return f"digest-{(day or date.today()).isoformat()}"
+
+
+async def update_session_state(session_service, session: Session, delta: dict, author: str = "morning_digest"):
+    """
+    Writes `delta` into a session's state outside of an agent run. It is
+    appended as an event, so every session service persists it.
+    """
+    await session_service.append_event(session, Event(author=author, actions=EventActions(state_delta=delta)))
+
+
+def skip_completed_stage(callback_context):
+    """
+    Before-agent callback: skips a pipeline stage whose output is already in
+    the session state, i.e. a stage completed by an earlier attempt of the
+    same (resumed) session.
+    """
+    output_key = STAGE_OUTPUTS.get(callback_context.agent_name)
+    output = callback_context.state.get(output_key) if output_key else None
+    if not output:
+        return None
+    print(f">> RESUME: {callback_context.agent_name} already completed, skipping.")
+    return types.Content(role="model", parts=[types.Part.from_text(text=str(output))])
+
+
+def get_session_service():
+    """
+    Returns the session service configured from the environment: SQLite at
+    SESSION_DB_PATH, or in memory (no resume) with SESSION_STORE=memory or
+    when the file cannot be opened.
+    """
+    if os.getenv("SESSION_STORE", "sqlite").lower() == "memory":
+        return InMemorySessionService()
+    try:
+        return SqliteSessionService(
+            path=os.getenv("SESSION_DB_PATH", DEFAULT_SESSION_PATH),
+            retention_days=float(os.getenv("SESSION_RETENTION_DAYS", "7")),
+        )
+    except (sqlite3.Error, OSError, ValueError) as e:
+        logger.warning(f"Session store unavailable: {e}. Sessions will not survive a restart.")
+        return InMemorySessionService()
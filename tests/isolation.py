@@ -0,0 +1,59 @@
+"""
+Keeps the tests away from ~/.cache/morning_digest: importing this module
+points every on-disk store (document and model caches, sent history,
+sessions, outbox, prompt copies) at a temporary directory.
+
+Import it before the application modules, some of which open their stores
+at import time (e.g. the agents' shared Readwise client).
+"""
+import os
+import atexit
+import shutil
+import tempfile
+from unittest.mock import patch
+
+STATE_DIR = tempfile.mkdtemp(prefix="morning_digest-tests-")
+atexit.register(shutil.rmtree, STATE_DIR, ignore_errors=True)
+
+# Environment variable of each store -> its file or directory name
+STORE_PATHS = {
+    "READWISE_CACHE_PATH": "readwise.sqlite3",
+    "LLM_CACHE_PATH": "llm.sqlite3",
+    "HISTORY_PATH": "sent_history.bin",
+    "SESSION_DB_PATH": "sessions.sqlite3",
+    "EMAIL_OUTBOX_DIR": "outbox",
+    "PROMPT_CACHE_DIR": "prompts",
+}
+
+os.environ.update({env: os.path.join(STATE_DIR, name) for env, name in STORE_PATHS.items()})
+
+
+def isolate_state(test):
+    """
+    Gives a test its own empty stores, and restores afterwards the
+    process-wide state it may change: the store singletons, the shared
+    clients, their content LRU and the users registered with `register_user_token`.
+    Call it from `setUp`.
+    """
+    import cache
+    import client
+    import history
+    import llm_cache
+    import notification
+    import utils
+
+    directory = tempfile.mkdtemp(dir=STATE_DIR)
+    patches = [
+        patch.dict(os.environ, {env: os.path.join(directory, name) for env, name in STORE_PATHS.items()}),
+        patch.object(cache, "_default_cache", None),
+        patch.object(llm_cache, "_default_cache", None),
+        patch.object(history, "_history", None),
+        patch.object(notification, "_outbox", None),
+        patch.object(utils.prompts, "cache_dir", os.path.join(directory, "prompts")),
+        patch.dict(client._clients),
+        patch.object(client, "_shared_content", client._ContentLRU(client.SHARED_CONTENT_MAX_ENTRIES)),
+        patch.dict(client._user_tokens),
+    ]
+    for p in patches:
+        p.start()
+        test.addCleanup(p.stop)
@@ -1,12 +1,19 @@
 import unittest
 from unittest.mock import MagicMock, patch
 import json
+import asyncio
+from isolation import isolate_state
 from google.adk.agents import SequentialAgent
 from agents.selector import selector_agent
 from agents.enricher import enricher_agent
+from documents import DocumentRecord
+from candidates import decode_candidates
 
 class TestAdkPipeline(unittest.TestCase):
 
+    def setUp(self):
+        isolate_state(self)
+
     def test_pipeline_structure(self):
         """Verify the pipeline is constructed correctly with sub-agents."""
         pipeline = SequentialAgent(
@@ -22,20 +29,21 @@ class TestAdkPipeline(unittest.TestCase):
     def test_selector_tool_call(self, mock_client):
         """Verify SelectorAgent uses the fetch tool."""
         # Mock client response
-        mock_client.fetch_last_24h.return_value = [
-            {'id': '1', 'title': 'Test Doc', 'summary': 'Summary', 'source_location': 'feed'}
-        ]
+        mock_client.iter_last_24h.return_value = iter([
+            DocumentRecord(id='1', title='Test Doc', summary='Summary', source_location='feed')
+        ])
         
         # We can't easily run the full LlmAgent without a real model or complex mocking of the Runner.
         # But we can verify the tool function wrapper in selector.py
         from agents.selector import fetch_readwise_data
         
-        result_json = fetch_readwise_data()
-        result = json.loads(result_json)
+        table = fetch_readwise_data()
+        result = decode_candidates(table)
         
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0]['id'], '1')
-        mock_client.fetch_last_24h.assert_called_once()
+        self.assertEqual(result[0]['title'], 'Test Doc')
+        mock_client.iter_last_24h.assert_called_once()
 
     @patch('agents.enricher.client')
     def test_enricher_tool_call(self, mock_client):
@@ -44,9 +52,26 @@ class TestAdkPipeline(unittest.TestCase):
         
         from agents.enricher import fetch_full_content
         
-        content = fetch_full_content("123")
+        content = asyncio.run(fetch_full_content("123"))
         self.assertEqual(content, "Full content")
         mock_client.fetch_document_details.assert_called_with("123")
 
+    @patch('agents.enricher.client')
+    def test_enricher_prefetches_targets(self, mock_client):
+        """Verify the enricher bulk-fetches content for target articles only."""
+        from agents.enricher import prefetch_target_content
+
+        selection = {"selection": [
+            {"id": "1", "category_label": "🤯 Non puoi ignorarlo"},
+            {"id": "2", "category_label": "📌 Rilevanza CEO / Credem"},
+            {"id": "3", "category_label": "🧘 Lettura Lunga / Sviluppo Personale"},
+        ]}
+        callback_context = MagicMock()
+        callback_context.state = {"selection_result": "```json\n" + json.dumps(selection) + "\n```"}
+
+        self.assertIsNone(asyncio.run(prefetch_target_content(callback_context)))
+        mock_client.fetch_documents_details.assert_called_once_with(["1", "3"])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,57 +1,84 @@
-import unittest
-from unittest.mock import MagicMock, patch
+import os
 import json
-from agent import MorningDigestAgent
-
-class TestAgent(unittest.TestCase):
-    @patch('agent.genai')
-    def test_run_success(self, mock_genai):
-        # Mock the model and chat
-        mock_model = MagicMock()
-        mock_chat = MagicMock()
-        mock_model.start_chat.return_value = mock_chat
-        
-        # Mock the response from send_message
-        mock_response = MagicMock()
-        mock_json = {
-            "selection": [
-                {"id": "1", "title": "T1", "category_label": "Cat1", "reasoning": "Reason 1", "source_url": "u1", "summary": "s1"},
-                {"id": "2", "title": "T2", "category_label": "Cat2", "reasoning": "Reason 2", "source_url": "u2", "summary": "s2"},
-                {"id": "3", "title": "T3", "category_label": "Cat3", "reasoning": "Reason 3", "source_url": "u3", "summary": "s3"},
-                {"id": "4", "title": "T4", "category_label": "Cat4", "reasoning": "Reason 4", "source_url": "u4", "summary": "s4"},
-                {"id": "5", "title": "T5", "category_label": "Cat5", "reasoning": "Reason 5", "source_url": "u5", "summary": "s5"}
-            ]
+import asyncio
+import unittest
+from unittest.mock import patch
+from isolation import isolate_state
+from benchmarks.standins import FAKE_MODEL, FakeDigestModel, ReaderStandIn, make_corpus
+from client import register_user_token
+from google.adk.agents import SequentialAgent
+from agents.selector import selector_agent, DEFAULT_SELECTOR_PROMPT
+from agents.enricher import enricher_agent, DEFAULT_ENRICHER_PROMPT
+from google.adk.runners import InMemoryRunner
+import main
+
+
+class TestPipelineOffline(unittest.TestCase):
+
+    def setUp(self):
+        isolate_state(self)
+
+    def _run_offline(self):
+        """Runs the real pipeline against the Reader stand-in and the fake model."""
+        env = {
+            "READWISE_CACHE_DISABLED": "1",
+            "LLM_CACHE_DISABLED": "1",
+            "PREFETCH_DISABLED": "1",
+            "HISTORY_DISABLED": "1",
         }
-        mock_response.text = json.dumps(mock_json)
-        mock_chat.send_message.return_value = mock_response
-        
-        # Setup agent
-        agent = MorningDigestAgent()
-        agent.model = mock_model
-        
-        # Run
-        selection = agent.run()
-        
-        # Verify
+        # Copies of the real agents on the fake model, in a pipeline of their own
+        pipeline = SequentialAgent(name="OfflinePipeline", sub_agents=[
+            agent.model_copy(update={"model": FAKE_MODEL, "parent_agent": None})
+            for agent in (selector_agent, enricher_agent)
+        ])
+        with ReaderStandIn() as reader, patch.dict(os.environ, env):
+            reader.add_corpus("offline-token", make_corpus(250))
+            os.environ["READWISE_BASE_URL"] = reader.base_url
+            register_user_token("offline-user", "offline-token")
+
+            runner = InMemoryRunner(agent=pipeline, app_name=main.APP_NAME)
+            state = {"prompt_override_selector": DEFAULT_SELECTOR_PROMPT,
+                     "prompt_override_enricher": DEFAULT_ENRICHER_PROMPT}
+            result = asyncio.run(main.run_pipeline(runner, "offline-user", None, state=state))
+        return result, reader
+
+    def test_pipeline_end_to_end(self):
+        """Run the real pipeline against the Reader stand-in and the fake model."""
+        result, reader = self._run_offline()
+
+        selection = json.loads(result)["selection"]
         self.assertEqual(len(selection), 5)
-        self.assertEqual(selection[0]['id'], "1")
-        # Verify start_chat was called with auto function calling
-        mock_model.start_chat.assert_called_with(enable_automatic_function_calling=True)
-        # Verify send_message was called
-        mock_chat.send_message.assert_called()
-
-    def test_fetch_readwise_tool(self):
-        # Test the tool wrapper
-        with patch('agent.ReadwiseClient') as MockClient:
-            mock_client_instance = MockClient.return_value
-            mock_client_instance.fetch_last_24h.return_value = [{"id": "1", "title": "Test"}]
-            
-            agent = MorningDigestAgent()
-            result_json = agent._fetch_readwise()
-            
-            result = json.loads(result_json)
-            self.assertEqual(len(result), 1)
-            self.assertEqual(result[0]['title'], "Test")
+        # The model picked table rows: the Reader IDs and URLs were re-attached
+        self.assertTrue(all(a["id"].startswith("doc") and a["source_url"] for a in selection))
+        enriched = [a for a in selection if "key_takeaways" in a]
+        self.assertTrue(enriched)
+        self.assertTrue(all(len(a["key_takeaways"]) == 3 for a in enriched))
+        # Listing pages plus one bulk content request for the targets
+        self.assertTrue(any("ids" in params for params in reader.requests))
+
+    def test_enricher_sees_only_the_restored_selection(self):
+        """The selector's row-ID draft never reaches the enricher's model requests."""
+        requests = []
+        generate = FakeDigestModel.generate_content_async
+
+        def recording(model, llm_request, stream=False):
+            if "fetch_full_content" in llm_request.tools_dict:
+                requests.append(llm_request.model_copy(deep=True))
+            return generate(model, llm_request, stream)
+
+        with patch.object(FakeDigestModel, "generate_content_async", recording):
+            self._run_offline()
+
+        self.assertTrue(requests)
+        for llm_request in requests:
+            texts = [p.text for c in llm_request.contents for p in c.parts or () if p.text]
+            for text in texts:
+                if '"selection"' in text:
+                    ids = [a["id"] for a in json.loads(text[text.find("{"):text.rfind("}") + 1])["selection"]]
+                    self.assertTrue(all(i.startswith("doc") for i in ids), ids)
+            # The restored selection is handed over through the instruction
+            self.assertIn('"id": "doc', llm_request.config.system_instruction)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,67 @@
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+from isolation import isolate_state
+import batch
+from client import get_user_client
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        isolate_state(self)
+
+    def test_load_roster_resolves_token_env(self):
+        entries = [{"user_id": "alice", "readwise_token_env": "ALICE_TOKEN", "recipient": "a@example.com"}]
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(entries, f)
+        with patch.dict(os.environ, {"ALICE_TOKEN": "secret"}):
+            roster = batch.load_roster(f.name)
+        self.assertEqual(roster[0]["readwise_token"], "secret")
+        self.assertEqual(roster[0]["prompts"], {})
+
+        with open(f.name, "w") as out:
+            json.dump([{"user_id": "bob", "recipient": "b@example.com"}], out)
+        with self.assertRaises(ValueError):
+            batch.load_roster(f.name)
+
+    def test_run_batch_bounds_concurrency(self):
+        """Verify users run on one runner, with per-user state, at most N at a time."""
+        roster = [
+            {"user_id": f"user{i}", "readwise_token": f"token{i}", "recipient": f"u{i}@example.com",
+             "prompts": {"selector": "custom"} if i == 0 else {}}
+            for i in range(6)
+        ]
+        active = {"now": 0, "peak": 0}
+        states = {}
+
+        async def fake_pipeline(runner, user_id, session_id, state=None, run_config=None, resume=False):
+            states[user_id] = state
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.01)
+            active["now"] -= 1
+            return '{"selection": []}'
+
+        with patch('main.create_runner') as create_runner, \
+                patch('main.run_pipeline', side_effect=fake_pipeline), \
+                patch('main.deliver_digest', return_value=True) as deliver, \
+                patch('main.digest_delivered', AsyncMock(return_value=False)), \
+                patch('main.mark_delivered', AsyncMock()) as mark_delivered, \
+                patch('client.ReadwiseClient.sync'):
+            results = asyncio.run(batch.run_batch(roster, concurrency=2))
+
+        create_runner.assert_called_once()
+        self.assertEqual(active["peak"], 2)
+        self.assertTrue(all(results.values()))
+        self.assertEqual(states["user0"], {"prompt_override_selector": "custom"})
+        deliver.assert_any_call('{"selection": []}', "u3@example.com", False, "user3")
+        self.assertEqual(mark_delivered.await_count, 6)
+        self.assertEqual(get_user_client("user3").token, "token3")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from cache import DocumentCache
+
+
+class TestDocumentCache(unittest.TestCase):
+
+    def test_content_invalidated_by_newer_version(self):
+        """Verify cached content is dropped when a newer updated_at is listed."""
+        cache = DocumentCache(path=":memory:")
+        cache.put_documents([{"id": "1", "updated_at": "2025-01-01T00:00:00+00:00", "source_location": "feed"}])
+        cache.put_content("1", "<p>v1</p>")
+        self.assertEqual(cache.get_content("1"), "<p>v1</p>")
+
+        # Same version listed again: content is kept
+        cache.put_documents([{"id": "1", "updated_at": "2025-01-01T00:00:00+00:00", "source_location": "feed"}])
+        self.assertEqual(cache.get_content("1"), "<p>v1</p>")
+
+        cache.put_documents([{"id": "1", "updated_at": "2025-01-02T00:00:00+00:00", "source_location": "feed"}])
+        self.assertIsNone(cache.get_content("1"))
+
+    def test_get_documents_filters_location_and_window(self):
+        cache = DocumentCache(path=":memory:")
+        cache.put_documents([
+            {"id": "1", "updated_at": "2025-01-02T00:00:00+00:00", "location": "new"},
+            {"id": "2", "updated_at": "2024-12-30T00:00:00+00:00", "location": "new"},
+            {"id": "3", "updated_at": "2025-01-02T00:00:00+00:00", "location": "later"},
+            {"id": "4", "updated_at": "2025-01-02T00:00:00+00:00", "location": "new"},
+        ])
+        docs = cache.get_documents("new", "2025-01-01T00:00:00+00:00")
+        self.assertEqual(sorted(d["id"] for d in docs), ["1", "4"])
+        # Documents listed for another account are not visible
+        docs = cache.get_documents("new", "2025-01-01T00:00:00+00:00", account="other")
+        self.assertEqual(docs, [])
+
+        # Listed again elsewhere, a document moves; missing from a full listing, it goes
+        cache.put_documents([{"id": "4", "updated_at": "2025-01-03T00:00:00+00:00", "location": "archive"}])
+        self.assertEqual(cache.prune_documents("later", "2025-01-01T00:00:00+00:00", []), 1)
+        self.assertEqual([d["id"] for d in cache.get_documents("new", "2025-01-01T00:00:00+00:00")], ["1"])
+        self.assertEqual(cache.get_documents("later", "2025-01-01T00:00:00+00:00"), [])
+
+    def test_ttl_expiry(self):
+        cache = DocumentCache(path=":memory:", ttl=0)
+        cache.put_content("1", "content")
+        self.assertIsNone(cache.get_content("1"))
+
+    def test_lru_eviction(self):
+        """Verify the least recently used entries go first once over budget."""
+        cache = DocumentCache(path=":memory:", max_bytes=1000)
+        body = "".join(chr(0x4e00 + i) for i in range(300))  # barely compressible
+        cache.put_content("old", body)
+        cache.put_content("recent", body)
+        cache.get_content("recent")
+        cache.put_content("new", body)
+
+        self.assertIsNone(cache.get_content("old"))
+        self.assertEqual(cache.get_content("new"), body)
+
+    def test_size_is_only_summed_near_the_budget(self):
+        """Verify writes well under budget do not scan the table, and going over still evicts."""
+        cache = DocumentCache(path=":memory:", max_bytes=4000)
+        statements = []
+        cache._conn.set_trace_callback(statements.append)
+        body = "".join(chr(0x4e00 + i) for i in range(300))  # barely compressible
+        for i in range(20):
+            cache.put_documents([{"id": f"m{i}", "updated_at": "2025-01-01T00:00:00+00:00", "location": "new"}])
+        sums = sum("SUM(" in statement for statement in statements)
+        self.assertEqual(sums, 1)
+
+        for i in range(6):
+            cache.put_content(f"c{i}", body)
+        stored = cache._conn.execute("SELECT SUM(size + LENGTH(metadata)) FROM documents").fetchone()[0]
+        self.assertLessEqual(stored, 4000)
+        self.assertNotIn("m0", [d["id"] for d in cache.get_documents("new", "2024-12-31T00:00:00+00:00")])
+        self.assertEqual(cache.get_content("c5"), body)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import unittest
+from candidates import encode_candidates, decode_candidates, restore_selection, truncate_summary
+
+
+class TestCandidates(unittest.TestCase):
+
+    def setUp(self):
+        self.candidates = [
+            {"id": "01HXYZ", "title": "Fintech | weekly", "summary": "A summary.\nSecond line.",
+             "source_location": "feed", "word_count": 1500, "source_url": "https://example.com/a?utm=1",
+             "source_count": 2, "scores": {"must_read": 3.5, "other": 4.12}},
+            {"id": "01HABC", "title": "Deep dive", "summary": "word " * 200, "source_location": "library",
+             "word_count": 6000, "source_url": "https://example.com/b", "source_count": 1, "novelty": 0.5,
+             "scores": {"long_read": 8.7}},
+        ]
+
+    def test_table_has_a_header_and_short_row_ids(self):
+        """Verify one header row, row numbers as IDs, no URLs and no cell-breaking characters."""
+        table, rows = encode_candidates(self.candidates, summary_tokens=20)
+        lines = table.splitlines()
+
+        self.assertEqual(lines[0], "id|source_location|word_count|source_count|novelty|scores|title|summary")
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith("1|feed|1500|2||must_read=3.5 other=4.12|Fintech weekly|"))
+        self.assertNotIn("example.com", table)
+        self.assertNotIn("01HXYZ", table)
+        self.assertEqual(set(rows), {"1", "2"})
+
+        decoded = decode_candidates(table)
+        self.assertEqual(decoded[1]["scores"], {"long_read": 8.7})
+        self.assertEqual(decoded[1]["novelty"], "0.50")
+        self.assertLessEqual(len(decoded[1]["summary"]), 20 * 4)
+
+    def test_table_is_smaller_than_json(self):
+        table, _ = encode_candidates(self.candidates * 20)
+        self.assertLess(len(table), len(json.dumps(self.candidates * 20)) / 2)
+
+    def test_selection_is_restored(self):
+        """Verify the real IDs, URLs and full summaries are re-attached to the selected rows."""
+        _, rows = encode_candidates(self.candidates, summary_tokens=5)
+        selection = [{"id": "2", "category_label": "long_read", "reasoning": "r"},
+                     {"id": 1, "category_label": "other", "reasoning": "r"},
+                     {"id": "unknown", "category_label": "other"}]
+
+        restored = restore_selection(selection, rows)
+
+        self.assertEqual(restored[0]["id"], "01HABC")
+        self.assertEqual(restored[0]["summary"], self.candidates[1]["summary"])
+        self.assertEqual(restored[0]["category_label"], "long_read")
+        self.assertEqual(restored[1]["source_url"], "https://example.com/a?utm=1")
+        self.assertEqual(restored[2], selection[2])
+
+    def test_truncate_summary(self):
+        self.assertEqual(truncate_summary("short", 10), "short")
+        cut = truncate_summary("alpha beta gamma delta epsilon", 4)
+        self.assertEqual(cut, "alpha beta…")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+import json
+import time
+import unittest
+import threading
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+from cache import DocumentCache
+from client import ReadwiseClient, _ContentLRU
+
+
+def _response(payload):
+    response = MagicMock()
+    response.json.return_value = payload
+    body = json.dumps(payload).encode("utf-8")
+    # Streamed in small chunks, splitting values across chunk boundaries
+    response.iter_content.side_effect = lambda chunk_size: (body[i:i + 7] for i in range(0, len(body), 7))
+    return response
+
+
+class TestReadwiseClient(unittest.TestCase):
+
+    def test_fetch_last_24h_follows_cursor(self):
+        """Verify every cursor page of both locations is fetched and labelled."""
+        pages = {
+            ("new", None): {"results": [{"id": "1"}], "nextPageCursor": "c2"},
+            ("new", "c2"): {"results": [{"id": "2"}], "nextPageCursor": None},
+            ("later", None): {"results": [{"id": "3"}], "nextPageCursor": None},
+        }
+
+        client = ReadwiseClient(token="test")
+        client.transport = MagicMock()
+        client.transport.get.side_effect = lambda url, params, token, stream=False: _response(
+            pages[(params["location"], params.get("pageCursor"))]
+        )
+
+        docs = client.fetch_last_24h()
+
+        self.assertEqual(sorted(d.id for d in docs), ["1", "2", "3"])
+        labels = {d.id: d.source_location for d in docs}
+        self.assertEqual(labels, {"1": "feed", "2": "feed", "3": "library"})
+        self.assertEqual(client.transport.get.call_count, 3)
+
+    def test_page_buffer_is_bounded(self):
+        """Verify fetching stays at most a few pages ahead and stops when the caller does."""
+        fetched = []
+
+        def list_page(url, params, token, stream=False):
+            page = int(params.get("pageCursor") or 0)
+            fetched.append((params["location"], page))
+            return _response({"results": [{"id": f"{params['location']}{page}"}], "nextPageCursor": str(page + 1)})
+
+        client = ReadwiseClient(token="test")
+        client.transport = MagicMock()
+        client.transport.get.side_effect = list_page
+        with patch('client.MAX_BUFFERED_PAGES', 2):
+            docs = client.iter_last_24h()
+            next(docs)
+            time.sleep(0.2)
+            docs.close()
+
+        # The page read, the buffered ones, then per location one waiting for room and one prefetched
+        self.assertLessEqual(len(fetched), 2 + 2 * 2 + 1)
+
+    def test_fetch_documents_details_batches_ids(self):
+        """Verify many IDs are fetched in one request and then served from memory."""
+        client = ReadwiseClient(token="test")
+        client.transport = MagicMock()
+        client.transport.get.return_value = _response({"results": [
+            {"id": "1", "html_content": "<p>one</p>"},
+            {"id": "2", "summary": "two"},
+        ]})
+
+        contents = client.fetch_documents_details(["1", "2"])
+
+        self.assertEqual(contents, {"1": "<p>one</p>", "2": "two"})
+        params = client.transport.get.call_args.kwargs["params"]
+        self.assertEqual(params["ids"], "1,2")
+        self.assertEqual(params["withHtmlContent"], "true")
+
+        self.assertEqual(client.fetch_document_details("1"), "<p>one</p>")
+        client.transport.get.assert_called_once()
+
+    def test_concurrent_detail_fetches_are_deduplicated(self):
+        """Verify a fetch of documents already in flight waits instead of refetching."""
+        started, release = threading.Event(), threading.Event()
+
+        def slow_get(url, params, token):
+            started.set()
+            release.wait(5)
+            return _response({"results": [{"id": "1", "html_content": "<p>one</p>"}]})
+
+        client = ReadwiseClient(token="test")
+        client.transport = MagicMock()
+        client.transport.get.side_effect = slow_get
+
+        first = threading.Thread(target=client.fetch_documents_details, args=(["1"],))
+        first.start()
+        started.wait(5)
+        threading.Timer(0.05, release.set).start()
+
+        self.assertEqual(client.fetch_documents_details(["1"]), {"1": "<p>one</p>"})
+        first.join()
+        client.transport.get.assert_called_once()
+
+    def test_incremental_sync_downloads_only_delta(self):
+        """Verify a second run only asks for documents since the watermark, in one listing of all locations."""
+        now = datetime.now(timezone.utc).isoformat()
+        client = ReadwiseClient(token="test", cache=DocumentCache(path=":memory:"))
+        client.transport = MagicMock()
+        client.transport.get.side_effect = lambda url, params, token, stream=False: _response({"results": [
+            {"id": location + params["updatedAfter"], "location": location, "updated_at": now}
+            for location in ("new", "later")
+        ]})
+
+        first = client.fetch_last_24h()
+        second = client.fetch_last_24h()
+        calls = [c.kwargs["params"] for c in client.transport.get.call_args_list]
+
+        self.assertEqual(len(first), 2)
+        # The delta is merged into the cached window
+        self.assertEqual(len(second), 4)
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(any("location" in params for params in calls))
+        self.assertTrue(calls[1]["updatedAfter"] > calls[0]["updatedAfter"])
+
+    def test_moved_documents_leave_their_location(self):
+        """Verify documents moved or archived since the last sync drop out of their old location."""
+        first = datetime.now(timezone.utc).isoformat()
+        reader = {"a": ("new", first), "b": ("later", first), "c": ("new", first)}
+
+        def list_page(url, params, token, stream=False):
+            return _response({"results": [
+                {"id": doc_id, "location": location, "updated_at": updated_at}
+                for doc_id, (location, updated_at) in reader.items()
+                if params.get("location", location) == location and updated_at > params["updatedAfter"]
+            ]})
+
+        client = ReadwiseClient(token="test", cache=DocumentCache(path=":memory:"))
+        client.transport = MagicMock()
+        client.transport.get.side_effect = list_page
+        self.assertEqual({d.id: d.source_location for d in client.fetch_last_24h()},
+                         {"a": "feed", "b": "library", "c": "feed"})
+
+        moved = datetime.now(timezone.utc).isoformat()
+        reader.update({"a": ("later", moved), "c": ("archive", moved)})
+        docs = client.fetch_last_24h()
+
+        self.assertEqual({d.id: (d.location, d.source_location) for d in docs},
+                         {"a": ("later", "library"), "b": ("later", "library")})
+
+    def test_content_shared_across_accounts_by_url(self):
+        """Verify a second user following the same feed reuses fetched content only when sharing is on."""
+        for share in (False, True):
+            url = f"https://example.com/story-{share}"
+            cache = DocumentCache(path=":memory:")
+            alice = ReadwiseClient(token="alice", cache=cache)
+            alice.transport = MagicMock()
+            alice.transport.get.return_value = _response({"results": [{"id": "a1", "html_content": "<p>shared</p>"}]})
+            alice.source_urls["a1"] = url
+            cache.put_documents([{"id": "a1", "source_url": url}], account=alice.account)
+            alice.fetch_documents_details(["a1"])
+
+            bob = ReadwiseClient(token="bob", cache=cache)
+            bob.transport = MagicMock()
+            bob.transport.get.return_value = _response({"results": [{"id": "b7", "html_content": "<p>bob's</p>"}]})
+            bob.source_urls["b7"] = url
+
+            with patch('client.SHARE_CONTENT_ACROSS_ACCOUNTS', share):
+                contents = bob.fetch_documents_details(["b7"])
+            self.assertEqual(contents, {"b7": "<p>shared</p>" if share else "<p>bob's</p>"})
+            self.assertEqual(bob.transport.get.called, not share)
+
+    def test_shared_content_is_bounded(self):
+        shared = _ContentLRU(2)
+        for url in ("a", "b", "c"):
+            shared.put(url, url.upper())
+        shared.get("b")
+        shared.put("d", "D")
+        self.assertEqual((len(shared), shared.get("a"), shared.get("c"), shared.get("b")), (2, None, None, "B"))
+
+
+if __name__ == '__main__':
+    unittest.main()
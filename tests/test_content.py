@@ -0,0 +1,43 @@
+import unittest
+from content import html_to_text, truncate_to_budget, estimate_tokens, TRUNCATION_MARKER
+
+
+class TestContent(unittest.TestCase):
+
+    def test_html_to_text_drops_markup_and_boilerplate(self):
+        html = (
+            "<html><head><script>track()</script><style>p{}</style></head><body>"
+            "<nav>Home | About</nav><h1>Title</h1><p>First &amp; important paragraph.</p>"
+            "<p>Subscribe to our newsletter</p><footer>Footer links</footer></body></html>"
+        )
+        text = html_to_text(html)
+        self.assertEqual(text, "Title\nFirst & important paragraph.")
+
+    def test_paragraphs_opening_like_boilerplate_are_kept(self):
+        """Verify only short, whole-phrase boilerplate lines are dropped."""
+        paragraphs = [
+            "Shares of Nvidia rose 5% after the company raised its guidance.",
+            "Subscribers to the fund doubled in the quarter, the filing shows.",
+            "Cookies and consent banners are under scrutiny by the regulator.",
+            "Log in data from the breach was sold within hours, researchers say.",
+        ]
+        html = "".join(f"<p>{p}</p>" for p in paragraphs) + "<p>Share this</p><p>© 2025 Example Media</p>"
+        self.assertEqual(html_to_text(html), "\n".join(paragraphs))
+        short = "<p>Shares of Nvidia rose 5%…</p><p>Subscribers to the fund doubled…</p><p>Cookies and consent banners…</p>"
+        self.assertEqual(len(html_to_text(short).splitlines()), 3)
+        self.assertEqual(html_to_text("<p>Body text of the article.</p><p>Cookie settings</p>"), "Body text of the article.")
+
+    def test_truncate_keeps_head_and_tail(self):
+        text = "\n".join(f"line {i} " + "x" * 50 for i in range(200))
+        result = truncate_to_budget(text, token_budget=200)
+        self.assertLessEqual(estimate_tokens(result), 200)
+        self.assertTrue(result.startswith("line 0 "))
+        self.assertTrue(result.endswith("line 199 " + "x" * 50))
+        self.assertIn(TRUNCATION_MARKER, result)
+
+    def test_short_text_untouched(self):
+        self.assertEqual(truncate_to_budget("short", token_budget=10), "short")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import json
+import asyncio
+import unittest
+import urllib.request
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+from zoneinfo import ZoneInfo
+from daemon import DigestDaemon, next_run, serve_http
+
+
+class TestDaemon(unittest.TestCase):
+
+    def test_next_run_in_the_users_timezone(self):
+        rome = ZoneInfo("Europe/Rome")
+        now = datetime(2026, 3, 28, 6, 30, tzinfo=rome)
+        self.assertEqual(next_run("07:00", "Europe/Rome", now), datetime(2026, 3, 28, 7, 0, tzinfo=rome))
+        # Past today's time: tomorrow, at the same wall-clock time across the DST change
+        later = next_run("07:00", "Europe/Rome", datetime(2026, 3, 28, 8, 0, tzinfo=rome))
+        self.assertEqual((later.day, later.hour, later.utcoffset().total_seconds()), (29, 7, 7200))
+        self.assertEqual(next_run("07:00", "UTC", now).hour, 7)
+
+    def test_runs_are_recorded_and_exposed(self):
+        """Verify a triggered run updates /healthz and /metrics."""
+        daemon = DigestDaemon([{"user_id": "alice", "readwise_token": "t", "recipient": "a@example.com",
+                                "prompts": {}, "send_at": "07:00", "timezone": "UTC"}])
+        server = serve_http(daemon, 0)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+
+        async def run():
+            daemon.loop = asyncio.get_running_loop()
+            daemon._semaphore = asyncio.Semaphore(1)
+            daemon.runner = object()
+            with patch('batch.run_user_digest', new=AsyncMock(return_value=True)) as run_user_digest:
+                self.assertTrue(await daemon.run_user(daemon.roster[0]))
+            run_user_digest.assert_awaited_once()
+
+        try:
+            asyncio.run(run())
+            with urllib.request.urlopen(base + "/healthz") as response:
+                health = json.load(response)
+            with urllib.request.urlopen(base + "/metrics") as response:
+                text = response.read().decode()
+        finally:
+            server.shutdown()
+
+        self.assertEqual(health["status"], "ok")
+        self.assertEqual((health["users"]["alice"]["runs"], health["users"]["alice"]["last_ok"]), (1, True))
+        self.assertIn('morning_digest_digest_runs{user="alice",outcome="ok"} 1', text)
+        self.assertIn("morning_digest_daemon_up 1", text)
+        self.assertFalse(daemon.trigger("bob"))
+
+    def test_trigger_refuses_a_second_run_of_the_same_user(self):
+        """Verify a user's digest is never generated twice at once."""
+        daemon = DigestDaemon([{"user_id": "alice", "readwise_token": "t", "recipient": "a@example.com",
+                                "prompts": {}, "send_at": "07:00", "timezone": "UTC"}])
+
+        async def run():
+            daemon.loop = asyncio.get_running_loop()
+            daemon._semaphore = asyncio.Semaphore(2)
+            release = asyncio.Event()
+
+            async def slow_digest(runner, user, run_config):
+                await release.wait()
+                return True
+
+            with patch('batch.run_user_digest', new=slow_digest):
+                self.assertTrue(await asyncio.to_thread(daemon.trigger, "alice"))
+                self.assertFalse(await asyncio.to_thread(daemon.trigger, "alice"))
+                self.assertFalse(await daemon.run_user(daemon.roster[0]))
+                release.set()
+                while daemon.is_running("alice"):
+                    await asyncio.sleep(0.01)
+
+        asyncio.run(run())
+        self.assertEqual(daemon.status["alice"]["runs"], 1)
+
+    def test_prewarm_prefetches_the_selectors_shortlist(self):
+        """Verify pre-warm schedules the selector's shortlist, not the documents in fetch order."""
+        daemon = DigestDaemon([{"user_id": "alice", "readwise_token": "t"}])
+        readwise, prefetcher = MagicMock(), MagicMock()
+        candidates = [{"id": "best"}]
+        with patch('client.get_user_client', return_value=readwise), \
+             patch('prefetch.get_prefetcher', return_value=prefetcher), \
+             patch('utils.prompts'), \
+             patch('agents.selector.shortlist_candidates', return_value=candidates) as shortlist_candidates:
+            asyncio.run(daemon.prewarm_user(daemon.roster[0]))
+
+        readwise.sync.assert_called_once()
+        shortlist_candidates.assert_called_once_with(readwise, "alice")
+        prefetcher.schedule.assert_called_once_with(readwise, candidates)
+
+
+if __name__ == '__main__':
+    unittest.main()
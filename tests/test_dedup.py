@@ -0,0 +1,36 @@
+import unittest
+from dedup import cluster, collapse_duplicates, jaccard, shingles
+
+
+class TestDedup(unittest.TestCase):
+
+    def setUp(self):
+        self.docs = [
+            {"id": "1", "title": "Central bank raises rates to curb inflation",
+             "summary": "The central bank raised its benchmark rate by half a point on Tuesday.",
+             "source_location": "feed", "word_count": 600},
+            {"id": "2", "title": "New compiler release doubles build speed",
+             "summary": "The release rewrites the optimizer and caches intermediate results.",
+             "source_location": "feed", "word_count": 900},
+            {"id": "3", "title": "Central Bank raises rates to curb inflation!",
+             "summary": "The central bank raised its benchmark rate by half a point on Tuesday (Reuters).",
+             "source_location": "library", "word_count": 450},
+        ]
+
+    def test_shingles_ignore_case_and_punctuation(self):
+        self.assertEqual(shingles(self.docs[0]), shingles({**self.docs[0], "title": self.docs[0]["title"].upper() + "?"}))
+        self.assertEqual(shingles({"title": "", "summary": None}), set())
+
+    def test_syndicated_copies_are_clustered(self):
+        self.assertGreater(jaccard(shingles(self.docs[0]), shingles(self.docs[2])), 0.7)
+        self.assertEqual(cluster(self.docs), [[0, 2], [1]])
+
+    def test_collapse_keeps_one_representative_per_story(self):
+        """Verify the saved copy represents the story and carries the number of sources."""
+        stories = collapse_duplicates(self.docs)
+        self.assertEqual([(s["id"], s["source_count"]) for s in stories], [("3", 2), ("2", 1)])
+        self.assertNotIn("source_count", self.docs[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import json
+import unittest
+from dedup import collapse_duplicates
+from documents import DocumentRecord, iter_list_page
+from ranking import shortlist
+
+
+def _chunks(payload, size):
+    body = json.dumps(payload).encode("utf-8")
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class TestDocuments(unittest.TestCase):
+
+    def test_items_are_streamed_across_chunk_boundaries(self):
+        """Verify every item and top-level field survives any chunking of the body."""
+        payload = {
+            "count": 12345,
+            "nextPageCursor": "abc",
+            "results": [{"id": str(i), "title": f"Città {i}", "word_count": 1000 + i, "tags": {"a": [1, 2]}}
+                        for i in range(20)],
+        }
+        for size in (1, 3, 64, 100_000):
+            meta = {}
+            items = list(iter_list_page(_chunks(payload, size), meta))
+            self.assertEqual(items, payload["results"])
+            self.assertEqual(meta, {"count": 12345, "nextPageCursor": "abc"})
+
+    def test_fields_after_the_results_and_empty_pages(self):
+        meta = {}
+        self.assertEqual(list(iter_list_page(_chunks({"results": [], "nextPageCursor": None}, 5), meta)), [])
+        self.assertEqual(meta, {"nextPageCursor": None})
+        self.assertEqual(list(iter_list_page([b"{}"], {})), [])
+
+    def test_truncated_body_raises(self):
+        body = json.dumps({"results": [{"id": "1"}, {"id": "2"}]}).encode("utf-8")
+        with self.assertRaises(ValueError):
+            list(iter_list_page([body[:-6]], {}))
+
+    def test_record_projects_the_used_fields(self):
+        """Verify only the pipeline's fields are kept, labelled with the location."""
+        record = DocumentRecord.from_api({
+            "id": "7", "title": "T", "summary": None, "word_count": None, "source_url": "https://a.example/7",
+            "updated_at": "2025-01-01T00:00:00+00:00", "html_content": "<p>big</p>", "notes": "n", "tags": {},
+        }, "library")
+
+        self.assertEqual(record.to_dict(), {
+            "id": "7", "title": "T", "summary": "", "source_location": "library", "location": "", "word_count": 0,
+            "source_url": "https://a.example/7", "updated_at": "2025-01-01T00:00:00+00:00",
+            "source_count": 1, "novelty": 1.0, "scores": None,
+        })
+        self.assertEqual((record.get("word_count"), record["id"]), (0, "7"))
+        self.assertIsNone(record.get("html_content"))
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_selector_stages_keep_records(self):
+        """Verify dedup and shortlist annotate copies of the records instead of building dicts."""
+        records = [DocumentRecord(id=str(i), title=title, summary="Fintech and BaaS for banks", word_count=500)
+                   for i, title in enumerate(("Banks adopt BaaS", "Banks adopt BaaS", "Tokenization grows"))]
+
+        candidates = shortlist(collapse_duplicates(records))
+
+        self.assertTrue(all(isinstance(doc, DocumentRecord) for doc in candidates))
+        self.assertEqual([(doc.id, doc.source_count) for doc in candidates], [("0", 2), ("2", 1)])
+        self.assertIn("business", candidates[0].scores)
+        self.assertEqual((records[0].source_count, records[0].scores), (1, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import json
+import asyncio
+import unittest
+from unittest.mock import patch
+from isolation import isolate_state
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+from agents.fanout import FanOutEnricherAgent
+
+
+SELECTION = {"selection": [
+    {"id": "1", "title": "A", "category_label": "🤯 Non puoi ignorarlo"},
+    {"id": "2", "title": "B", "category_label": "📌 Rilevanza CEO / Credem"},
+    {"id": "3", "title": "C", "category_label": "🧘 Lettura Lunga / Sviluppo Personale"},
+    {"id": "4", "title": "D", "category_label": "long_read"},
+]}
+
+
+class TestFanOutEnricher(unittest.TestCase):
+
+    def setUp(self):
+        isolate_state(self)
+
+    def _run(self, agent):
+        async def run():
+            runner = InMemoryRunner(agent=agent, app_name="test")
+            session = await runner.session_service.create_session(
+                app_name="test", user_id="u", state={"selection_result": json.dumps(SELECTION)}
+            )
+            message = types.Content(role="user", parts=[types.Part.from_text(text="go")])
+            async for _ in runner.run_async(user_id="u", session_id=session.id, new_message=message):
+                pass
+            session = await runner.session_service.get_session(app_name="test", user_id="u", session_id=session.id)
+            return json.loads(session.state["final_digest"])
+        return asyncio.run(run())
+
+    @patch.dict(os.environ, {"LLM_CACHE_DISABLED": "1"})
+    @patch('agents.fanout.client')
+    def test_enriches_targets_concurrently(self, mock_client):
+        """Verify one bounded-concurrency model call per target article."""
+        mock_client.fetch_document_details.return_value = "<p>Full text</p>"
+        active = {"now": 0, "peak": 0}
+
+        async def fake_generate(model, instruction, prompt):
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.01)
+            active["now"] -= 1
+            return '["one", "two", "three"]'
+
+        with patch('agents.fanout.generate_text', side_effect=fake_generate) as generate:
+            digest = self._run(FanOutEnricherAgent(name="EnricherAgent", concurrency=2))
+
+        self.assertEqual(generate.call_count, 3)
+        self.assertEqual(active["peak"], 2)
+        mock_client.fetch_documents_details.assert_called_once_with(["1", "3", "4"])
+        articles = {a["id"]: a for a in digest["selection"]}
+        self.assertEqual(articles["1"]["key_takeaways"], ["one", "two", "three"])
+        self.assertNotIn("key_takeaways", articles["2"])
+
+    @patch.dict(os.environ, {"LLM_CACHE_DISABLED": "1"})
+    @patch('agents.fanout.client')
+    def test_replies_that_are_not_lists_give_no_takeaways(self, mock_client):
+        mock_client.fetch_document_details.return_value = "<p>Full text</p>"
+        replies = iter(['"A single sentence"', '{"key_takeaways": ["one", 2]}', '["a", "b", "c", "d"]'])
+
+        async def fake_generate(model, instruction, prompt):
+            return next(replies)
+
+        with patch('agents.fanout.generate_text', side_effect=fake_generate):
+            digest = self._run(FanOutEnricherAgent(name="EnricherAgent", concurrency=1))
+
+        takeaways = sorted(a["key_takeaways"] for a in digest["selection"] if "key_takeaways" in a)
+        self.assertEqual(takeaways, [[], ["a", "b", "c"], ["one", "2"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+from history import SentHistory, normalize_url
+
+
+class TestSentHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "sent_history.bin")
+        self.sent = {"id": "1", "title": "Central bank raises rates to curb inflation",
+                     "summary": "The central bank raised its benchmark rate by half a point on Tuesday.",
+                     "source_url": "https://www.example.com/rates/?utm_source=feed"}
+
+    def test_normalize_url_drops_tracking_and_fragments(self):
+        self.assertEqual(normalize_url("https://www.Example.com/a/?utm_medium=x&b=2#top"),
+                         normalize_url("http://example.com/a?b=2"))
+
+    def test_sent_articles_are_filtered_after_reload(self):
+        """Verify delivered articles survive a restart and are matched by ID or URL, per user."""
+        SentHistory(self.path).record("alice", [self.sent])
+        history = SentHistory(self.path)
+        candidates = [
+            {"id": "1", "title": "Updated", "summary": "", "source_url": None},
+            {"id": "2", "title": "Other", "summary": "", "source_url": "https://example.com/rates"},
+            {"id": "3", "title": "New compiler release doubles build speed", "summary": "", "source_url": None},
+        ]
+        self.assertEqual([d["id"] for d in history.filter_candidates("alice", candidates)], ["3"])
+        self.assertEqual(len(history.filter_candidates("bob", candidates)), 3)
+
+    def test_filter_collisions_are_not_taken_as_sent(self):
+        """Verify a Bloom filter false positive is checked against the exact fingerprints."""
+        history = SentHistory(self.path)
+        history.record("alice", [self.sent])
+        # Every bit set: any lookup collides in the filter
+        history.filter.bits = bytearray(b"\xff" * len(history.filter.bits))
+        fresh = {"id": "7", "title": "New compiler release doubles build speed", "summary": "",
+                 "source_url": "https://example.org/compiler"}
+        self.assertFalse(history.was_sent("alice", fresh))
+        self.assertTrue(history.was_sent("alice", self.sent))
+        self.assertEqual([d["id"] for d in history.filter_candidates("alice", [fresh, self.sent])], ["7"])
+
+    def test_novelty_drops_for_stories_already_covered(self):
+        history = SentHistory(self.path)
+        history.record("alice", [self.sent])
+        copy = {**self.sent, "id": "9", "source_url": "https://other.example.org/story",
+                "summary": self.sent["summary"] + " (Reuters)"}
+        unrelated = {"id": "8", "title": "New compiler release doubles build speed",
+                     "summary": "The release rewrites the optimizer and caches intermediate results."}
+        self.assertLess(history.novelty("alice", copy), 0.5)
+        self.assertEqual(history.novelty("alice", unrelated), 1.0)
+
+    def test_expired_records_are_compacted(self):
+        SentHistory(self.path).record("alice", [self.sent])
+        history = SentHistory(self.path, retention_days=-1)
+        self.assertFalse(history.was_sent("alice", self.sent))
+        self.assertEqual(os.path.getsize(self.path), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
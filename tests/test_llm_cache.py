@@ -0,0 +1,56 @@
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+import llm_cache
+from llm_cache import ResponseCache, cache_key, before_model_cache, after_model_cache
+
+
+def _request(call_id):
+    return LlmRequest(
+        model="gemini-2.0-flash-001",
+        contents=[
+            types.Content(role="user", parts=[types.Part.from_text(text="Start")]),
+            types.Content(role="model", parts=[types.Part(function_call=types.FunctionCall(id=call_id, name="fetch_readwise_data", args={}))]),
+            types.Content(role="user", parts=[types.Part(function_response=types.FunctionResponse(id=call_id, name="fetch_readwise_data", response={"result": "[]"}))]),
+        ],
+        config=types.GenerateContentConfig(system_instruction="Select articles."),
+    )
+
+
+class TestLlmCache(unittest.TestCase):
+
+    def test_key_ignores_function_call_ids(self):
+        a, b = _request("adk-1"), _request("adk-2")
+        self.assertEqual(cache_key(a.model, a.config.system_instruction, a.contents),
+                         cache_key(b.model, b.config.system_instruction, b.contents))
+        self.assertNotEqual(cache_key(a.model, "Other instruction", a.contents),
+                            cache_key(a.model, a.config.system_instruction, a.contents))
+
+    def test_callbacks_round_trip(self):
+        """Verify a stored response answers the next identical turn, unless bypassed."""
+        context = MagicMock(invocation_id="inv", agent_name="SelectorAgent")
+        response = LlmResponse(content=types.Content(role="model", parts=[types.Part.from_text(text='{"selection": []}')]))
+
+        with patch.object(llm_cache, "_default_cache", ResponseCache(path=":memory:")):
+            self.assertIsNone(before_model_cache(context, _request("adk-1")))
+            after_model_cache(context, response)
+
+            cached = before_model_cache(context, _request("adk-2"))
+            self.assertEqual(cached.content.parts[0].text, '{"selection": []}')
+
+            with patch.dict(os.environ, {"LLM_CACHE_BYPASS": "1"}):
+                self.assertIsNone(before_model_cache(context, _request("adk-3")))
+
+    def test_eviction_keeps_most_recent(self):
+        cache = ResponseCache(path=":memory:", max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.put(key, "{}")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), "{}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+from isolation import isolate_state
+from agents.enricher import fetch_full_content
+from agents.fanout import FanOutEnricherAgent
+from agents.longdoc import MAP_PROMPT, REDUCE_PROMPT, is_long_document, summarize_long_document
+from content import split_into_chunks, estimate_tokens
+
+
+class TestLongDocument(unittest.TestCase):
+
+    def setUp(self):
+        isolate_state(self)
+
+    def test_chunks_are_token_bounded_and_keep_the_text(self):
+        text = "\n".join(f"Paragraph {i}: " + "word " * 120 for i in range(40))
+        chunks = split_into_chunks(text, 500)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(estimate_tokens(chunk) <= 500 for chunk in chunks))
+        self.assertEqual("\n".join(chunks), text)
+        self.assertEqual(len(split_into_chunks("x" * 5000, 100)), 13)
+
+    def test_map_reduce_is_bounded_and_reduces_to_three(self):
+        """Verify chunks are summarized concurrently (within the cap) before one reduce call."""
+        text = "\n".join("word " * 200 for _ in range(30))
+        self.assertTrue(is_long_document(text * 10))
+        active = {"now": 0, "peak": 0}
+        reduce_prompts = []
+
+        async def fake_generate(model, instruction, prompt):
+            if instruction == REDUCE_PROMPT:
+                reduce_prompts.append(prompt)
+                return '["one", "two", "three", "four"]'
+            self.assertEqual(instruction, MAP_PROMPT)
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.01)
+            active["now"] -= 1
+            return '["point"]'
+
+        with patch('agents.longdoc.generate_text', side_effect=fake_generate) as generate:
+            takeaways = asyncio.run(summarize_long_document("m", "Title", text, chunk_tokens=500, concurrency=3))
+
+        chunks = len(split_into_chunks(text, 500))
+        self.assertEqual(generate.call_count, chunks + 1)
+        self.assertEqual(active["peak"], 3)
+        self.assertEqual(takeaways, ["one", "two", "three"])
+        self.assertIn(f"[section {chunks}] point", reduce_prompts[0])
+
+    def test_failed_map_reduce_falls_back_to_the_truncated_text(self):
+        """Verify no reduce runs over empty partials and a failing reduce is not fatal to the tool."""
+        html = "<p>" + "word " * 40000 + "</p>"
+        reduces = []
+
+        async def maps_fail(model, instruction, prompt):
+            if instruction == REDUCE_PROMPT:
+                reduces.append(prompt)
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+
+        async def reduce_fails(model, instruction, prompt):
+            if instruction == REDUCE_PROMPT:
+                raise RuntimeError("429 RESOURCE_EXHAUSTED")
+            return '["point"]'
+
+        for fake_generate in (maps_fail, reduce_fails):
+            with patch('agents.longdoc.generate_text', side_effect=fake_generate), \
+                 patch('agents.enricher.client.fetch_document_details', return_value=html):
+                result = asyncio.run(fetch_full_content("doc1"))
+            self.assertNotIn("Key takeaways", result)
+            self.assertLess(len(result), len(html) // 10)
+        self.assertEqual(reduces, [])
+
+    def test_fanout_model_calls_share_one_limit(self):
+        """Verify chunk calls of long articles count against the fan-out's concurrency."""
+        long_html = "<p>" + "\n".join("word " * 200 for _ in range(200)) + "</p>"
+        articles = [{"id": f"doc{i}", "title": f"T{i}"} for i in range(4)]
+        active = {"now": 0, "peak": 0}
+
+        async def fake_generate(model, instruction, prompt):
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.005)
+            active["now"] -= 1
+            return '["one", "two", "three"]'
+
+        agent = FanOutEnricherAgent(name="fanout", model="m", instruction="i", concurrency=3)
+        readwise = MagicMock()
+        readwise.fetch_document_details.return_value = long_html
+        with patch('agents.longdoc.generate_text', side_effect=fake_generate), \
+             patch('agents.fanout.generate_text', side_effect=fake_generate):
+            async def enrich_all():
+                semaphore = asyncio.Semaphore(agent.concurrency)
+                await asyncio.gather(*(agent._enrich(readwise, article, semaphore) for article in articles))
+            asyncio.run(enrich_all())
+
+        self.assertEqual(active["peak"], 3)
+        self.assertTrue(all(article["key_takeaways"] == ["one", "two", "three"] for article in articles))
+
+
+if __name__ == '__main__':
+    unittest.main()
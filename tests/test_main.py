@@ -0,0 +1,54 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from isolation import isolate_state
+from google.adk.events import Event, EventActions
+from google.genai import types
+import main
+
+
+class _FakeRunner:
+    """Streams a fixed list of events, like InMemoryRunner.run_async."""
+
+    def __init__(self, events):
+        self.events = events
+        self.session_service = MagicMock()
+        self.session_service.create_session = AsyncMock(return_value=MagicMock(id="s1"))
+        self.session_service.get_session = AsyncMock()
+
+    async def run_async(self, **kwargs):
+        for event in self.events:
+            await asyncio.sleep(0)
+            yield event
+
+
+class TestRunPipeline(unittest.TestCase):
+
+    def setUp(self):
+        isolate_state(self)
+
+    def test_streams_selection_and_final_digest(self):
+        """Verify the selection triggers the prefetch and the digest comes from its event."""
+        usage = types.GenerateContentResponseUsageMetadata(prompt_token_count=120, candidates_token_count=30)
+        runner = _FakeRunner([
+            Event(author="SelectorAgent", usage_metadata=usage,
+                  actions=EventActions(state_delta={"selection_result": '{"selection": []}'})),
+            Event(author="EnricherAgent", usage_metadata=usage,
+                  actions=EventActions(state_delta={"final_digest": '{"selection": [1]}'})),
+        ])
+        trace = main.PipelineTrace()
+
+        with patch('main._on_selection') as on_selection:
+            result = asyncio.run(main.run_pipeline(runner, "alice", "s1", trace=trace))
+
+        self.assertEqual(result, '{"selection": [1]}')
+        on_selection.assert_called_once_with("alice", '{"selection": []}')
+        runner.session_service.get_session.assert_not_called()
+        stats = trace.by_author()
+        self.assertEqual(stats["SelectorAgent"]["prompt_tokens"], 120)
+        self.assertEqual(stats["EnricherAgent"]["output_tokens"], 30)
+        self.assertIn("EnricherAgent", trace.summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
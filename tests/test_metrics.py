@@ -0,0 +1,74 @@
+import os
+import json
+import tempfile
+import unittest
+from unittest.mock import ANY, MagicMock, patch
+import metrics
+from metrics import MetricsRecorder
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_spans_and_exports(self):
+        recorder = MetricsRecorder()
+        with recorder.span("readwise.list") as span:
+            span.set(results=3)
+        with self.assertRaises(ValueError), recorder.span("smtp.send"):
+            raise ValueError("down")
+        recorder.record("llm.turn", 1.5, agent="SelectorAgent", prompt_tokens=100, output_tokens=20)
+        recorder.record("llm.turn", 0.5, agent="SelectorAgent", prompt_tokens=50, output_tokens=5)
+
+        stages = recorder.aggregate()
+        self.assertEqual(stages["llm.turn"]["count"], 2)
+        self.assertEqual(stages["llm.turn"]["total_seconds"], 2.0)
+        self.assertEqual(stages["smtp.send"]["errors"], 1)
+        self.assertEqual(recorder.tokens_by_agent(), {"SelectorAgent": {"prompt_tokens": 150, "output_tokens": 25}})
+        self.assertIn("llm.turn", recorder.summary())
+
+        directory = tempfile.mkdtemp()
+        with patch.dict(os.environ, {"METRICS_REPORT_PATH": os.path.join(directory, "run.json"),
+                                     "METRICS_PROMETHEUS_PATH": os.path.join(directory, "digest.prom")}):
+            metrics.export_run(recorder)
+        with open(os.path.join(directory, "run.json")) as f:
+            self.assertEqual(json.load(f)["spans"][0], {"name": "readwise.list", "seconds": ANY, "results": 3})
+        with open(os.path.join(directory, "digest.prom")) as f:
+            prom = f.read()
+        self.assertIn('morning_digest_stage_seconds_count{stage="llm.turn"} 2', prom)
+        self.assertIn('morning_digest_llm_tokens{agent="SelectorAgent",kind="prompt"} 150', prom)
+
+    def test_prometheus_totals_survive_dropped_spans(self):
+        """Verify exported stage totals keep growing once old spans are dropped."""
+        recorder = MetricsRecorder(max_spans=2)
+        for seconds in (1.0, 2.0, 3.0):
+            recorder.record("llm.turn", seconds, agent="SelectorAgent", prompt_tokens=10)
+        recorder.run_started(1_900_000_000)
+
+        prom = recorder.prometheus_text()
+        self.assertEqual(recorder.aggregate()["llm.turn"]["count"], 2)
+        self.assertIn('morning_digest_stage_seconds_count{stage="llm.turn"} 3', prom)
+        self.assertIn('morning_digest_stage_seconds_sum{stage="llm.turn"} 6.000000', prom)
+        self.assertIn('morning_digest_llm_tokens{agent="SelectorAgent",kind="prompt"} 30', prom)
+        self.assertIn("morning_digest_last_run_timestamp_seconds 1900000000", prom)
+
+    def test_tool_timer_callbacks(self):
+        recorder = MetricsRecorder()
+        tool = MagicMock()
+        tool.name = "fetch_readwise_data"
+        context = MagicMock(function_call_id="call-1", agent_name="SelectorAgent")
+        with patch.object(metrics, "_recorder", recorder), patch.object(metrics, "_configured", True):
+            self.assertIsNone(metrics.before_tool_timer(tool, {}, context))
+            self.assertIsNone(metrics.after_tool_timer(tool, {}, context, "[]"))
+        self.assertEqual(recorder.spans[0]["name"], "tool.fetch_readwise_data")
+        self.assertEqual(recorder.spans[0]["agent"], "SelectorAgent")
+
+    def test_disabled_is_a_no_op(self):
+        with patch.object(metrics, "_recorder", None), patch.object(metrics, "_configured", True):
+            with metrics.span("render") as span:
+                span.set(articles=5)
+            metrics.record("llm.turn", 1.0)
+            self.assertIs(metrics.span("render"), metrics._NULL_SPAN)
+            self.assertIsNone(metrics.get_recorder())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import notification
+from notification import SMTPMailer, Outbox, send_digest_email
+from benchmarks.standins import LocalSMTPSink
+
+
+class TestMailer(unittest.TestCase):
+
+    def test_reuses_one_connection(self):
+        """Verify many messages go over a single SMTP session."""
+        with LocalSMTPSink() as sink:
+            mailer = SMTPMailer(sink.host, sink.port, "digest@example.com", use_tls=False)
+            for i in range(5):
+                latency = mailer.send(["reader@example.com"], f"Subject: {i}\r\n\r\nBody {i}")
+                self.assertGreaterEqual(latency, 0)
+            mailer.close()
+
+        self.assertEqual(len(sink.messages), 5)
+        self.assertEqual(sink.connections, 1)
+        self.assertEqual(sink.messages[0]["to"], ["reader@example.com"])
+
+    def test_reconnects_on_drop(self):
+        with LocalSMTPSink(drop_after_each_message=True) as sink:
+            mailer = SMTPMailer(sink.host, sink.port, "digest@example.com", use_tls=False)
+            mailer.send(["reader@example.com"], "Subject: 1\r\n\r\nOne")
+            mailer.send(["reader@example.com"], "Subject: 2\r\n\r\nTwo")
+
+        self.assertEqual(len(sink.messages), 2)
+        self.assertEqual(sink.connections, 2)
+
+    def test_outbox_retries_failed_delivery(self):
+        """Verify a message queued while SMTP is down is delivered by a later flush."""
+        outbox = Outbox(tempfile.mkdtemp())
+        message_id = outbox.enqueue("digest@example.com", ["reader@example.com"], "Subject: x\r\n\r\nBody")
+
+        down = SMTPMailer("127.0.0.1", 1, "digest@example.com", use_tls=False, timeout=1)
+        self.assertEqual(outbox.flush(down), {})
+        self.assertEqual(outbox.pending(), [message_id])
+
+        with LocalSMTPSink() as sink:
+            delivered = outbox.flush(SMTPMailer(sink.host, sink.port, "digest@example.com", use_tls=False))
+
+        self.assertIn(message_id, delivered)
+        self.assertEqual(outbox.pending(), [])
+        self.assertEqual(len(sink.messages), 1)
+
+    def test_outbox_supersedes_and_gives_up(self):
+        """Verify a newer digest replaces older queued ones, and failures stop after max_attempts."""
+        outbox = Outbox(tempfile.mkdtemp(), max_attempts=2)
+        stale = outbox.enqueue("digest@example.com", ["reader@example.com"], "Subject: 1\r\n\r\nOld", day="2025-01-01")
+        other = outbox.enqueue("digest@example.com", ["other@example.com"], "Subject: 2\r\n\r\nOther", day="2025-01-01")
+        fresh = outbox.enqueue("digest@example.com", ["reader@example.com"], "Subject: 3\r\n\r\nNew", day="2025-01-02")
+        self.assertEqual(outbox.pending(), sorted([other, fresh]))
+        self.assertFalse(outbox.is_pending(stale))
+
+        down = SMTPMailer("127.0.0.1", 1, "digest@example.com", use_tls=False, timeout=1)
+        outbox.flush(down, [fresh])
+        self.assertEqual(outbox.pending(), sorted([other, fresh]))
+        outbox.flush(down, [fresh])
+        self.assertEqual(outbox.pending(), [other])
+        self.assertEqual(outbox.dead_letters(), [fresh])
+
+    def test_send_digest_email_end_to_end(self):
+        with LocalSMTPSink() as sink:
+            env = {
+                "EMAIL_SENDER_ADDRESS": "digest@example.com",
+                "EMAIL_SENDER_APP_PASSWORD": "",
+                "EMAIL_RECIPIENT_ADDRESS": "reader@example.com",
+                "SMTP_SERVER": sink.host,
+                "SMTP_PORT": str(sink.port),
+                "SMTP_STARTTLS": "false",
+                "EMAIL_OUTBOX_DIR": tempfile.mkdtemp(),
+            }
+            with patch.dict(os.environ, env), patch.object(notification, "_mailer", None), \
+                    patch.object(notification, "_outbox", None):
+                # No password configured: the configuration is rejected
+                self.assertFalse(send_digest_email("Digest", "<p>Hi</p>"))
+                os.environ["EMAIL_SENDER_APP_PASSWORD"] = "secret"
+                self.assertTrue(send_digest_email("Digest", "<p>Hi</p>"))
+                self.assertTrue(send_digest_email("Digest", "<p>Hi</p>", recipient_email="other@example.com"))
+
+        self.assertEqual(sink.logins, 1)
+        self.assertEqual(sink.messages[-1]["to"], ["other@example.com"])
+
+    def test_send_digest_email_leaves_the_backlog_alone(self):
+        """Verify a send delivers only its own message, not an unrelated queued one."""
+        outbox_dir = tempfile.mkdtemp()
+        backlog = Outbox(outbox_dir).enqueue("digest@example.com", ["someone@example.com"], "Subject: x\r\n\r\nOld")
+        with LocalSMTPSink() as sink:
+            env = {
+                "EMAIL_SENDER_ADDRESS": "digest@example.com",
+                "EMAIL_SENDER_APP_PASSWORD": "secret",
+                "EMAIL_RECIPIENT_ADDRESS": "reader@example.com",
+                "SMTP_SERVER": sink.host,
+                "SMTP_PORT": str(sink.port),
+                "SMTP_STARTTLS": "false",
+                "EMAIL_OUTBOX_DIR": outbox_dir,
+            }
+            with patch.dict(os.environ, env), patch.object(notification, "_mailer", None), \
+                    patch.object(notification, "_outbox", None):
+                self.assertTrue(send_digest_email("Digest", "<p>Hi</p>"))
+
+        self.assertEqual([m["to"] for m in sink.messages], [["reader@example.com"]])
+        self.assertEqual(Outbox(outbox_dir).pending(), [backlog])
+
+
+if __name__ == '__main__':
+    unittest.main()
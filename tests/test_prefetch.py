@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import MagicMock
+from prefetch import SpeculativePrefetcher, likely_targets
+
+
+class TestSpeculativePrefetcher(unittest.TestCase):
+
+    def test_likely_targets_are_library_or_long_reads(self):
+        docs = [
+            {"id": "1", "source_location": "feed", "word_count": 500},
+            {"id": "2", "source_location": "library", "word_count": 300},
+            {"id": "3", "source_location": "feed", "word_count": 4000},
+            {"id": "4", "source_location": "library"},
+        ]
+        self.assertEqual(likely_targets(docs), ["2", "3", "4"])
+        self.assertEqual(likely_targets(docs, limit=2), ["2", "3"])
+
+    def test_likely_targets_follow_shortlist_scores(self):
+        """Verify a low-scored library item listed first does not crowd out high-scored long reads."""
+        docs = [
+            {"id": "lib", "source_location": "library", "scores": {"other": 0.4}},
+            {"id": "long", "word_count": 6000, "scores": {"long_read": 8.7, "other": 0.1}},
+            {"id": "must", "source_location": "library", "scores": {"must_read": 1.9, "other": 1.2}},
+        ]
+        self.assertEqual(likely_targets(docs, limit=2), ["long", "must"])
+
+    def test_prefetch_and_hit_miss_metrics(self):
+        """Verify candidates are fetched once in the background and counted on use."""
+        readwise = MagicMock(account="acct")
+        readwise.fetch_documents_details.return_value = {"2": "<p>two</p>"}
+        prefetcher = SpeculativePrefetcher(max_speculative=1)
+        docs = [{"id": "2", "source_location": "library"}, {"id": "3", "word_count": 5000}]
+
+        prefetcher.schedule(readwise, docs).result(timeout=5)
+        self.assertIsNone(prefetcher.schedule(readwise, docs[:1]))
+        readwise.fetch_documents_details.assert_called_once_with(["2"])
+
+        self.assertTrue(prefetcher.record(readwise, "2"))
+        self.assertFalse(prefetcher.record(readwise, "9"))
+        stats = prefetcher.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["wasted"]), (1, 1, 0))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_tracking_is_bounded_and_failures_are_logged(self):
+        readwise = MagicMock(account="acct")
+        readwise.fetch_documents_details.side_effect = RuntimeError("429")
+        prefetcher = SpeculativePrefetcher(max_speculative=5, max_tracked=3)
+        docs = [{"id": str(i), "source_location": "library"} for i in range(5)]
+
+        with self.assertLogs("prefetch", level="WARNING") as logs:
+            future = prefetcher.schedule(readwise, docs)
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+            prefetcher._executor.shutdown(wait=True)
+        self.assertIn("Speculative prefetch failed", logs.output[0])
+
+        self.assertEqual(len(prefetcher._speculated), 3)
+        self.assertFalse(prefetcher.record(readwise, "0"))
+        self.assertTrue(prefetcher.record(readwise, "4"))
+        self.assertEqual(prefetcher.stats()["wasted"], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from ranking import shortlist
+
+
+class TestRanking(unittest.TestCase):
+
+    def setUp(self):
+        self.docs = [
+            {'id': 'fintech', 'title': 'Fintech and RegTech outlook', 'summary': 'RegTech adoption grows.',
+             'source_location': 'feed', 'word_count': 900},
+            {'id': 'long', 'title': 'A deep essay', 'summary': 'Thoughts on leadership.',
+             'source_location': 'feed', 'word_count': 5000},
+            {'id': 'library', 'title': 'Saved for later', 'summary': None,
+             'source_location': 'library', 'word_count': 300},
+        ] + [
+            {'id': f'filler{i}', 'title': 'Daily news roundup', 'summary': 'Daily news.',
+             'source_location': 'feed', 'word_count': 400}
+            for i in range(20)
+        ]
+
+    def test_eligibility_rules(self):
+        """Verify category eligibility follows the selector rules."""
+        by_id = {d['id']: d for d in shortlist(self.docs, top_k=3)}
+        self.assertIn('business', by_id['fintech']['scores'])
+        self.assertIn('long_read', by_id['long']['scores'])
+        self.assertIn('long_read', by_id['library']['scores'])
+        self.assertNotIn('must_read', by_id['library']['scores'])
+
+    def test_shortlist_is_bounded(self):
+        """Verify the shortlist holds at most top_k documents per category."""
+        result = shortlist(self.docs, top_k=3)
+        self.assertLessEqual(len(result), 4 * 3)
+        self.assertLess(len(result), len(self.docs))
+        self.assertNotIn('scores', self.docs[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
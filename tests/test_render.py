@@ -0,0 +1,47 @@
+import unittest
+from datetime import datetime
+from email import message_from_string
+from notification import build_message
+from render import render_digest
+
+
+class TestRender(unittest.TestCase):
+
+    def test_renders_html_and_text(self):
+        articles = [
+            {"title": "AI <Banking>", "category_label": "🤯 Non puoi ignorarlo", "reasoning": "Nuovo",
+             "key_takeaways": ["One", "Two & three"], "summary": "Line 1\nLine 2",
+             "source_url": "https://example.com/a?x=1&y=2"},
+            {"title": "Sleep", "category_label": "💡 Altro", "source_url": "https://example.com/b"},
+        ]
+        digest = render_digest(articles, date=datetime(2025, 3, 1))
+
+        self.assertEqual(digest.subject, "🌅 Morning Digest AI - 01/03/2025")
+        self.assertIn("1. AI &lt;Banking&gt;</h3>", digest.html)
+        self.assertIn("<li style=", digest.html)
+        self.assertIn("Two &amp; three</li>", digest.html)
+        self.assertIn("Line 1<br>\nLine 2", digest.html)
+        self.assertIn('href="https://example.com/a?x=1&amp;y=2"', digest.html)
+        self.assertIn("Nessun riassunto disponibile.", digest.html)
+        self.assertNotIn("<style", digest.html)
+        self.assertEqual(digest.html.count("Key Takeaways"), 1)
+
+        self.assertIn("1. AI <Banking>\nCategoria: 🤯 Non puoi ignorarlo\n", digest.text)
+        self.assertIn("  * Two & three\n", digest.text)
+        self.assertIn("Leggi l'articolo: https://example.com/b", digest.text)
+
+    def test_empty_selection(self):
+        digest = render_digest([])
+        self.assertIn("Nessun articolo trovato", digest.html)
+        self.assertIn("Nessun articolo trovato", digest.text)
+
+    def test_multipart_message(self):
+        digest = render_digest([{"title": "T", "category_label": "C", "source_url": "https://e.com"}])
+        msg = message_from_string(build_message(digest.html, digest.text).as_string())
+
+        self.assertEqual(msg.get_content_type(), "multipart/alternative")
+        self.assertEqual([part.get_content_type() for part in msg.get_payload()], ["text/plain", "text/html"])
+
+
+if __name__ == '__main__':
+    unittest.main()
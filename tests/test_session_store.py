@@ -0,0 +1,125 @@
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from isolation import isolate_state
+from google.adk.agents import SequentialAgent
+from google.adk.events import Event, EventActions
+from google.adk.runners import Runner
+from benchmarks.standins import FAKE_MODEL, ReaderStandIn, make_corpus
+from client import register_user_token
+from agents.selector import selector_agent, DEFAULT_SELECTOR_PROMPT
+from agents.enricher import enricher_agent, DEFAULT_ENRICHER_PROMPT
+from session_store import SqliteSessionService, skip_completed_stage
+import main
+
+
+class TestSqliteSessionService(unittest.TestCase):
+
+    def setUp(self):
+        isolate_state(self)
+        self.path = os.path.join(tempfile.mkdtemp(), "sessions.sqlite3")
+
+    def test_state_and_events_survive_a_restart(self):
+        async def write():
+            service = SqliteSessionService(self.path)
+            session = await service.create_session(app_name="app", user_id="u", session_id="s", state={"a": 1})
+            await service.append_event(session, Event(author="X", actions=EventActions(
+                state_delta={"b": {"c": [1, 2]}, "user:lang": "it", "temp:scratch": "x"})))
+            await service.append_event(session, Event(author="Y", actions=EventActions(state_delta={"a": 2})))
+            service.close()
+
+        async def read():
+            service = SqliteSessionService(self.path)
+            return (await service.get_session(app_name="app", user_id="u", session_id="s"),
+                    await service.get_user_state(app_name="app", user_id="u"),
+                    await service.create_session(app_name="app", user_id="u", session_id="other"))
+
+        asyncio.run(write())
+        session, user_state, other = asyncio.run(read())
+        self.assertEqual(session.state, {"a": 2, "b": {"c": [1, 2]}, "user:lang": "it"})
+        self.assertEqual([e.author for e in session.events], ["X", "Y"])
+        self.assertEqual(user_state, {"lang": "it"})
+        self.assertEqual(other.state, {"user:lang": "it"})
+
+    def test_skip_completed_stage(self):
+        context = MagicMock(agent_name="SelectorAgent", state={"selection_result": '{"selection": []}'})
+        self.assertEqual(skip_completed_stage(context).parts[0].text, '{"selection": []}')
+        context.agent_name = "EnricherAgent"
+        self.assertIsNone(skip_completed_stage(context))
+
+    def test_resume_skips_the_completed_selector(self):
+        """Verify a retry after the selector re-runs only the enricher, without listing Readwise again."""
+        env = {"READWISE_CACHE_DISABLED": "1", "LLM_CACHE_DISABLED": "1",
+               "PREFETCH_DISABLED": "1", "HISTORY_DISABLED": "1"}
+        selector, enricher = (agent.model_copy(update={"model": FAKE_MODEL, "parent_agent": None})
+                              for agent in (selector_agent, enricher_agent))
+        state = {"prompt_override_selector": DEFAULT_SELECTOR_PROMPT,
+                 "prompt_override_enricher": DEFAULT_ENRICHER_PROMPT}
+        service = SqliteSessionService(self.path)
+
+        def run(agents):
+            runner = Runner(agent=SequentialAgent(name="Pipeline", sub_agents=agents),
+                            app_name=main.APP_NAME, session_service=service)
+            return asyncio.run(main.run_pipeline(runner, "resume-user", "digest-day", state=state, resume=True))
+
+        with ReaderStandIn() as reader, patch.dict(os.environ, env):
+            reader.add_corpus("resume-token", make_corpus(100))
+            os.environ["READWISE_BASE_URL"] = reader.base_url
+            register_user_token("resume-user", "resume-token")
+
+            # First attempt stops after the selector (e.g. the job crashed)
+            self.assertIsNone(run([selector.model_copy()]))
+            listings = len([p for p in reader.requests if "ids" not in p])
+            result = run([selector.model_copy(), enricher])
+
+        self.assertEqual(len([p for p in reader.requests if "ids" not in p]), listings)
+        self.assertEqual(len(json.loads(result)["selection"]), 5)
+
+    def test_rerun_after_delivery_does_not_return_the_digest_again(self):
+        """Verify a complete, delivered run is not resumed by a rerun of the day, and new state is merged."""
+        env = {"READWISE_CACHE_DISABLED": "1", "LLM_CACHE_DISABLED": "1",
+               "PREFETCH_DISABLED": "1", "HISTORY_DISABLED": "1"}
+        agents = [agent.model_copy(update={"model": FAKE_MODEL, "parent_agent": None})
+                  for agent in (selector_agent, enricher_agent)]
+        state = {"prompt_override_selector": DEFAULT_SELECTOR_PROMPT,
+                 "prompt_override_enricher": DEFAULT_ENRICHER_PROMPT}
+        service = SqliteSessionService(self.path)
+        runner = Runner(agent=SequentialAgent(name="Pipeline", sub_agents=agents),
+                        app_name=main.APP_NAME, session_service=service)
+
+        async def scenario(reader):
+            first = await main.run_pipeline(runner, "rerun-user", "digest-day", state=state, resume=True)
+            await main.mark_delivered(runner, "rerun-user", "digest-day")
+            delivered = await main.digest_delivered(runner, "rerun-user", "digest-day")
+            requests = len(reader.requests)
+            second = await main.run_pipeline(runner, "rerun-user", "digest-day", state=state, resume=True)
+            return first, delivered, second, len(reader.requests) - requests
+
+        with ReaderStandIn() as reader, patch.dict(os.environ, env):
+            reader.add_corpus("rerun-token", make_corpus(100))
+            os.environ["READWISE_BASE_URL"] = reader.base_url
+            register_user_token("rerun-user", "rerun-token")
+            first, delivered, second, rerun_requests = asyncio.run(scenario(reader))
+
+            # An interrupted session picks up the state of the new attempt
+            resumed = {**state, "prompt_override_enricher": "custom"}
+            asyncio.run(service.create_session(app_name=main.APP_NAME, user_id="rerun-user",
+                                               session_id="other-day", state=state))
+            asyncio.run(main.run_pipeline(Runner(agent=SequentialAgent(name="Nothing", sub_agents=[]),
+                                                 app_name=main.APP_NAME, session_service=service),
+                                          "rerun-user", "other-day", state=resumed, resume=True))
+            stored = asyncio.run(service.get_session(app_name=main.APP_NAME, user_id="rerun-user",
+                                                     session_id="other-day"))
+
+        self.assertEqual(len(json.loads(first)["selection"]), 5)
+        self.assertTrue(delivered)
+        self.assertIsNone(second)
+        self.assertEqual(rerun_requests, 0)
+        self.assertEqual(stored.state["prompt_override_enricher"], "custom")
+
+
+if __name__ == '__main__':
+    unittest.main()
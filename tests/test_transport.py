@@ -0,0 +1,69 @@
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+import requests
+from transport import ReadwiseTransport, TokenBucket, retry_after_seconds
+
+
+def _response(status, headers=None):
+    response = MagicMock(status_code=status)
+    response.headers = headers or {}
+    return response
+
+
+class TestTransport(unittest.TestCase):
+
+    def test_token_bucket_spaces_requests_after_burst(self):
+        bucket = TokenBucket(rate=50, capacity=2)
+        start = time.monotonic()
+        waits = [bucket.acquire() for _ in range(4)]
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 0.02, delta=0.01)
+        self.assertGreaterEqual(time.monotonic() - start, 0.035)
+
+    def test_retry_after_parsing(self):
+        self.assertEqual(retry_after_seconds(_response(429, {"Retry-After": "7"})), 7.0)
+        self.assertIsNone(retry_after_seconds(_response(429)))
+        self.assertEqual(retry_after_seconds(_response(429, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})), 0.0)
+
+    def test_retries_throttled_and_failed_requests(self):
+        """Verify 429s honour Retry-After, errors back off, and timeouts are always set."""
+        transport = ReadwiseTransport(rate_per_minute=0, max_retries=3)
+        transport.session = MagicMock()
+        transport.session.get.side_effect = [
+            _response(429, {"Retry-After": "2"}),
+            requests.exceptions.ConnectTimeout("slow"),
+            _response(200),
+        ]
+        with patch("transport.time.sleep") as sleep, patch("transport.random.uniform", return_value=0.5):
+            response = transport.get("https://readwise.io/api/v3/list/", params={"location": "new"}, token="t")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [2.0, 0.5])
+        kwargs = transport.session.get.call_args.kwargs
+        self.assertEqual(kwargs["timeout"], transport.timeout)
+        self.assertEqual(kwargs["headers"], {"Authorization": "Token t"})
+
+    def test_throttled_retry_records_the_pause(self):
+        """Verify a 429 pauses the token's bucket and the retry span carries the delay."""
+        transport = ReadwiseTransport(rate_per_minute=60, max_retries=1)
+        transport.session = MagicMock()
+        transport.session.get.side_effect = [_response(429, {"Retry-After": "3"}), _response(200)]
+        with patch("transport.time.sleep"), patch("transport.TokenBucket.pause") as pause, \
+             patch("transport.metrics.record") as record:
+            transport.get("https://readwise.io/api/v3/list/", token="t")
+
+        pause.assert_called_once_with(3.0)
+        record.assert_any_call("readwise.retry", 3.0, status=429)
+
+    def test_gives_up_after_max_retries(self):
+        transport = ReadwiseTransport(rate_per_minute=0, max_retries=1)
+        transport.session = MagicMock()
+        transport.session.get.side_effect = requests.exceptions.ReadTimeout("hung")
+        with patch("transport.time.sleep"), self.assertRaises(requests.exceptions.ReadTimeout):
+            transport.get("https://readwise.io/api/v3/list/", token="t")
+        self.assertEqual(transport.session.get.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
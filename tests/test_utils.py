@@ -0,0 +1,76 @@
+import time
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from utils import PromptRegistry, parse_agent_json
+
+
+def _response(status_code, text="", headers=None):
+    response = MagicMock(status_code=status_code, text=text, headers=headers or {})
+    response.raise_for_status.return_value = None
+    return response
+
+
+class TestPromptRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    @patch('utils.requests.get')
+    def test_register_is_lazy_and_revalidates(self, mock_get):
+        """Verify no fetch happens before use, and use serves the local copy while revalidating it."""
+        registry = PromptRegistry(cache_dir=self.cache_dir)
+        registry.register("selector", "https://example.com/s", "default")
+        mock_get.assert_not_called()
+
+        mock_get.return_value = _response(200, "remote", {"ETag": '"v1"'})
+        self.assertEqual(registry.get("selector"), "default")
+        registry._executor.shutdown(wait=True)
+        self.assertEqual(registry.get("selector"), "remote")
+
+        registry = PromptRegistry(cache_dir=self.cache_dir)
+        registry.register("selector", "https://example.com/s", "default")
+        mock_get.return_value = _response(304)
+        self.assertEqual(registry.get("selector"), "remote")
+        registry._executor.shutdown(wait=True)
+        self.assertEqual(mock_get.call_args.kwargs["headers"]["If-None-Match"], '"v1"')
+        self.assertEqual(registry.get("selector"), "remote")
+
+    @patch('utils.requests.get')
+    def test_pinned_prompts_ignore_later_revalidation(self, mock_get):
+        """A run keeps the prompt it started with; the revalidated one is for the next run."""
+        mock_get.return_value = _response(200, "remote")
+        registry = PromptRegistry(cache_dir=self.cache_dir)
+        registry.register("selector", "https://example.com/s", "default")
+
+        pinned = registry.pinned()
+        registry._executor.shutdown(wait=True)
+        self.assertEqual(pinned, {"prompt_override_selector": "default"})
+        self.assertEqual(registry.pinned(), {"prompt_override_selector": "remote"})
+
+    @patch('utils.requests.get')
+    def test_slow_network_falls_back_immediately(self, mock_get):
+        mock_get.side_effect = lambda *args, **kwargs: time.sleep(0.5) or _response(200, "late")
+        registry = PromptRegistry(cache_dir=self.cache_dir, timeout=0.05)
+        registry.register("enricher", "https://example.com/e", "default")
+
+        start = time.perf_counter()
+        self.assertEqual(registry.get("enricher"), "default")
+        self.assertLess(time.perf_counter() - start, 0.04)
+        # An explicit warm-up waits at most `timeout`
+        registry.refresh()
+        start = time.perf_counter()
+        registry.load()
+        self.assertLess(time.perf_counter() - start, 0.4)
+
+
+class TestParseAgentJson(unittest.TestCase):
+
+    def test_strips_fences_and_repairs_escapes(self):
+        raw = '```json\n{"summary": "C:\\path"}\n```'
+        self.assertEqual(parse_agent_json(raw), {"summary": "C:\\path"})
+        self.assertEqual(parse_agent_json({"selection": []}), {"selection": []})
+
+
+if __name__ == '__main__':
+    unittest.main()
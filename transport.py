@@ -0,0 +1,176 @@
+import os
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Reader API quota of the /list/ endpoint, per access token
+DEFAULT_RATE_PER_MINUTE = 20
+# (connect, read) timeouts in seconds: a hung request fails instead of stalling the job
+DEFAULT_TIMEOUT = (3.05, 30)
+# Responses worth retrying: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` requests per second on average, with
+    bursts of up to `capacity`. Callers reserve a token and sleep until it
+    is due, so concurrent callers are served in order.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Takes one token, sleeping until it is available; returns the time waited."""
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float):
+        """Makes the next requests wait at least `seconds` (e.g. after a 429)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+def retry_after_seconds(response) -> float:
+    """Parses a Retry-After header (delta-seconds or HTTP date); None if absent or invalid."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class ReadwiseTransport:
+    """
+    HTTP layer shared by every ReadwiseClient of the process: one pooled
+    keep-alive session, a token bucket per access token matched to the
+    Reader API quota, retries with jittered exponential backoff that honour
+    Retry-After, and explicit (connect, read) timeouts.
+    """
+
+    def __init__(self, rate_per_minute: float = DEFAULT_RATE_PER_MINUTE, timeout=DEFAULT_TIMEOUT,
+                 max_retries: int = 4, backoff_base: float = 1.0, backoff_cap: float = 60.0, pool_size: int = 16):
+        self.rate_per_minute = rate_per_minute
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+
+    def _bucket(self, token: str):
+        """Returns the rate limiter of an access token, or None when unlimited."""
+        if not self.rate_per_minute:
+            return None
+        with self._buckets_lock:
+            if token not in self._buckets:
+                rate = self.rate_per_minute / 60
+                self._buckets[token] = TokenBucket(rate, capacity=max(1.0, self.rate_per_minute))
+            return self._buckets[token]
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def get(self, url: str, params: dict = None, token: str = None, stream: bool = False) -> requests.Response:
+        """
+        GETs `url` with the token's credentials, within its rate limit.
+        With `stream`, only the headers are read: consume the body with
+        `iter_content` and close the response.
+
+        Returns:
+            requests.Response: The final response (check it with raise_for_status).
+
+        Raises:
+            requests.exceptions.RequestException: If the request still fails
+                (connection error or timeout) after every retry.
+        """
+        bucket = self._bucket(token)
+        headers = {"Authorization": f"Token {token}"} if token else {}
+        for attempt in range(self.max_retries + 1):
+            if bucket is not None:
+                waited = bucket.acquire()
+                if waited:
+                    metrics.record("readwise.rate_limit_wait", waited)
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"Readwise request failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = self._backoff(attempt)
+            delay = min(delay, self.backoff_cap)
+            response.close()
+            metrics.record("readwise.retry", delay, status=response.status_code)
+            logger.warning(f"Readwise returned {response.status_code}; retrying (attempt {attempt + 1}/{self.max_retries})")
+            if response.status_code == 429 and bucket is not None:
+                # Hold back every request of this token, not just this one: the wait happens in `acquire`
+                bucket.pause(delay)
+            elif delay:
+                time.sleep(delay)
+        return response
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+def get_transport():
+    """
+    Returns the process-wide transport, configured from READWISE_RATE_PER_MINUTE
+    (0 disables rate limiting), READWISE_CONNECT_TIMEOUT, READWISE_READ_TIMEOUT
+    and READWISE_MAX_RETRIES.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = ReadwiseTransport(
+                rate_per_minute=float(os.getenv("READWISE_RATE_PER_MINUTE", str(DEFAULT_RATE_PER_MINUTE))),
+                timeout=(float(os.getenv("READWISE_CONNECT_TIMEOUT", str(DEFAULT_TIMEOUT[0]))),
+                         float(os.getenv("READWISE_READ_TIMEOUT", str(DEFAULT_TIMEOUT[1])))),
+                max_retries=int(os.getenv("READWISE_MAX_RETRIES", "4")),
+            )
+        return _transport
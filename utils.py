@@ -1,25 +1,206 @@
+import os
+import re
+import json
+import hashlib
 import requests
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+import metrics
 
 logger = logging.getLogger(__name__)
 
-def fetch_prompt(url: str, default_prompt: str) -> str:
+DEFAULT_PROMPT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "morning_digest", "prompts")
+
+class PromptRegistry:
+    """
+    Lazily loads agent prompts from remote URLs.
+
+    Nothing is fetched when prompts are registered. The first time a prompt is
+    needed (`get`, called from the agents' instruction providers on the event
+    loop), the on-disk copy or the default prompt is served at once, and the
+    prompt is revalidated in the background with ETag/If-Modified-Since; the
+    fetched version replaces it for later runs. A run keeps the versions it
+    started with (see `pinned`).
+
+    `load` fetches every pending prompt up front instead, waiting at most
+    `timeout` seconds (e.g. for a warm-up off the event loop).
     """
-    Fetches prompt from URL. Returns default_prompt on failure.
-    
+
+    def __init__(self, cache_dir: str = DEFAULT_PROMPT_CACHE_DIR, timeout: float = 3.0):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self._sources = {}
+        self._prompts = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        # Background revalidations in flight, by prompt name
+        self._revalidating = {}
+
+    def register(self, name: str, url: str, default_prompt: str):
+        """Declares a prompt; no network I/O happens here."""
+        self._sources[name] = (url, default_prompt)
+        self._prompts.pop(name, None)
+
+    def get(self, name: str) -> str:
+        """
+        Returns the prompt without waiting on the network: on first use, the
+        on-disk copy or the default, while the prompt is revalidated in the
+        background.
+        """
+        prompt = self._prompts.get(name)
+        if prompt is None:
+            url, default_prompt = self._sources[name]
+            prompt = self._read_cached(url).get("text") or default_prompt
+            with self._lock:
+                prompt = self._prompts.setdefault(name, prompt)
+            self._revalidate(name)
+        return prompt
+
+    def provider(self, name: str):
+        """
+        Returns an ADK instruction provider that resolves the prompt on first
+        use. A session can override it with a `prompt_override_<name>` state key.
+        """
+        def instruction_provider(context) -> str:
+            return context.state.get(f"prompt_override_{name}") or self.get(name)
+        return instruction_provider
+
+    def pinned(self) -> dict:
+        """
+        Returns the prompts loaded now as `prompt_override_<name>` session
+        state: a run started with it keeps these versions, and a background
+        revalidation only changes the next run's.
+        """
+        return {f"prompt_override_{name}": self.get(name) for name in self._sources}
+
+    def load(self):
+        """Fetches every prompt not loaded yet, concurrently, waiting at most `timeout`."""
+        with self._lock:
+            pending = [name for name in self._sources if name not in self._prompts]
+            if not pending:
+                return
+            futures = {self._get_executor().submit(self._fetch, *self._sources[name]): name for name in pending}
+            wait(futures, timeout=self.timeout)
+            for future, name in futures.items():
+                if future.done() and future.exception() is None:
+                    self._prompts[name] = future.result()
+                else:
+                    url, default_prompt = self._sources[name]
+                    logger.warning(f"Prompt {name} not fetched within {self.timeout}s. Using local copy.")
+                    self._prompts[name] = self._read_cached(url).get("text") or default_prompt
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prompt-fetch")
+        return self._executor
+
+    def _revalidate(self, name: str):
+        """Fetches a prompt in the background; the result replaces the copy being served."""
+        with self._lock:
+            if name in self._revalidating:
+                return
+            future = self._get_executor().submit(self._fetch, *self._sources[name])
+            self._revalidating[name] = future
+
+        def revalidated(future):
+            with self._lock:
+                self._revalidating.pop(name, None)
+                # Skipped if the prompts were refreshed meanwhile
+                if future.exception() is None and name in self._prompts:
+                    self._prompts[name] = future.result()
+        future.add_done_callback(revalidated)
+
+    def refresh(self):
+        """Forgets the loaded prompts, so the next use revalidates them (long-running processes)."""
+        with self._lock:
+            self._prompts.clear()
+
+    def _cache_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest()[:16] + ".json")
+
+    def _read_cached(self, url: str) -> dict:
+        try:
+            with open(self._cache_path(url), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _fetch(self, url: str, default_prompt: str) -> str:
+        """Conditional GET of a prompt; returns the cached copy or default on failure."""
+        with metrics.span("prompt.fetch") as span:
+            text, source = self._fetch_prompt(url, default_prompt)
+            span.set(source=source)
+        return text
+
+    def _fetch_prompt(self, url: str, default_prompt: str):
+        """Returns the prompt and where it came from: 'network', 'not_modified' or 'fallback'."""
+        cached = self._read_cached(url)
+        headers = {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        try:
+            response = requests.get(url, headers=headers, timeout=(3, 10))
+            if response.status_code == 304 and cached.get("text"):
+                logger.info(f"Prompt at {url} not modified. Using cached copy.")
+                return cached["text"], "not_modified"
+            response.raise_for_status()
+            logger.info(f"Successfully fetched prompt from {url}")
+            entry = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "text": response.text,
+            }
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(self._cache_path(url), "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+            except OSError as e:
+                logger.warning(f"Could not cache prompt from {url}: {e}")
+            return response.text, "network"
+        except Exception as e:
+            logger.warning(f"Failed to fetch prompt from {url}: {e}. Using cached or default prompt.")
+            return cached.get("text") or default_prompt, "fallback"
+
+
+# Process-wide registry used by the agents
+prompts = PromptRegistry(
+    cache_dir=os.getenv("PROMPT_CACHE_DIR", DEFAULT_PROMPT_CACHE_DIR),
+    timeout=float(os.getenv("PROMPT_FETCH_TIMEOUT", "3")),
+)
+
+def parse_agent_json(raw):
+    """
+    Parses the JSON emitted by an agent, tolerating Markdown fences and
+    invalid backslash escapes.
+
     Args:
-        url (str): The URL to fetch the prompt from (e.g., raw Gist URL).
-        default_prompt (str): The fallback prompt to use if fetching fails.
-        
+        raw (str | dict): The agent output, as stored in the session state.
+
     Returns:
-        str: The fetched prompt or the default prompt.
+        dict: The decoded JSON object.
+
+    Raises:
+        json.JSONDecodeError: If the output cannot be decoded even after repair.
     """
+    if not isinstance(raw, str):
+        return raw
+
+    text = raw.strip()
+    # Basic Markdown cleanup
+    if text.startswith("```json"):
+        text = text[7:]
+    elif text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+
     try:
-        # Timeout set to 3 seconds to avoid delaying agent startup too much
-        response = requests.get(url, timeout=3)
-        response.raise_for_status()
-        logger.info(f"Successfully fetched prompt from {url}")
-        return response.text
-    except Exception as e:
-        logger.warning(f"Failed to fetch prompt from {url}: {e}. Using default prompt.")
-        return default_prompt
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        logger.warning(f"JSON Decode Error ({e}). Attempting to repair...")
+        # Common fix for "Invalid \escape": escape backslashes that aren't valid JSON escapes
+        cleaned = re.sub(r'\\(?![/u"\\bfnrt])', r'\\\\', text)
+        return json.loads(cleaned)